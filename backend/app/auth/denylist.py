@@ -0,0 +1,87 @@
+import asyncio
+import contextlib
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.config import ACCESS_TOKEN_EXPIRE_MINUTES, SESSION_DENYLIST_SYNC_SECONDS
+from app.db import async_session_maker
+from app.logger import setup_logger
+from app.repository.session import SessionRepository
+
+logger = setup_logger(__name__)
+
+
+class SessionDenylist:
+    """
+    Sessions revoked recently enough that access tokens issued for them may
+    still be valid. Revocations made by this worker apply immediately, the
+    ones made by other workers once the next sync picks them up.
+    """
+
+    # Revocations committed out of order are picked up by re-reading a bit
+    # before the latest one already seen
+    SYNC_OVERLAP = timedelta(seconds=30)
+
+    def __init__(self, token_ttl: timedelta, sync_interval: float) -> None:
+        self.token_ttl = token_ttl
+        self.sync_interval = sync_interval
+
+        # session_id -> time.time() after which its tokens are expired anyway
+        self._revoked: dict[int, float] = {}
+        self._latest_revoked_at: datetime | None = None
+        self._syncer: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        await self.sync()
+        self._syncer = asyncio.create_task(self._sync_loop())
+
+    async def stop(self) -> None:
+        if self._syncer is not None:
+            self._syncer.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._syncer
+            self._syncer = None
+
+    def revoke(self, session_id: int) -> None:
+        self._revoked[session_id] = time.time() + self.token_ttl.total_seconds()
+
+    def is_revoked(self, session_id: int) -> bool:
+        return session_id in self._revoked
+
+    async def sync(self) -> None:
+        now = datetime.now(timezone.utc)
+        since = now - self.token_ttl
+        if self._latest_revoked_at is not None:
+            since = max(since, self._latest_revoked_at - self.SYNC_OVERLAP)
+
+        async with async_session_maker() as session:
+            revoked = await SessionRepository(session).get_revoked_sessions(since)
+
+        for session_id, revoked_at in revoked:
+            expires = (revoked_at + self.token_ttl).timestamp()
+            self._revoked[session_id] = max(self._revoked.get(session_id, 0), expires)
+            if self._latest_revoked_at is None or revoked_at > self._latest_revoked_at:
+                self._latest_revoked_at = revoked_at
+
+        wall = time.time()
+        self._revoked = {
+            session_id: expires
+            for session_id, expires in self._revoked.items()
+            if expires > wall
+        }
+
+    async def _sync_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self.sync()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Failed to sync the session denylist")
+
+
+session_denylist = SessionDenylist(
+    token_ttl=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
+    sync_interval=SESSION_DENYLIST_SYNC_SECONDS,
+)
@@ -0,0 +1,109 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from app.config import (
+    PASSWORD_BCRYPT_ROUNDS,
+    PASSWORD_HASH_EXECUTOR,
+    PASSWORD_HASH_MAX_PENDING,
+    PASSWORD_HASH_WORKERS,
+    PASSWORD_SALT,
+)
+from app.exceptions.exceptions import ServiceBusyError
+from passlib.context import CryptContext
+
+# min == max == default: any stored hash with another cost "needs update"
+crypt_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=PASSWORD_BCRYPT_ROUNDS,
+    bcrypt__min_rounds=PASSWORD_BCRYPT_ROUNDS,
+    bcrypt__max_rounds=PASSWORD_BCRYPT_ROUNDS,
+)
+
+
+# Module-level so they can be pickled into a process pool.
+
+def _hash(password: str) -> str:
+    return crypt_context.hash(password + PASSWORD_SALT)
+
+
+def _verify(password: str, hashed_password: str) -> bool:
+    return crypt_context.verify(password + PASSWORD_SALT, hashed_password)
+
+
+def _verify_and_update(
+    password: str, hashed_password: str
+) -> tuple[bool, str | None]:
+    return crypt_context.verify_and_update(
+        password + PASSWORD_SALT, hashed_password
+    )
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a worker pool so it never blocks the event loop.
+
+    At most `max_pending` operations may be queued or running; beyond that
+    callers get a 503 instead of piling up behind the pool.
+    """
+
+    def __init__(self, executor_kind: str, workers: int, max_pending: int) -> None:
+        self.executor_kind = executor_kind
+        self.workers = workers
+        self.max_pending = max_pending
+
+        self.pending = 0
+        self.rejected = 0
+
+        self._executor: Executor | None = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_kind == "process":
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix="password-hasher",
+                )
+
+        return self._executor
+
+    async def _run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise ServiceBusyError(resource="password")
+
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run(_verify, password, hashed_password)
+
+    async def verify_and_update(
+        self, password: str, hashed_password: str
+    ) -> tuple[bool, str | None]:
+        return await self._run(_verify_and_update, password, hashed_password)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    executor_kind=PASSWORD_HASH_EXECUTOR,
+    workers=PASSWORD_HASH_WORKERS,
+    max_pending=PASSWORD_HASH_MAX_PENDING,
+)
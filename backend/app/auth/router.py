@@ -1,22 +1,21 @@
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Annotated
 
-import jwt
 from app.auth.dependencies import get_formatted_token
-from app.auth.utils import authenticate_user, create_jwt_token
-from app.config import (
-    ACCESS_TOKEN_EXPIRE_MINUTES,
-    ALGORITHM,
-    REFRESH_TOKEN_EXPIRE_MINUTES,
-    SECRET_KEY,
+from app.auth.denylist import session_denylist
+from app.auth.utils import (
+    authenticate_user,
+    create_access_token,
+    create_jwt_token,
+    decode_access_claims,
 )
+from app.config import ACCESS_TOKEN_EXPIRE_MINUTES, REFRESH_TOKEN_EXPIRE_MINUTES
 from app.exceptions.codes import Codes
 from app.exceptions.exceptions import AppException, InvalidTokenException
 from app.repository.session import SessionRepository, get_session_repo
 from app.repository.user import UserRepository, get_user_repo
 from fastapi import APIRouter, Depends
 from fastapi.security import OAuth2PasswordRequestForm
-from jwt import InvalidTokenError
 from starlette import status
 from starlette.responses import JSONResponse, Response
 
@@ -41,17 +40,26 @@ async def generate_access_and_refresh_tokens(
             message="Incorrect tag or password",
         )
 
-    await session_repo.delete_session_by_user_tag(tag=user.tag)
+    # One session per user: logging in ends the previous one
+    access_token_ttl = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    revoked = await session_repo.revoke_sessions_by_user_id(
+        user_id=user.user_id,
+        purge_revoked_before=datetime.now(timezone.utc) - access_token_ttl,
+    )
+    for session_id in revoked:
+        session_denylist.revoke(session_id)
 
     refresh_token_expires = timedelta(minutes=REFRESH_TOKEN_EXPIRE_MINUTES)
     refresh_token = create_jwt_token(
-        data={"sub": user.tag}, expires_delta=refresh_token_expires
+        data={"sub": user.tag, "uid": user.user_id},
+        expires_delta=refresh_token_expires,
+    )
+    session = await session_repo.insert_session(
+        token=refresh_token, user_id=user.user_id
     )
-    await session_repo.insert_session(token=refresh_token, user_id=user.user_id)
 
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_jwt_token(
-        data={"sub": user.tag}, expires_delta=access_token_expires
+    access_token = create_access_token(
+        user_id=user.user_id, tag=user.tag, session_id=session.session_id
     )
 
     response = Response(status_code=status.HTTP_201_CREATED)
@@ -68,41 +76,35 @@ async def get_refresh_token(
     ],
 ):
     invalid_token = InvalidTokenException()
-    try:
-        payload = jwt.decode(
-            token, SECRET_KEY, algorithms=[
-                ALGORITHM], options={"verify_exp": False}
-        )
-        tag: str = payload.get("sub")
-        if tag is None:
-            raise invalid_token
-
-    except InvalidTokenError as e:
-        raise invalid_token from e
-
-    session = await session_repo.get_session_by_user_tag(tag=tag)
-    if not session:
+    claims = decode_access_claims(token, verify_exp=False)
+
+    session = await session_repo.get_session_by_id(claims.session_id)
+    if (
+        session is None
+        or session.revoked_at is not None
+        or session.user_id != claims.user_id
+    ):
         raise invalid_token
 
-    try:
-        _ = jwt.decode(
-            session.refresh_token,
-            SECRET_KEY,
-            algorithms=[ALGORITHM],
-        )
+    # The refresh token was signed by us when the session was created, its
+    # expiry follows from created_at without decoding it again
+    refresh_expires_at = session.created_at + timedelta(
+        minutes=REFRESH_TOKEN_EXPIRE_MINUTES
+    )
+    if refresh_expires_at <= datetime.now(timezone.utc):
+        await session_repo.revoke_session(session.session_id)
+        await session_repo.commit()
+        session_denylist.revoke(session.session_id)
+        raise invalid_token
 
-        access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-        access_token = create_jwt_token(
-            data={"sub": tag}, expires_delta=access_token_expires
-        )
+    access_token = create_access_token(
+        user_id=claims.user_id, tag=claims.tag, session_id=session.session_id
+    )
 
-        response = Response(status_code=status.HTTP_201_CREATED)
-        response.set_cookie(
-            key="jwt", value=f"Bearer {access_token}", httponly=True)
-        return response
-    except InvalidTokenError as e:
-        await session_repo.delete_session_by_user_tag(tag=tag)
-        raise invalid_token from e
+    response = Response(status_code=status.HTTP_201_CREATED)
+    response.set_cookie(
+        key="jwt", value=f"Bearer {access_token}", httponly=True)
+    return response
 
 
 @auth_router.post("/logout", status_code=status.HTTP_200_OK)
@@ -112,20 +114,10 @@ async def log_out_from_system(
         SessionRepository, Depends(get_session_repo)
     ],
 ):
-    invalid_token = InvalidTokenException()
-    try:
-        payload = jwt.decode(
-            token, SECRET_KEY, algorithms=[
-                ALGORITHM], options={"verify_exp": False}
-        )
-        tag: str = payload.get("sub")
-        if tag is None:
-            raise invalid_token
-
-    except InvalidTokenError as e:
-        raise invalid_token from e
+    claims = decode_access_claims(token, verify_exp=False)
 
-    result = await session_repo.delete_session_by_user_tag(tag=tag)
+    result = await session_repo.revoke_session(claims.session_id)
+    session_denylist.revoke(claims.session_id)
 
     response = JSONResponse(content={"result": result})
     response.delete_cookie(key="jwt", httponly=True)
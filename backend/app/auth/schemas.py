@@ -1,3 +1,5 @@
+from datetime import datetime
+
 from pydantic import BaseModel
 
 
@@ -11,5 +13,14 @@ class TokenData(BaseModel):
 
 
 class SessionRead(BaseModel):
+    session_id: int
     user_id: int
     refresh_token: str
+    created_at: datetime
+    revoked_at: datetime | None = None
+
+
+class AccessClaims(BaseModel):
+    user_id: int
+    tag: str
+    session_id: int
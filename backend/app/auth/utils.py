@@ -1,34 +1,53 @@
 from datetime import datetime, timedelta, timezone
 
 import jwt
-from app.config import ACCESS_TOKEN_EXPIRE_MINUTES, ALGORITHM, PASSWORD_SALT, SECRET_KEY
+from app.auth.hashing import password_hasher
+from app.auth.schemas import AccessClaims
+from app.config import (
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    ALGORITHM,
+    PASSWORD_REHASH_ON_LOGIN,
+    SECRET_KEY,
+)
+from app.exceptions.exceptions import InvalidTokenException
 from app.repository.user import UserRepository
 from app.user.schemas import UserRead
-from passlib.context import CryptContext
 
-crypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await password_hasher.verify(plain_password, hashed_password)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    salted = plain_password + PASSWORD_SALT
-    return crypt_context.verify(salted, hashed_password)
 
-
-def get_password_hash(password: str) -> str:
-    salted = password + PASSWORD_SALT
-    return crypt_context.hash(salted)
+async def get_password_hash(password: str) -> str:
+    return await password_hasher.hash(password)
 
 
 async def authenticate_user(
     tag: str, password: str, user_repo: UserRepository
 ) -> UserRead | None:
     user = await user_repo.get_user_by_tag(tag)
+    # Don't keep a connection checked out while bcrypt runs
+    await user_repo.commit()
     if not user:
         return None
 
-    if not verify_password(password, user.password_hashed):
+    if not PASSWORD_REHASH_ON_LOGIN:
+        if not await verify_password(password, user.password_hashed):
+            return None
+
+        return user
+
+    is_valid, new_hash = await password_hasher.verify_and_update(
+        password, user.password_hashed
+    )
+    if not is_valid:
         return None
 
+    if new_hash is not None:
+        await user_repo.update_password_hash(
+            user_id=user.user_id, password_hashed=new_hash
+        )
+
     return user
 
 
@@ -44,3 +63,28 @@ def create_jwt_token(data: dict, expires_delta: timedelta | None = None) -> str:
 
 def decode_access_token(token: str) -> dict:
     return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+
+
+def create_access_token(user_id: int, tag: str, session_id: int) -> str:
+    return create_jwt_token(
+        data={"sub": tag, "uid": user_id, "sid": session_id},
+        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
+    )
+
+
+def decode_access_claims(token: str, verify_exp: bool = True) -> AccessClaims:
+    try:
+        payload = jwt.decode(
+            token,
+            SECRET_KEY,
+            algorithms=[ALGORITHM],
+            options={"verify_exp": verify_exp},
+        )
+        return AccessClaims(
+            user_id=payload["uid"],
+            tag=payload["sub"],
+            session_id=payload["sid"],
+        )
+    except (jwt.InvalidTokenError, KeyError, ValueError) as e:
+        # Also tokens issued before they carried uid and sid
+        raise InvalidTokenException() from e
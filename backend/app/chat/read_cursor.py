@@ -0,0 +1,200 @@
+import asyncio
+import contextlib
+from collections import OrderedDict
+
+from app.chat.schemas import ReadCursorPublic
+from app.config import (
+    READ_CURSOR_CACHE_MAX_SIZE,
+    READ_CURSOR_FLUSH_SECONDS,
+    READ_CURSOR_MAX_PENDING,
+)
+from app.db import async_session_maker
+from app.logger import setup_logger
+from app.repository.read_cursor import ReadCursorRepository
+from app.websocket.events import WSEventType
+from app.websocket.manager import ws_manager
+
+logger = setup_logger(__name__)
+
+
+class ReadCursorBuffer:
+    """
+    Clients advance their read cursor on every scroll, so advances are
+    kept in memory, only the highest one per (user, conversation), and
+    written by a background task in a single upsert per flush.
+
+    The highest cursor per (user, conversation) is also remembered after
+    it is flushed, in an LRU of `max_cursors`, so that a cursor moving
+    backwards is told apart from one moving forwards without a query.
+    Advances are taken as given and clamped by the upsert, against the
+    stored cursor and the last message, and the flush remembers the
+    cursors as stored.
+    """
+
+    def __init__(
+        self, flush_interval: float, max_pending: int, max_cursors: int
+    ) -> None:
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_cursors = max_cursors
+
+        self._pending: dict[tuple[int, int], int] = {}
+        self._cursors: OrderedDict[tuple[int, int], int] = OrderedDict()
+        self._wakeup = asyncio.Event()
+        self._flusher: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        if self._flusher is not None:
+            self._flusher.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._flusher
+            self._flusher = None
+
+        await self.flush()
+
+    def get_cursor(self, user_id: int, conversation_id: int) -> int | None:
+        """Highest cursor known to this worker, None if it was forgotten."""
+        key = (user_id, conversation_id)
+        cursor = self._cursors.get(key)
+        if cursor is not None:
+            self._cursors.move_to_end(key)
+        return cursor
+
+    def advance(self, user_id: int, conversation_id: int, message_id: int) -> bool:
+        """Returns False if the cursor is known to be at or past `message_id`."""
+        key = (user_id, conversation_id)
+        if self._cursors.get(key, 0) >= message_id:
+            return False
+
+        self._remember(key, message_id)
+        self._pending[key] = message_id
+        if len(self._pending) >= self.max_pending:
+            self._wakeup.set()
+
+        return True
+
+    def mark_sent(self, user_id: int, conversation_id: int, message_id: int) -> None:
+        """
+        Sending a message implies having read everything before it. Not
+        broadcast, the message itself tells the others. A cursor this
+        worker doesn't know yet is not remembered: others may have written
+        after the message, so it may be behind the stored one.
+        """
+        key = (user_id, conversation_id)
+        if self._pending.get(key, 0) < message_id:
+            self._pending[key] = message_id
+            if len(self._pending) >= self.max_pending:
+                self._wakeup.set()
+
+        cursor = self._cursors.get(key)
+        if cursor is not None and cursor < message_id:
+            self._remember(key, message_id)
+
+    def get_pending(self, user_id: int, conversation_id: int) -> int | None:
+        return self._pending.get((user_id, conversation_id))
+
+    async def flush(self) -> None:
+        if not self._pending:
+            return
+
+        pending, self._pending = self._pending, {}
+        cursors = [
+            (user_id, conversation_id, message_id)
+            for (user_id, conversation_id), message_id in pending.items()
+        ]
+
+        try:
+            async with async_session_maker() as session:
+                stored = await ReadCursorRepository(session).upsert_cursors(cursors)
+        except Exception:
+            logger.exception(f"Failed to flush {len(cursors)} read cursors")
+            # Clients won't send them again, they are past them already,
+            # so they are retried with the next flush
+            for key, message_id in pending.items():
+                self._pending[key] = max(self._pending.get(key, 0), message_id)
+            return
+
+        self._settle(pending, stored)
+
+    def _settle(
+        self,
+        flushed: dict[tuple[int, int], int],
+        stored: list[tuple[int, int, int]],
+    ) -> None:
+        """
+        Replaces the remembered cursors with the stored ones, unless they
+        advanced again while the flush ran. Cursors the upsert dropped, of
+        conversations without messages, are forgotten.
+        """
+        stored_cursors = {
+            (user_id, conversation_id): message_id
+            for user_id, conversation_id, message_id in stored
+        }
+        for key, message_id in flushed.items():
+            remembered = self._cursors.get(key)
+            stored_id = stored_cursors.get(key)
+            if stored_id is None:
+                if remembered == message_id:
+                    del self._cursors[key]
+            elif remembered in (None, message_id) or stored_id > remembered:
+                self._remember(key, stored_id)
+
+    def _remember(self, key: tuple[int, int], message_id: int) -> None:
+        if not message_id:
+            return
+
+        self._cursors[key] = message_id
+        self._cursors.move_to_end(key)
+        if len(self._cursors) > self.max_cursors:
+            self._cursors.popitem(last=False)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(
+                    self._wakeup.wait(), timeout=self.flush_interval
+                )
+            self._wakeup.clear()
+
+            await self.flush()
+
+
+read_cursor_buffer = ReadCursorBuffer(
+    flush_interval=READ_CURSOR_FLUSH_SECONDS,
+    max_pending=READ_CURSOR_MAX_PENDING,
+    max_cursors=READ_CURSOR_CACHE_MAX_SIZE,
+)
+
+
+async def advance_read_cursor(
+    conversation_id: int, user_id: int, message_id: int
+) -> ReadCursorPublic:
+    """
+    The caller must have checked that `user_id` is a member of the
+    conversation. A cursor never moves backwards past the one this worker
+    knows; one it doesn't know yet (first advance since a restart or an
+    eviction) is taken as given and clamped when flushed. All members are
+    notified of an advance, the others as a read receipt.
+    """
+    advanced = read_cursor_buffer.advance(user_id, conversation_id, message_id)
+    cursor = ReadCursorPublic(
+        user_id=user_id,
+        conversation_id=conversation_id,
+        last_read_message_id=(
+            message_id
+            if advanced
+            else read_cursor_buffer.get_cursor(user_id, conversation_id) or 0
+        ),
+    )
+
+    if advanced:
+        await ws_manager.send_to_conversation(
+            conversation_id,
+            event_type=WSEventType.READ_UPDATED,
+            payload=cursor,
+        )
+
+    return cursor
@@ -1,13 +1,22 @@
 from typing import Annotated
 
-from app.chat.schemas import ChatPublic, CreateChatRequest
+from app.chat.read_cursor import advance_read_cursor, read_cursor_buffer
+from app.chat.schemas import (
+    ChatListItem,
+    ChatPublic,
+    CreateChatRequest,
+    ReadCursorPublic,
+    ReadCursorUpdate,
+)
+from app.conversation.membership import require_member
 from app.exceptions.codes import Codes
 from app.exceptions.exceptions import AppException, NotFoundError
 from app.repository.chat import ChatRepository, get_chat_repo
+from app.repository.read_cursor import ReadCursorRepository, get_read_cursor_repo
 from app.repository.user import UserRepository, get_user_repo
 from app.schemas import OkResponse
-from app.user.dependencies import get_current_user_by_token
-from app.user.schemas import UserRead
+from app.user.dependencies import get_current_user_identity
+from app.user.schemas import UserIdentity
 from app.websocket.events import WSEventType
 from app.websocket.manager import ws_manager
 from fastapi import APIRouter, Depends
@@ -23,11 +32,11 @@ chat_router = APIRouter(prefix="/chat")
 )
 async def create_chat(
     payload: CreateChatRequest,
-    current_user: Annotated[UserRead, Depends(get_current_user_by_token)],
+    current_user: Annotated[UserIdentity, Depends(get_current_user_identity)],
     chat_repo: Annotated[ChatRepository, Depends(get_chat_repo)],
     user_repo: Annotated[UserRepository, Depends(get_user_repo)],
 ):
-    other = await user_repo.get_user_by_tag(payload.tag)
+    other = await user_repo.get_user_identity_by_tag(payload.tag)
     if not other:
         raise NotFoundError(entity="user", entity_id=None)
 
@@ -50,12 +59,12 @@ async def create_chat(
             message="Chat between these users already exists",
         )
 
-    for user_id in (current_user.user_id, other.user_id):
-        await ws_manager.send_to_user(
-            user_id,
-            event_type=WSEventType.CHAT_CREATED,
-            payload=res.model_dump(),
-        )
+    await chat_repo.commit()
+    await ws_manager.send(
+        (current_user.user_id, other.user_id),
+        event_type=WSEventType.CHAT_CREATED,
+        payload=res,
+    )
 
     return res
 
@@ -63,7 +72,7 @@ async def create_chat(
 @chat_router.get("/{chat_id}", response_model=ChatPublic)
 async def get_chat(
     chat_id: int,
-    current_user: Annotated[UserRead, Depends(get_current_user_by_token)],
+    current_user: Annotated[UserIdentity, Depends(get_current_user_identity)],
     chat_repo: Annotated[ChatRepository, Depends(get_chat_repo)],
 ):
     chat = await chat_repo.get_chat_by_id(chat_id)
@@ -80,9 +89,9 @@ async def get_chat(
     return chat
 
 
-@chat_router.get("", response_model=list[ChatPublic])
+@chat_router.get("", response_model=list[ChatListItem])
 async def get_my_chats(
-    current_user: Annotated[UserRead, Depends(get_current_user_by_token)],
+    current_user: Annotated[UserIdentity, Depends(get_current_user_identity)],
     chat_repo: Annotated[ChatRepository, Depends(get_chat_repo)],
 ):
     return await chat_repo.get_chats_by_user_id(current_user.user_id)
@@ -94,7 +103,7 @@ async def get_my_chats(
 )
 async def delete_chat(
     conversation_id: int,
-    current_user: Annotated[UserRead, Depends(get_current_user_by_token)],
+    current_user: Annotated[UserIdentity, Depends(get_current_user_identity)],
     chat_repo: Annotated[ChatRepository, Depends(get_chat_repo)],
 ):
     chat = await chat_repo.get_chat_by_id(conversation_id)
@@ -109,14 +118,53 @@ async def delete_chat(
         )
 
     await chat_repo.delete_chat_by_id(conversation_id)
-
-    for user_id in (chat.user_id, chat.user_id2):
-        await ws_manager.send_to_user(
-            user_id,
-            event_type=WSEventType.CHAT_DELETED,
-            payload={
-                "conversation_id": conversation_id,
-            }
-        )
+    await chat_repo.commit()
+    await ws_manager.membership_changed(conversation_id)
+
+    await ws_manager.send(
+        (chat.user_id, chat.user_id2),
+        event_type=WSEventType.CHAT_DELETED,
+        payload={
+            "conversation_id": conversation_id,
+        }
+    )
 
     return OkResponse(ok=True)
+
+
+@chat_router.get("/{chat_id}/read", response_model=list[ReadCursorPublic])
+async def get_read_cursors(
+    chat_id: int,
+    current_user: Annotated[UserIdentity, Depends(get_current_user_identity)],
+    read_cursor_repo: Annotated[ReadCursorRepository, Depends(get_read_cursor_repo)],
+):
+    membership = await require_member(chat_id, current_user.user_id)
+
+    cursors = {
+        cursor.user_id: cursor
+        for cursor in await read_cursor_repo.get_cursors(chat_id)
+    }
+
+    # Advances that are not flushed yet
+    for user_id in membership.member_ids:
+        pending = read_cursor_buffer.get_pending(user_id, chat_id)
+        stored = cursors.get(user_id)
+        if pending is not None and (stored is None or pending > stored.last_read_message_id):
+            cursors[user_id] = ReadCursorPublic(
+                user_id=user_id,
+                conversation_id=chat_id,
+                last_read_message_id=pending,
+            )
+
+    return list(cursors.values())
+
+
+@chat_router.put("/{chat_id}/read", response_model=ReadCursorPublic)
+async def update_read_cursor(
+    chat_id: int,
+    payload: ReadCursorUpdate,
+    current_user: Annotated[UserIdentity, Depends(get_current_user_identity)],
+):
+    await require_member(chat_id, current_user.user_id)
+
+    return await advance_read_cursor(chat_id, current_user.user_id, payload.message_id)
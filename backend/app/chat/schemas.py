@@ -1,4 +1,8 @@
+from datetime import datetime
+
+from app.message.schemas import MessagePreview
 from app.schemas import GeneralSchema
+from pydantic import Field
 
 
 class CreateChatRequest(GeneralSchema):
@@ -10,3 +14,20 @@ class ChatPublic(GeneralSchema):
     title: str | None
     user_id: int
     user_id2: int
+
+
+class ChatListItem(ChatPublic):
+    last_message: MessagePreview | None = None
+    last_activity_at: datetime
+    last_read_message_id: int | None = None
+    unread_count: int = 0
+
+
+class ReadCursorUpdate(GeneralSchema):
+    message_id: int = Field(..., ge=1)
+
+
+class ReadCursorPublic(GeneralSchema):
+    user_id: int
+    conversation_id: int
+    last_read_message_id: int
@@ -1,4 +1,5 @@
 import os
+import re
 
 from dotenv import load_dotenv
 
@@ -6,12 +7,143 @@ load_dotenv()
 
 URL_DB = os.getenv("URL_DB")
 
+# LOGGING
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_DIRECTORY = os.getenv("LOG_DIRECTORY", "logs")
+# One JSON object per line, or the plain text format
+LOG_JSON = os.getenv("LOG_JSON", "true").lower() in ("1", "true", "yes")
+# app.log and error.log are rotated at this size, keeping this many files
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", 5))
+# Records waiting for the writer thread; beyond that they are dropped
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10_000))
+# The same message from the same logger is written once per window, 0 to
+# write every copy
+LOG_DEDUPE_SECONDS = float(os.getenv("LOG_DEDUPE_SECONDS", 10))
+
+# DATABASE
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+# Seconds after which a connection is replaced, -1 to keep it forever
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# Prepared statements cached per connection by asyncpg
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", 100))
+# Set behind pgbouncer in transaction mode (or a similar pooler): prepared
+# statement caches are disabled and statements get unique names. The
+# "postgres" WS_EVENT_BUS needs a session-mode connection and won't work.
+DB_EXTERNAL_POOLER = os.getenv("DB_EXTERNAL_POOLER", "false").lower() in ("1", "true", "yes")
+# Statements and database time per request, sent as a Server-Timing header.
+# Requests slower than SLOW_REQUEST_MS or running more than
+# SLOW_REQUEST_QUERIES statements are logged.
+REQUEST_TIMING_ENABLED = os.getenv(
+    "REQUEST_TIMING_ENABLED", "true").lower() in ("1", "true", "yes")
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", 500))
+SLOW_REQUEST_QUERIES = int(os.getenv("SLOW_REQUEST_QUERIES", 20))
+
 # AUTH
 
-ACCESS_TOKEN_EXPIRE_MINUTES = 1
+# Access tokens are verified without the database, a revoked session is
+# only rejected through the denylist, which is synced every few seconds
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 15))
 REFRESH_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7
+SESSION_DENYLIST_SYNC_SECONDS = float(
+    os.getenv("SESSION_DENYLIST_SYNC_SECONDS", 5))
 
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 SECRET_KEY = os.getenv("SECRET_KEY", "CHANGE_ME_TO_A_RANDOM_SECRET_KEY")
 PASSWORD_SALT = os.environ.get(
     "PASSWORD_SALT", "CHANGE_ME_TO_A_RANDOM_PASSWORD_SALT")
+
+# bcrypt runs outside the event loop: "process" or "thread" pool
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "process")
+PASSWORD_HASH_WORKERS = int(
+    os.getenv("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1)))
+# Hash operations queued or running before new ones are rejected with 503
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", 64))
+PASSWORD_BCRYPT_ROUNDS = int(os.getenv("PASSWORD_BCRYPT_ROUNDS", 12))
+# Re-hash on successful login when the stored cost differs from the above
+PASSWORD_REHASH_ON_LOGIN = os.getenv(
+    "PASSWORD_REHASH_ON_LOGIN", "false").lower() in ("1", "true", "yes")
+
+# MESSAGES
+
+MESSAGE_PAGE_SIZE = int(os.getenv("MESSAGE_PAGE_SIZE", 50))
+MESSAGE_PAGE_SIZE_MAX = int(os.getenv("MESSAGE_PAGE_SIZE_MAX", 200))
+# Messages per request of the batch send endpoint
+MESSAGE_BATCH_MAX = int(os.getenv("MESSAGE_BATCH_MAX", 100))
+# Concurrent single sends are written together: a batch is flushed once it
+# is this old or this large. Off by default.
+MESSAGE_COALESCE_ENABLED = os.getenv(
+    "MESSAGE_COALESCE_ENABLED", "false").lower() in ("1", "true", "yes")
+MESSAGE_COALESCE_WINDOW_MS = float(os.getenv("MESSAGE_COALESCE_WINDOW_MS", 2))
+MESSAGE_COALESCE_MAX_BATCH = int(os.getenv("MESSAGE_COALESCE_MAX_BATCH", 500))
+REACTORS_PAGE_SIZE = int(os.getenv("REACTORS_PAGE_SIZE", 50))
+REACTORS_PAGE_SIZE_MAX = int(os.getenv("REACTORS_PAGE_SIZE_MAX", 200))
+
+# SEARCH
+# Text search configuration of ix_messages_text_search, changing it
+# requires rebuilding the index
+SEARCH_TEXT_CONFIG = os.getenv("SEARCH_TEXT_CONFIG", "simple")
+# Inlined into SQL rather than bound (see app.models.search_config)
+if not re.fullmatch(r"[a-z_]+", SEARCH_TEXT_CONFIG):
+    raise ValueError(
+        f"SEARCH_TEXT_CONFIG must match ^[a-z_]+$, got {SEARCH_TEXT_CONFIG!r}"
+    )
+SEARCH_PAGE_SIZE = int(os.getenv("SEARCH_PAGE_SIZE", 20))
+SEARCH_PAGE_SIZE_MAX = int(os.getenv("SEARCH_PAGE_SIZE_MAX", 100))
+SEARCH_QUERY_MAX_LENGTH = int(os.getenv("SEARCH_QUERY_MAX_LENGTH", 256))
+
+# CHATS
+
+CHAT_PREVIEW_LENGTH = int(os.getenv("CHAT_PREVIEW_LENGTH", 100))
+# Unread counts stop at this value, clients show it as "N+"
+UNREAD_COUNT_CAP = int(os.getenv("UNREAD_COUNT_CAP", 100))
+
+# GROUPS
+GROUP_MAX_MEMBERS = int(os.getenv("GROUP_MAX_MEMBERS", 10_000))
+GROUP_MEMBERS_PAGE_SIZE = int(os.getenv("GROUP_MEMBERS_PAGE_SIZE", 100))
+GROUP_MEMBERS_PAGE_SIZE_MAX = int(os.getenv("GROUP_MEMBERS_PAGE_SIZE_MAX", 1000))
+
+# Members of recently active conversations, per worker. Changes made on
+# other workers are seen once the TTL expires.
+MEMBERSHIP_CACHE_TTL_SECONDS = float(os.getenv("MEMBERSHIP_CACHE_TTL_SECONDS", 30))
+MEMBERSHIP_CACHE_MAX_SIZE = int(os.getenv("MEMBERSHIP_CACHE_MAX_SIZE", 10_000))
+
+# Read cursor advances are coalesced in memory and written in batches
+READ_CURSOR_FLUSH_SECONDS = float(os.getenv("READ_CURSOR_FLUSH_SECONDS", 1))
+READ_CURSOR_MAX_PENDING = int(os.getenv("READ_CURSOR_MAX_PENDING", 10_000))
+# Highest cursor seen per (user, conversation), so moves backwards are
+# rejected without a query. A forgotten one is read from the database again.
+READ_CURSOR_CACHE_MAX_SIZE = int(os.getenv("READ_CURSOR_CACHE_MAX_SIZE", 100_000))
+
+# CACHE
+
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", 30))
+USER_CACHE_MAX_SIZE = int(os.getenv("USER_CACHE_MAX_SIZE", 10_000))
+
+# WEBSOCKET
+
+# Events buffered per socket before the socket is evicted as a slow consumer
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", 256))
+WS_SEND_TIMEOUT_SECONDS = float(os.getenv("WS_SEND_TIMEOUT_SECONDS", 5))
+# Every socket gets a ping this often and is closed if nothing, a pong or
+# any other frame, came from it for WS_HEARTBEAT_TIMEOUT_SECONDS
+WS_HEARTBEAT_INTERVAL_SECONDS = float(os.getenv("WS_HEARTBEAT_INTERVAL_SECONDS", 20))
+WS_HEARTBEAT_TIMEOUT_SECONDS = float(os.getenv("WS_HEARTBEAT_TIMEOUT_SECONDS", 60))
+# Sockets per worker; beyond the per-user cap the user's oldest socket is
+# closed, beyond the global one new sockets are refused
+WS_MAX_CONNECTIONS = int(os.getenv("WS_MAX_CONNECTIONS", 10_000))
+WS_MAX_CONNECTIONS_PER_USER = int(os.getenv("WS_MAX_CONNECTIONS_PER_USER", 10))
+# Typing events of a user in a conversation are forwarded at most this often
+WS_TYPING_INTERVAL_SECONDS = float(os.getenv("WS_TYPING_INTERVAL_SECONDS", 3))
+
+# Cross-worker delivery of WebSocket events: "memory" (single worker),
+# "postgres" (LISTEN/NOTIFY) or "unix" (datagram sockets on one host)
+WS_EVENT_BUS = os.getenv("WS_EVENT_BUS", "memory")
+WS_EVENT_BUS_CHANNEL = os.getenv("WS_EVENT_BUS_CHANNEL", "ws_events")
+WS_EVENT_BUS_SOCKET_DIR = os.getenv(
+    "WS_EVENT_BUS_SOCKET_DIR", "/tmp/little-chat-ws")
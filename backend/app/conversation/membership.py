@@ -0,0 +1,112 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+from app.config import MEMBERSHIP_CACHE_MAX_SIZE, MEMBERSHIP_CACHE_TTL_SECONDS
+from app.conversation.schemas import Membership
+from app.db import autocommit_session_maker
+from app.exceptions.exceptions import NoAccessError, NotFoundError
+from app.repository.conversation import ConversationRepository
+
+
+class MembershipCache:
+    """
+    Per-process TTL + LRU cache of conversation members, so that
+    authorizing a message and fanning it out doesn't load the member list
+    of the conversation every time.
+
+    Misses are loaded once however many callers wait for them. Changes are
+    invalidated locally and through the event bus (see
+    ConnectionManager.membership_changed), the TTL bounds staleness if a
+    bus message is lost. Writes don't rely on it alone: messages, reactions,
+    edits and read cursors check membership in their own statement.
+    """
+
+    def __init__(self, max_size: int, ttl: float) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        # Bumped on every invalidation so that a load which raced with one
+        # doesn't put stale members back
+        self.version = 0
+
+        self._entries: OrderedDict[int, tuple[float, Membership]] = OrderedDict()
+        self._loading: dict[int, asyncio.Future[Membership | None]] = {}
+
+    def peek(self, conversation_id: int) -> Membership | None:
+        entry = self._entries.get(conversation_id)
+        if entry is None:
+            return None
+
+        expires_at, membership = entry
+        if expires_at < time.monotonic():
+            del self._entries[conversation_id]
+            return None
+
+        self._entries.move_to_end(conversation_id)
+        return membership
+
+    async def get(self, conversation_id: int) -> Membership | None:
+        """None if the conversation doesn't exist."""
+        membership = self.peek(conversation_id)
+        if membership is not None:
+            return membership
+
+        future = self._loading.get(conversation_id)
+        if future is None:
+            future = asyncio.ensure_future(self._load(conversation_id))
+            self._loading[conversation_id] = future
+            future.add_done_callback(
+                lambda _: self._loading.pop(conversation_id, None)
+            )
+
+        # A cancelled caller must not cancel the load for the others
+        return await asyncio.shield(future)
+
+    def put(self, membership: Membership, version: int) -> None:
+        if self.max_size <= 0 or version != self.version:
+            return
+
+        self._entries[membership.conversation_id] = (
+            time.monotonic() + self.ttl,
+            membership,
+        )
+        self._entries.move_to_end(membership.conversation_id)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, conversation_id: int) -> None:
+        self.version += 1
+        self._entries.pop(conversation_id, None)
+
+    def clear(self) -> None:
+        self.version += 1
+        self._entries.clear()
+
+    async def _load(self, conversation_id: int) -> Membership | None:
+        version = self.version
+        async with autocommit_session_maker() as session:
+            membership = await ConversationRepository(session).get_membership(
+                conversation_id
+            )
+
+        if membership is not None:
+            self.put(membership, version)
+
+        return membership
+
+
+membership_cache = MembershipCache(
+    max_size=MEMBERSHIP_CACHE_MAX_SIZE, ttl=MEMBERSHIP_CACHE_TTL_SECONDS
+)
+
+
+async def require_member(conversation_id: int, user_id: int) -> Membership:
+    membership = await membership_cache.get(conversation_id)
+    if membership is None:
+        raise NotFoundError(entity="conversation", entity_id=conversation_id)
+
+    if user_id not in membership.member_ids:
+        raise NoAccessError("You are not a member of the conversation")
+
+    return membership
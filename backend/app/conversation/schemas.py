@@ -0,0 +1,20 @@
+from app.models import ConversationType
+from app.schemas import GeneralSchema
+from pydantic import ConfigDict
+
+
+class ConversationPublic(GeneralSchema):
+    conversation_id: int
+    title: str | None
+
+
+class Membership(GeneralSchema):
+    """Who belongs to a conversation, as kept by the membership cache."""
+
+    model_config = ConfigDict(frozen=True)
+
+    conversation_id: int
+    type: ConversationType
+    title: str | None
+    owner_id: int | None
+    member_ids: frozenset[int]
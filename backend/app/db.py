@@ -1,13 +1,132 @@
-from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
+import time
+from contextvars import ContextVar
 from typing import AsyncGenerator
-from sqlalchemy.ext.asyncio import create_async_engine
+from uuid import uuid4
 
-from app.config import URL_DB
+from sqlalchemy import event
+from sqlalchemy import exc as sa_exc
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from starlette.requests import HTTPConnection
+
+from app.config import (
+    DB_EXTERNAL_POOLER,
+    DB_MAX_OVERFLOW,
+    DB_POOL_PRE_PING,
+    DB_POOL_RECYCLE,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT,
+    DB_STATEMENT_CACHE_SIZE,
+    URL_DB,
+)
 from app.models import Base
 from app.models import *
 
-engine = create_async_engine(URL_DB)
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long checkouts wait for a connection."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.timeouts = 0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except sa_exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def recreate(self):
+        # Keep the counters when the pool is recreated, e.g. by dispose()
+        pool = super().recreate()
+        pool.checkouts = self.checkouts
+        pool.wait_seconds_total = self.wait_seconds_total
+        pool.wait_seconds_max = self.wait_seconds_max
+        pool.timeouts = self.timeouts
+        return pool
+
+
+def _connect_args() -> dict:
+    if DB_EXTERNAL_POOLER:
+        return {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+        }
+
+    return {
+        "statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+        "prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+    }
+
+
+engine = create_async_engine(
+    URL_DB,
+    poolclass=InstrumentedPool,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=DB_POOL_PRE_PING,
+    connect_args=_connect_args(),
+)
 async_session_maker = async_sessionmaker(engine, expire_on_commit=False)
+# Same pool, every statement commits on its own: no BEGIN/COMMIT round trips
+autocommit_session_maker = async_sessionmaker(
+    engine.execution_options(isolation_level="AUTOCOMMIT"),
+    expire_on_commit=False,
+)
+
+
+class QueryStats:
+    """Statements run on behalf of one request."""
+
+    __slots__ = ("count", "seconds", "slowest_seconds", "slowest_statement")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.seconds = 0.0
+        self.slowest_seconds = 0.0
+        self.slowest_statement: str | None = None
+
+
+# Set by app.metrics.timing.RequestTimingMiddleware. Sessions run their
+# statements in greenlets that share the caller's context, so the hooks
+# below see the request the statement belongs to.
+query_stats: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    if query_stats.get() is not None:
+        conn.info["query_started_at"] = time.perf_counter()
+
+
+@event.listens_for(engine.sync_engine, "after_cursor_execute")
+def _record_query(conn, cursor, statement, parameters, context, executemany):
+    stats = query_stats.get()
+    started_at = conn.info.pop("query_started_at", None)
+    if stats is None or started_at is None:
+        return
+
+    elapsed = time.perf_counter() - started_at
+    stats.count += 1
+    stats.seconds += elapsed
+    if elapsed > stats.slowest_seconds:
+        stats.slowest_seconds = elapsed
+        stats.slowest_statement = statement
+
+READ_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
 
 
 async def start_db():
@@ -19,6 +138,49 @@ async def stop_db():
     await engine.dispose()
 
 
-async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
+async def get_async_session(
+    connection: HTTPConnection,
+) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Unit of work of a request, shared by all repositories it uses.
+
+    Writes run in one transaction, committed after the handler returns and
+    rolled back if it raises. Reads run in autocommit. A websocket holds its
+    session for as long as it is open, so there every repository call keeps
+    its own short transaction and no connection stays checked out.
+    """
+    if connection.scope["type"] == "websocket":
+        async with async_session_maker() as session:
+            yield session
+        return
+
+    if connection.scope["method"] in READ_METHODS:
+        async with autocommit_session_maker() as session:
+            await session.begin()
+            yield session
+        return
+
     async with async_session_maker() as session:
-        yield session
+        await session.begin()
+        try:
+            yield session
+        except Exception:
+            await session.rollback()
+            raise
+
+        await session.commit()
+
+
+def get_pool_stats() -> dict:
+    pool: InstrumentedPool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": DB_MAX_OVERFLOW,
+        "checkouts": pool.checkouts,
+        "wait_seconds_total": round(pool.wait_seconds_total, 6),
+        "wait_seconds_max": round(pool.wait_seconds_max, 6),
+        "timeouts": pool.timeouts,
+    }
@@ -14,6 +14,10 @@ class Codes(str, Enum):
     INCORRECT_CREDENTIALS = 9
     NO_ACCESS = 10
     INVALID_OPERATION = 11
+    SERVICE_BUSY = 12
 
     CHAT_ALREADY_EXISTS = 1001
     CANNOT_CREATE_CHAT_WITH_YOURSELF = 1002
+
+    GROUP_IS_FULL = 2001
+    ALREADY_A_MEMBER = 2002
@@ -60,6 +60,15 @@ class NotFoundError(AppException):
         )
 
 
+class NoAccessError(AppException):
+    def __init__(self, message: str):
+        super().__init__(
+            status_code=status.HTTP_403_FORBIDDEN,
+            code=Codes.NO_ACCESS,
+            message=message,
+        )
+
+
 class IntegrityError(AppException):
     SQLSTATE_RESTRICT = "23001"
     SQLSTATE_NOT_NULL = "23502"
@@ -86,3 +95,13 @@ class IntegrityError(AppException):
             message=f"Problem while processing {entity}",
             details=details.model_dump(),
         )
+
+
+class ServiceBusyError(AppException):
+    def __init__(self, resource: str, retry_after: int = 1):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            code=Codes.SERVICE_BUSY,
+            message=f"Too many pending {resource} operations, try again later",
+            headers={"Retry-After": str(retry_after)},
+        )
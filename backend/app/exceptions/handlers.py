@@ -1,3 +1,5 @@
+import logging
+
 from app.exceptions.codes import Codes
 from app.exceptions.exceptions import AppException
 from app.logger import setup_logger
@@ -20,16 +22,25 @@ def log_exception(
     logs: list[str] | None = None,
     warnings: list[str] | None = None,
 ):
-    print(exception)
-
-    logger.error(
+    # Client errors are expected, only server errors carry the traceback
+    server_error = status_code >= 500
+    logger.log(
+        logging.ERROR if server_error else logging.WARNING,
         f"{request.method} {request.url.path} | "
         f"Warnings: {warnings or []} | "
         f"Logs: {logs or []} | "
         f"Status: {status_code} | "
         f"Code: {app_exception.code} | "
         f"Msg: {app_exception.message} | "
-        f"Details: {app_exception.details}"
+        f"Details: {app_exception.details}",
+        exc_info=exception if server_error else None,
+        extra={
+            "method": request.method,
+            "path": request.url.path,
+            "status": status_code,
+            "code": app_exception.code,
+            "error": repr(exception),
+        },
     )
 
 
@@ -0,0 +1,257 @@
+from typing import Annotated
+
+from app.config import (
+    GROUP_MAX_MEMBERS,
+    GROUP_MEMBERS_PAGE_SIZE,
+    GROUP_MEMBERS_PAGE_SIZE_MAX,
+)
+from app.conversation.membership import require_member
+from app.conversation.schemas import Membership
+from app.exceptions.codes import Codes
+from app.exceptions.exceptions import AppException, NoAccessError, NotFoundError
+from app.group.schemas import (
+    GroupCreate,
+    GroupListItem,
+    GroupMemberAdd,
+    GroupMemberEvent,
+    GroupMemberPage,
+    GroupPublic,
+    GroupUpdate,
+)
+from app.models import ConversationType
+from app.repository.conversation import ConversationRepository, get_conversation_repo
+from app.repository.group import GroupRepository, get_group_repo
+from app.repository.user import UserRepository, get_user_repo
+from app.user.dependencies import get_current_user_identity
+from app.user.schemas import UserIdentity
+from app.websocket.events import WSEventType
+from app.websocket.manager import ws_manager
+from fastapi import APIRouter, Depends, Query
+from starlette import status
+
+group_router = APIRouter(prefix="/group")
+
+
+async def require_group_member(group_id: int, user_id: int) -> Membership:
+    membership = await require_member(group_id, user_id)
+    if membership.type != ConversationType.GROUP:
+        raise NotFoundError(entity="group", entity_id=group_id)
+
+    return membership
+
+
+async def require_group_owner(group_id: int, user_id: int) -> Membership:
+    membership = await require_group_member(group_id, user_id)
+    if membership.owner_id != user_id:
+        raise NoAccessError("Only the owner can manage the group")
+
+    return membership
+
+
+def to_group_public(membership: Membership) -> GroupPublic:
+    return GroupPublic(
+        conversation_id=membership.conversation_id,
+        title=membership.title,
+        owner_id=membership.owner_id,
+    )
+
+
+@group_router.post(
+    "",
+    response_model=GroupPublic,
+    status_code=status.HTTP_201_CREATED,
+)
+async def create_group(
+    payload: GroupCreate,
+    current_user: Annotated[UserIdentity, Depends(get_current_user_identity)],
+    group_repo: Annotated[GroupRepository, Depends(get_group_repo)],
+    user_repo: Annotated[UserRepository, Depends(get_user_repo)],
+):
+    tags = set(payload.member_tags) - {current_user.tag}
+    members = await user_repo.get_user_identities_by_tags(list(tags))
+    if len(members) != len(tags):
+        raise NotFoundError(entity="user", entity_id=None)
+
+    member_ids = [member.user_id for member in members]
+    group = await group_repo.insert_group(
+        title=payload.title,
+        owner_id=current_user.user_id,
+        member_ids=member_ids,
+    )
+    await group_repo.commit()
+
+    await ws_manager.send(
+        [current_user.user_id, *member_ids],
+        event_type=WSEventType.GROUP_CREATED,
+        payload=group,
+    )
+
+    return group
+
+
+@group_router.get("", response_model=list[GroupListItem])
+async def get_my_groups(
+    current_user: Annotated[UserIdentity, Depends(get_current_user_identity)],
+    group_repo: Annotated[GroupRepository, Depends(get_group_repo)],
+):
+    return await group_repo.get_groups_by_user_id(current_user.user_id)
+
+
+@group_router.get("/{group_id}", response_model=GroupPublic)
+async def get_group(
+    group_id: int,
+    current_user: Annotated[UserIdentity, Depends(get_current_user_identity)],
+):
+    membership = await require_group_member(group_id, current_user.user_id)
+    return to_group_public(membership)
+
+
+@group_router.patch("/{group_id}", response_model=GroupPublic)
+async def update_group(
+    group_id: int,
+    payload: GroupUpdate,
+    current_user: Annotated[UserIdentity, Depends(get_current_user_identity)],
+    group_repo: Annotated[GroupRepository, Depends(get_group_repo)],
+):
+    membership = await require_group_owner(group_id, current_user.user_id)
+
+    await group_repo.update_title(group_id, payload.title)
+    await group_repo.commit()
+    await ws_manager.membership_changed(group_id)
+
+    group = to_group_public(membership.model_copy(update={"title": payload.title}))
+    await ws_manager.send_to_conversation(
+        group_id,
+        event_type=WSEventType.GROUP_UPDATED,
+        payload=group,
+    )
+
+    return group
+
+
+@group_router.delete(
+    "/{group_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+)
+async def delete_group(
+    group_id: int,
+    current_user: Annotated[UserIdentity, Depends(get_current_user_identity)],
+    group_repo: Annotated[GroupRepository, Depends(get_group_repo)],
+):
+    membership = await require_group_owner(group_id, current_user.user_id)
+
+    await group_repo.delete_group(group_id)
+    await group_repo.commit()
+    await ws_manager.membership_changed(group_id)
+
+    # The members can't be resolved from the conversation anymore
+    await ws_manager.send(
+        membership.member_ids,
+        event_type=WSEventType.GROUP_DELETED,
+        payload={"conversation_id": group_id},
+    )
+
+
+@group_router.get("/{group_id}/members", response_model=GroupMemberPage)
+async def get_group_members(
+    group_id: int,
+    current_user: Annotated[UserIdentity, Depends(get_current_user_identity)],
+    group_repo: Annotated[GroupRepository, Depends(get_group_repo)],
+    limit: Annotated[
+        int, Query(ge=1, le=GROUP_MEMBERS_PAGE_SIZE_MAX)
+    ] = GROUP_MEMBERS_PAGE_SIZE,
+    after: Annotated[int | None, Query(ge=0)] = None,
+):
+    await require_group_member(group_id, current_user.user_id)
+
+    return await group_repo.get_members(group_id, limit=limit, after=after)
+
+
+@group_router.post(
+    "/{group_id}/members",
+    response_model=GroupMemberEvent,
+    status_code=status.HTTP_201_CREATED,
+)
+async def add_group_member(
+    group_id: int,
+    payload: GroupMemberAdd,
+    current_user: Annotated[UserIdentity, Depends(get_current_user_identity)],
+    conversation_repo: Annotated[
+        ConversationRepository, Depends(get_conversation_repo)
+    ],
+    user_repo: Annotated[UserRepository, Depends(get_user_repo)],
+):
+    membership = await require_group_owner(group_id, current_user.user_id)
+    if len(membership.member_ids) >= GROUP_MAX_MEMBERS:
+        raise AppException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            code=Codes.GROUP_IS_FULL,
+            message=f"A group can have at most {GROUP_MAX_MEMBERS} members",
+        )
+
+    user = await user_repo.get_user_identity_by_tag(payload.tag)
+    if not user:
+        raise NotFoundError(entity="user", entity_id=None)
+
+    added = await conversation_repo.add_members(group_id, [user.user_id])
+    if not added:
+        raise AppException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            code=Codes.ALREADY_A_MEMBER,
+            message="The user is already a member of the group",
+        )
+
+    await conversation_repo.commit()
+    await ws_manager.membership_changed(group_id)
+
+    event = GroupMemberEvent(conversation_id=group_id, user_id=user.user_id)
+    await ws_manager.send_to_conversation(
+        group_id,
+        event_type=WSEventType.GROUP_MEMBER_ADDED,
+        payload=event,
+    )
+
+    return event
+
+
+@group_router.delete(
+    "/{group_id}/members/{user_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+)
+async def remove_group_member(
+    group_id: int,
+    user_id: int,
+    current_user: Annotated[UserIdentity, Depends(get_current_user_identity)],
+    conversation_repo: Annotated[
+        ConversationRepository, Depends(get_conversation_repo)
+    ],
+):
+    # Members leave on their own, the owner removes others
+    membership = await require_group_member(group_id, current_user.user_id)
+    if user_id != current_user.user_id and membership.owner_id != current_user.user_id:
+        raise NoAccessError("Only the owner can remove other members")
+
+    if user_id == membership.owner_id:
+        raise AppException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            code=Codes.INVALID_OPERATION,
+            message="The owner can't leave the group, delete it instead",
+        )
+
+    if not await conversation_repo.remove_member(group_id, user_id):
+        raise NotFoundError(entity="member", entity_id=user_id)
+
+    await conversation_repo.commit()
+    await ws_manager.membership_changed(group_id)
+
+    event = GroupMemberEvent(conversation_id=group_id, user_id=user_id)
+    await ws_manager.send_to_conversation(
+        group_id,
+        event_type=WSEventType.GROUP_MEMBER_REMOVED,
+        payload=event,
+    )
+    await ws_manager.send(
+        (user_id,),
+        event_type=WSEventType.GROUP_MEMBER_REMOVED,
+        payload=event,
+    )
@@ -0,0 +1,54 @@
+from datetime import datetime
+from typing import List
+
+from app.config import GROUP_MAX_MEMBERS
+from app.message.schemas import MessagePreview
+from app.models import MemberRole
+from app.schemas import GeneralSchema
+from pydantic import Field
+
+
+class GroupCreate(GeneralSchema):
+    title: str = Field(..., min_length=1, max_length=255)
+    # Tags of the members besides the creator
+    member_tags: List[str] = Field(default=[], max_length=GROUP_MAX_MEMBERS - 1)
+
+
+class GroupUpdate(GeneralSchema):
+    title: str = Field(..., min_length=1, max_length=255)
+
+
+class GroupPublic(GeneralSchema):
+    conversation_id: int
+    title: str | None
+    owner_id: int | None
+
+
+class GroupListItem(GroupPublic):
+    last_message: MessagePreview | None = None
+    last_activity_at: datetime
+    last_read_message_id: int | None = None
+    unread_count: int = 0
+
+
+class GroupMemberAdd(GeneralSchema):
+    tag: str
+
+
+class GroupMemberPublic(GeneralSchema):
+    user_id: int
+    tag: str
+    first_name: str
+    surname: str
+    role: MemberRole
+    joined_at: datetime
+
+
+class GroupMemberPage(GeneralSchema):
+    items: List[GroupMemberPublic]
+    next_cursor: int | None = None
+
+
+class GroupMemberEvent(GeneralSchema):
+    conversation_id: int
+    user_id: int
@@ -1,8 +1,24 @@
+import atexit
+import json
 import logging
+import queue
 import sys
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
 
-LOG_DIR = Path("logs")
+from app.config import (
+    LOG_BACKUP_COUNT,
+    LOG_DEDUPE_SECONDS,
+    LOG_DIRECTORY,
+    LOG_JSON,
+    LOG_LEVEL,
+    LOG_MAX_BYTES,
+    LOG_QUEUE_SIZE,
+)
+
+LOG_DIR = Path(LOG_DIRECTORY)
 LOG_DIR.mkdir(exist_ok=True)
 
 ERROR_LOG_FILE = LOG_DIR / "error.log"
@@ -11,30 +27,169 @@ APP_LOG_FILE = LOG_DIR / "app.log"
 LOG_FORMAT = "[%(asctime)s] [%(levelname)s] %(name)s: %(message)s"
 DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
 
+# Attributes every LogRecord has, anything else was passed in `extra`
+_RECORD_ATTRIBUTES = frozenset(
+    logging.LogRecord("", 0, "", 0, "", None, None).__dict__
+) | {"message", "asctime", "suppressed"}
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line, with the `extra` fields of the call."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(
+            (key, value)
+            for key, value in record.__dict__.items()
+            if key not in _RECORD_ATTRIBUTES
+        )
+        if getattr(record, "suppressed", 0):
+            entry["suppressed"] = record.suppressed
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        if getattr(record, "suppressed", 0):
+            line += f" ({record.suppressed} similar messages suppressed)"
+        return line
+
+
+class DuplicateFilter(logging.Filter):
+    """
+    Lets the same message from the same logger through once per `window`
+    seconds. The next one after the window carries the number of copies
+    that were dropped, as `suppressed`.
+    """
+
+    MAX_KEYS = 1000
+
+    def __init__(self, window: float) -> None:
+        super().__init__()
+        self.window = window
+        # (logger, level, message) -> (last emitted at, dropped since)
+        self._seen: dict[tuple[str, int, str], tuple[float, int]] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.window <= 0:
+            return True
+
+        now = time.monotonic()
+        key = (record.name, record.levelno, record.getMessage())
+        seen = self._seen.get(key)
+        if seen is not None and now - seen[0] < self.window:
+            self._seen[key] = (seen[0], seen[1] + 1)
+            return False
+
+        if seen is not None and seen[1]:
+            record.suppressed = seen[1]
+        if len(self._seen) >= self.MAX_KEYS:
+            self._forget(now)
+        self._seen[key] = (now, 0)
+        return True
+
+    def _forget(self, now: float) -> None:
+        # Drops the keys whose window is over, their counts with them
+        self._seen = {
+            key: seen
+            for key, seen in self._seen.items()
+            if now - seen[0] < self.window
+        }
 
-def setup_logger(name: str) -> logging.Logger:
-    logger = logging.getLogger(name)
-    logger.setLevel(logging.INFO)
-    logger.propagate = False
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Hands records to the listener thread, which formats and writes them,
+    so logging never waits for a disk or a pipe. When the queue is full
+    records are dropped and counted instead.
+    """
+
+    def __init__(self, log_queue: queue.Queue) -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Like the base class, but the formatting is left to the listener's
+        # handlers: only what can't cross threads is resolved here
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _create_formatter() -> logging.Formatter:
+    if LOG_JSON:
+        return JSONFormatter()
+    return TextFormatter(LOG_FORMAT, datefmt=DATE_FORMAT)
+
+
+def _create_queue_handler() -> NonBlockingQueueHandler:
+    formatter = _create_formatter()
 
     # STDOUT handler
     stdout_handler = logging.StreamHandler(sys.stdout)
-    stdout_handler.setLevel(logging.INFO)
-    stdout_handler.setFormatter(logging.Formatter(LOG_FORMAT, datefmt=DATE_FORMAT))
+    stdout_handler.setFormatter(formatter)
 
     # Info logs
-    file_handler = logging.FileHandler(APP_LOG_FILE)
-    file_handler.setLevel(logging.INFO)
-    file_handler.setFormatter(logging.Formatter(LOG_FORMAT, datefmt=DATE_FORMAT))
+    file_handler = RotatingFileHandler(
+        APP_LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT
+    )
+    file_handler.setFormatter(formatter)
 
     # Error logs
-    error_file_handler = logging.FileHandler(ERROR_LOG_FILE)
+    error_file_handler = RotatingFileHandler(
+        ERROR_LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT
+    )
     error_file_handler.setLevel(logging.ERROR)
-    error_file_handler.setFormatter(logging.Formatter(LOG_FORMAT, datefmt=DATE_FORMAT))
+    error_file_handler.setFormatter(formatter)
+
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+    handler.addFilter(DuplicateFilter(LOG_DEDUPE_SECONDS))
+
+    listener = QueueListener(
+        handler.queue,
+        stdout_handler,
+        file_handler,
+        error_file_handler,
+        respect_handler_level=True,
+    )
+    listener.start()
+    # Writes out what is still queued
+    atexit.register(listener.stop)
+    return handler
+
+
+queue_handler = _create_queue_handler()
+
+
+def setup_logger(name: str) -> logging.Logger:
+    logger = logging.getLogger(name)
+    logger.setLevel(LOG_LEVEL)
+    logger.propagate = False
 
-    if not logger.handlers:
-        logger.addHandler(stdout_handler)
-        logger.addHandler(file_handler)
-        logger.addHandler(error_file_handler)
+    if queue_handler not in logger.handlers:
+        logger.addHandler(queue_handler)
 
     return logger
@@ -7,10 +7,15 @@ from fastapi.middleware.cors import CORSMiddleware
 # from pydantic import ValidationError
 from sqlalchemy.exc import SQLAlchemyError
 
+from app.auth.denylist import session_denylist
+from app.auth.hashing import password_hasher
 from app.auth.router import auth_router
+from app.config import REQUEST_TIMING_ENABLED
+from app.chat.read_cursor import read_cursor_buffer
 from app.chat.router import chat_router
 from app.db import start_db, stop_db
 from app.exceptions.exceptions import AppException
+from app.group.router import group_router
 from app.exceptions.handlers import (
     handle_app_exception,
     handle_global_exception,
@@ -20,15 +25,29 @@ from app.exceptions.handlers import (
     # handle_validation_error,
     handle_value_error,
 )
-from app.message.router import message_router, reaction_router
+from app.message.coalescer import message_coalescer
+from app.message.router import message_router, reaction_router, search_router
+from app.metrics.middleware import HTTPMetricsMiddleware
+from app.metrics.router import metrics_router
+from app.metrics.timing import RequestTimingMiddleware
 from app.user.router import user_router
+from app.websocket.manager import ws_manager
 from app.websocket.router import ws_router
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await start_db()
+    await session_denylist.start()
+    await ws_manager.start()
+    await read_cursor_buffer.start()
     yield
+    if message_coalescer is not None:
+        await message_coalescer.stop()
+    await read_cursor_buffer.stop()
+    await ws_manager.stop()
+    await session_denylist.stop()
+    password_hasher.shutdown()
     await stop_db()
 
 
@@ -51,13 +70,19 @@ app.add_middleware(
     allow_methods=["GET", "POST", "OPTION", "PUT", "DELETE", "PATCH"],
     allow_headers=["*"],
 )
+if REQUEST_TIMING_ENABLED:
+    app.add_middleware(RequestTimingMiddleware)
+app.add_middleware(HTTPMetricsMiddleware)
 
 app.include_router(auth_router, prefix="/api/v1")
 app.include_router(user_router, prefix="/api/v1")
 app.include_router(chat_router, prefix="/api/v1")
+app.include_router(group_router, prefix="/api/v1")
+app.include_router(search_router, prefix="/api/v1")
 app.include_router(message_router, prefix="/api/v1")
 app.include_router(reaction_router, prefix="/api/v1")
 app.include_router(ws_router)
+app.include_router(metrics_router)
 
 
 app.exception_handler(AppException)(handle_app_exception)
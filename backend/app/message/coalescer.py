@@ -0,0 +1,157 @@
+import asyncio
+import contextlib
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import (
+    MESSAGE_COALESCE_ENABLED,
+    MESSAGE_COALESCE_MAX_BATCH,
+    MESSAGE_COALESCE_WINDOW_MS,
+)
+from app.db import async_session_maker
+from app.exceptions.exceptions import AppException, NotFoundError
+from app.logger import setup_logger
+from app.message.schemas import MessagePublic
+from app.repository.message import MessageRepository, check_conversation_access
+
+logger = setup_logger(__name__)
+
+
+class MessageWriteCoalescer:
+    """
+    Writes concurrent single sends together: the first send of a batch
+    waits up to `window` seconds for others, then the batch is inserted
+    with one statement and committed in one transaction. Sends to any
+    conversation share a batch, a batch of one conversation is the
+    special case of a busy one.
+
+    A failed batch fails all of its sends, except for senders that are no
+    longer members of their conversation (or were deleted, or whose
+    conversation was), which only fail their own sends.
+    """
+
+    def __init__(
+        self,
+        window: float,
+        max_batch: int,
+        session_maker: async_sessionmaker[AsyncSession] = async_session_maker,
+    ) -> None:
+        self.window = window
+        self.max_batch = max_batch
+        self.session_maker = session_maker
+
+        self._pending: list[tuple[int, int, str, asyncio.Future[MessagePublic]]] = []
+        self._full = asyncio.Event()
+        self._flusher: asyncio.Task | None = None
+        self._writes: set[asyncio.Task] = set()
+
+    async def stop(self) -> None:
+        if self._flusher is not None:
+            self._flusher.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._flusher
+            self._flusher = None
+
+        while self._pending:
+            self._write(self._take_batch())
+        if self._writes:
+            await asyncio.gather(*self._writes, return_exceptions=True)
+
+    async def submit(
+        self, conversation_id: int, user_id: int, text: str
+    ) -> MessagePublic:
+        """Returns once the message is committed."""
+        future: asyncio.Future[MessagePublic] = (
+            asyncio.get_running_loop().create_future()
+        )
+        self._pending.append((conversation_id, user_id, text, future))
+
+        if len(self._pending) >= self.max_batch:
+            self._full.set()
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_after_window())
+
+        return await future
+
+    async def _flush_after_window(self) -> None:
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(self._full.wait(), timeout=self.window)
+
+        self._flusher = None
+        self._write(self._take_batch())
+        while len(self._pending) >= self.max_batch:
+            self._write(self._take_batch())
+
+        if self._pending:
+            self._flusher = asyncio.create_task(self._flush_after_window())
+
+    def _take_batch(self) -> list[tuple[int, int, str, asyncio.Future[MessagePublic]]]:
+        batch = self._pending[:self.max_batch]
+        self._pending = self._pending[self.max_batch:]
+        if len(self._pending) < self.max_batch:
+            self._full.clear()
+        return batch
+
+    def _write(self, batch) -> None:
+        # Runs on its own, so the next batch starts filling meanwhile
+        if not batch:
+            return
+
+        task = asyncio.create_task(self._insert(batch))
+        self._writes.add(task)
+        task.add_done_callback(self._writes.discard)
+
+    async def _insert(self, batch) -> None:
+        try:
+            async with self.session_maker() as session:
+                messages = await MessageRepository(session).insert_messages(
+                    [(cid, uid, text) for cid, uid, text, _ in batch]
+                )
+                errors = await self._check_rejected(session, batch, messages)
+        except Exception as e:
+            logger.exception(f"Failed to write a batch of {len(batch)} messages")
+            for *_, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (conversation_id, user_id, _, future), message in zip(batch, messages):
+            if future.done():
+                # The sender went away, the message is written anyway
+                continue
+
+            if message is None:
+                future.set_exception(errors[(conversation_id, user_id)])
+            else:
+                future.set_result(message)
+
+    async def _check_rejected(
+        self, session: AsyncSession, batch, messages
+    ) -> dict[tuple[int, int], AppException]:
+        """Why the sends that were not inserted were rejected."""
+        errors: dict[tuple[int, int], AppException] = {}
+        for (conversation_id, user_id, _, _), message in zip(batch, messages):
+            key = (conversation_id, user_id)
+            if message is not None or key in errors:
+                continue
+
+            try:
+                await check_conversation_access(session, conversation_id, user_id)
+                # Deleted between the insert and the check
+                errors[key] = NotFoundError(
+                    entity="conversation", entity_id=conversation_id
+                )
+            except AppException as e:
+                errors[key] = e
+
+        return errors
+
+
+message_coalescer = (
+    MessageWriteCoalescer(
+        window=MESSAGE_COALESCE_WINDOW_MS / 1000,
+        max_batch=MESSAGE_COALESCE_MAX_BATCH,
+    )
+    if MESSAGE_COALESCE_ENABLED
+    else None
+)
@@ -1,30 +1,50 @@
 from typing import Annotated
 
+from app.chat.read_cursor import read_cursor_buffer
+from app.config import (
+    MESSAGE_PAGE_SIZE,
+    MESSAGE_PAGE_SIZE_MAX,
+    REACTORS_PAGE_SIZE,
+    REACTORS_PAGE_SIZE_MAX,
+    SEARCH_PAGE_SIZE,
+    SEARCH_PAGE_SIZE_MAX,
+    SEARCH_QUERY_MAX_LENGTH,
+)
+from app.conversation.membership import membership_cache, require_member
 from app.exceptions.codes import Codes
 from app.exceptions.exceptions import AppException, NotFoundError
+from app.message import service as message_service
 from app.message.schemas import (
+    MessageBatchCreate,
+    MessageBatchPublic,
     MessageCreate,
     MessageEdit,
+    MessagePage,
     MessagePublic,
+    MessageSearchPage,
     ReactionCreate,
+    ReactionRemovedPayload,
+    ReactionType,
+    ReactorPage,
+)
+from app.repository.message import (
+    MessageRepository,
+    decode_search_cursor,
+    get_message_repo,
 )
-from app.repository.chat import ChatRepository, get_chat_repo
-from app.repository.message import MessageRepository, get_message_repo
 from app.repository.reaction import ReactionRepository, get_reaction_repo
 from app.schemas import OkResponse
-from app.user.dependencies import get_current_user_by_token
-from app.user.schemas import UserRead
+from app.user.dependencies import get_current_user_identity
+from app.user.schemas import UserIdentity
 from app.websocket.events import WSEventType
 from app.websocket.manager import ws_manager
-from app.websocket.schemas import (
-    NewMessageNotificationPayload,
-    NewReactionNotificationPayload,
-)
-from fastapi import APIRouter, Depends
+from app.websocket.schemas import NewMessageNotificationPayload
+from fastapi import APIRouter, Depends, Query
 from starlette import status
 
 message_router = APIRouter(prefix="/chat/{chat_id}/message")
 reaction_router = APIRouter(prefix="/message/{message_id}/reaction")
+search_router = APIRouter(prefix="/message/search")
 
 
 @message_router.post(
@@ -35,76 +55,96 @@ reaction_router = APIRouter(prefix="/message/{message_id}/reaction")
 async def send_message(
     chat_id: int,
     data: MessageCreate,
-    current_user: Annotated[UserRead, Depends(get_current_user_by_token)],
+    current_user: Annotated[UserIdentity, Depends(get_current_user_identity)],
     message_repo: Annotated[MessageRepository, Depends(get_message_repo)],
-    chat_repo: Annotated[ChatRepository, Depends(get_chat_repo)],
 ):
-    chat = await chat_repo.get_chat_by_id(chat_id)
-    if not chat:
-        raise NotFoundError(entity="chat", entity_id=chat_id)
+    return await message_service.send_message(
+        message_repo, current_user, conversation_id=chat_id, text=data.text
+    )
 
-    if current_user.user_id != chat.user_id and current_user.user_id != chat.user_id2:
-        raise AppException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            message="You are not a participant of the chat",
-            code=Codes.NO_ACCESS,
-        )
 
-    message_public = await message_repo.create_message(
-        conversation_id=chat_id,
-        user_id=current_user.user_id,
-        text=data.text,
+@message_router.post(
+    path="/batch",
+    response_model=MessageBatchPublic,
+    status_code=status.HTTP_201_CREATED,
+)
+async def send_messages(
+    chat_id: int,
+    data: MessageBatchCreate,
+    current_user: Annotated[UserIdentity, Depends(get_current_user_identity)],
+    message_repo: Annotated[MessageRepository, Depends(get_message_repo)],
+):
+    membership = await require_member(chat_id, current_user.user_id)
+
+    # One statement and one transaction for the whole batch
+    messages = await message_repo.insert_messages(
+        [(chat_id, current_user.user_id, message.text) for message in data.messages]
+    )
+    if None in messages:
+        # The cached members were stale
+        membership_cache.invalidate(chat_id)
+        await message_repo.check_access(chat_id, current_user.user_id)
+        raise NotFoundError(entity="conversation", entity_id=chat_id)
+
+    await message_repo.commit()
+
+    read_cursor_buffer.mark_sent(
+        current_user.user_id, chat_id, messages[-1].message_id
     )
 
-    for user_id in (chat.user_id, chat.user_id2):
-        await ws_manager.send_to_user(
-            user_id,
+    for message_public in messages:
+        await ws_manager.send_to_conversation(
+            chat_id,
             event_type=WSEventType.MESSAGE_CREATED,
-            str_payload=message_public.model_dump_json(),
+            payload=message_public,
         )
 
+    # One notification per batch
     notification = NewMessageNotificationPayload(
-        chat_name=chat.title or "",
+        chat_name=membership.title or "",
         sender_tag=current_user.tag,
-        text=data.text,
+        text=data.messages[-1].text,
+    )
+    await ws_manager.send_to_conversation(
+        chat_id,
+        event_type=WSEventType.NOTIFICATION,
+        payload=notification,
+        exclude_user_id=current_user.user_id,
     )
-    for user_id in (chat.user_id, chat.user_id2):
-        if user_id == current_user.user_id:
-            continue
-
-        await ws_manager.send_to_user(
-            user_id,
-            event_type=WSEventType.NOTIFICATION,
-            payload=notification.model_dump(),
-        )
 
-    return message_public
+    return MessageBatchPublic(items=messages)
 
 
 @message_router.get(
     path="",
-    response_model=list[MessagePublic],
+    response_model=MessagePage,
     status_code=status.HTTP_200_OK,
 )
 async def get_messages(
     chat_id: int,
-    current_user: Annotated[UserRead, Depends(get_current_user_by_token)],
+    current_user: Annotated[UserIdentity, Depends(get_current_user_identity)],
     message_repo: Annotated[MessageRepository, Depends(get_message_repo)],
-    chat_repo: Annotated[ChatRepository, Depends(get_chat_repo)],
+    limit: Annotated[
+        int, Query(ge=1, le=MESSAGE_PAGE_SIZE_MAX)
+    ] = MESSAGE_PAGE_SIZE,
+    before: Annotated[int | None, Query(ge=1)] = None,
+    after: Annotated[int | None, Query(ge=0)] = None,
 ):
-    chat = await chat_repo.get_chat_by_id(chat_id)
-    if not chat:
-        raise NotFoundError(entity="chat", entity_id=chat_id)
-
-    if current_user.user_id not in (chat.user_id, chat.user_id2):
+    if before is not None and after is not None:
         raise AppException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            message="You are not a participant of the chat",
-            code=Codes.NO_ACCESS,
+            status_code=status.HTTP_400_BAD_REQUEST,
+            message="Only one of 'before' and 'after' can be given",
+            code=Codes.BAD_VALUE,
         )
 
+    await require_member(chat_id, current_user.user_id)
+
     return await message_repo.get_messages_by_chat_id(
         conversation_id=chat_id,
+        viewer_id=current_user.user_id,
+        limit=limit,
+        before=before,
+        after=after,
     )
 
 
@@ -117,47 +157,13 @@ async def edit_message(
     chat_id: int,
     message_id: int,
     data: MessageEdit,
-    current_user: Annotated[UserRead, Depends(get_current_user_by_token)],
+    current_user: Annotated[UserIdentity, Depends(get_current_user_identity)],
     message_repo: Annotated[MessageRepository, Depends(get_message_repo)],
-    chat_repo: Annotated[ChatRepository, Depends(get_chat_repo)],
 ):
-    message = await message_repo.get_message_by_id(message_id)
-    if not message:
-        raise NotFoundError(entity="message", entity_id=message_id)
-
-    chat = await chat_repo.get_chat_by_id(message.conversation_id)
-    if not chat:
-        raise NotFoundError(entity="chat", entity_id=message.conversation_id)
-
-    if current_user.user_id not in (chat.user_id, chat.user_id2):
-        raise AppException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            message="You are not a participant of the chat",
-            code=Codes.NO_ACCESS,
-        )
-
-    if message.user_id != current_user.user_id:
-        raise AppException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            message="You can edit only your own messages",
-            code=Codes.NO_ACCESS,
-        )
-
-    message_public = await message_repo.edit_message(
-        message_id=message_id,
-        user_id=current_user.user_id,
-        new_text=data.text,
+    return await message_service.edit_message(
+        message_repo, current_user, message_id=message_id, text=data.text
     )
 
-    for user_id in (chat.user_id, chat.user_id2):
-        await ws_manager.send_to_user(
-            user_id,
-            event_type=WSEventType.MESSAGE_UPDATED,
-            str_payload=message_public.model_dump_json(),
-        )
-
-    return message_public
-
 
 @message_router.delete(
     path="/{message_id}",
@@ -165,44 +171,45 @@ async def edit_message(
 )
 async def delete_message(
     message_id: int,
-    current_user: Annotated[UserRead, Depends(get_current_user_by_token)],
+    current_user: Annotated[UserIdentity, Depends(get_current_user_identity)],
     message_repo: Annotated[MessageRepository, Depends(get_message_repo)],
-    chat_repo: Annotated[ChatRepository, Depends(get_chat_repo)],
 ):
-    message = await message_repo.get_message_by_id(message_id)
-    if not message:
-        raise NotFoundError(entity="message", entity_id=message_id)
-
-    chat = await chat_repo.get_chat_by_id(message.conversation_id)
-    if not chat:
-        raise NotFoundError(entity="chat", entity_id=message.conversation_id)
+    conversation_id = await message_repo.delete_message(
+        message_id=message_id,
+        user_id=current_user.user_id,
+    )
+    await message_repo.commit()
 
-    if current_user.user_id not in (chat.user_id, chat.user_id2):
-        raise AppException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            message="You are not a participant of the chat",
-            code=Codes.NO_ACCESS,
-        )
+    await ws_manager.send_to_conversation(
+        conversation_id,
+        event_type=WSEventType.MESSAGE_DELETED,
+        payload={"message_id": message_id},
+    )
 
-    if message.user_id != current_user.user_id:
-        raise AppException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            message="You can delete only your own messages",
-            code=Codes.NO_ACCESS,
-        )
 
-    await message_repo.delete_message(
+@reaction_router.get(
+    path="",
+    response_model=ReactorPage,
+    status_code=status.HTTP_200_OK,
+)
+async def get_reactors(
+    message_id: int,
+    current_user: Annotated[UserIdentity, Depends(get_current_user_identity)],
+    reaction_repo: Annotated[ReactionRepository, Depends(get_reaction_repo)],
+    reaction_type: ReactionType | None = None,
+    limit: Annotated[
+        int, Query(ge=1, le=REACTORS_PAGE_SIZE_MAX)
+    ] = REACTORS_PAGE_SIZE,
+    after: Annotated[int | None, Query(ge=0)] = None,
+):
+    return await reaction_repo.get_reactors(
         message_id=message_id,
         user_id=current_user.user_id,
+        limit=limit,
+        after=after,
+        reaction_type=reaction_type,
     )
 
-    for user_id in (chat.user_id, chat.user_id2):
-        await ws_manager.send_to_user(
-            user_id,
-            event_type=WSEventType.MESSAGE_DELETED,
-            payload={"message_id": message_id},
-        )
-
 
 @reaction_router.post(
     path="",
@@ -212,56 +219,16 @@ async def delete_message(
 async def add_reaction(
     message_id: int,
     data: ReactionCreate,
-    current_user: Annotated[UserRead, Depends(get_current_user_by_token)],
+    current_user: Annotated[UserIdentity, Depends(get_current_user_identity)],
     reaction_repo: Annotated[ReactionRepository, Depends(get_reaction_repo)],
-    chat_repo: Annotated[ChatRepository, Depends(get_chat_repo)],
-    message_repo: Annotated[MessageRepository, Depends(get_message_repo)],
 ):
-    message = await message_repo.get_message_by_id(message_id)
-    if not message:
-        raise NotFoundError("message", message_id)
-
-    chat = await chat_repo.get_chat_by_id(message.conversation_id)
-    if not chat:
-        raise NotFoundError("chat", message.conversation_id)
-
-    if current_user.user_id not in (chat.user_id, chat.user_id2):
-        raise AppException(
-            status_code=403,
-            message="You are not a participant of the chat",
-            code=Codes.NO_ACCESS,
-        )
-
-    reaction_public = await reaction_repo.add_reaction(
+    await message_service.add_reaction(
+        reaction_repo,
+        current_user,
         message_id=message_id,
-        user_id=current_user.user_id,
         reaction_type=data.reaction_type,
     )
 
-    for user_id in (chat.user_id, chat.user_id2):
-        await ws_manager.send_to_user(
-            user_id,
-            event_type=WSEventType.REACTION_ADDED,
-            payload=reaction_public.model_dump(),
-        )
-
-    notification = NewReactionNotificationPayload(
-        chat_name=chat.title or "",
-        sender_tag=current_user.tag,
-        reaction_type=data.reaction_type,
-    )
-
-    if message.user_id != current_user.user_id:
-        for user_id in (chat.user_id, chat.user_id2):
-            if user_id != message.user_id:
-                continue
-
-            await ws_manager.send_to_user(
-                user_id,
-                event_type=WSEventType.NOTIFICATION,
-                payload=notification.model_dump(),
-            )
-
     return OkResponse(ok=True)
 
 
@@ -272,50 +239,62 @@ async def add_reaction(
 async def remove_reaction(
     message_id: int,
     reaction_id: int,
-    current_user: Annotated[UserRead, Depends(get_current_user_by_token)],
+    current_user: Annotated[UserIdentity, Depends(get_current_user_identity)],
     reaction_repo: Annotated[ReactionRepository, Depends(get_reaction_repo)],
-    chat_repo: Annotated[ChatRepository, Depends(get_chat_repo)],
-    message_repo: Annotated[MessageRepository, Depends(get_message_repo)],
 ):
-    message = await message_repo.get_message_by_id(message_id)
-    if not message:
-        raise NotFoundError("message", message_id)
-
-    chat = await chat_repo.get_chat_by_id(message.conversation_id)
-    if not chat:
-        raise NotFoundError("chat", message.conversation_id)
-
-    if current_user.user_id not in (chat.user_id, chat.user_id2):
-        raise AppException(
-            status_code=403,
-            message="You are not a participant of the chat",
-            code=Codes.NO_ACCESS,
-        )
-
-    reaction = await reaction_repo.get_reaction_by_id(reaction_id)
-    if not reaction:
-        raise NotFoundError("reaction", reaction_id)
-
-    if reaction.user_id != current_user.user_id:
-        raise AppException(
-            status_code=403,
-            message="You can remove only your own reactions",
-            code=Codes.NO_ACCESS,
-        )
-
-    await reaction_repo.remove_reaction(
+    conversation_id, reaction_type = await reaction_repo.remove_reaction(
         message_id=message_id,
         user_id=current_user.user_id,
         reaction_id=reaction_id,
     )
+    await reaction_repo.commit()
+
+    await ws_manager.send_to_conversation(
+        conversation_id,
+        event_type=WSEventType.REACTION_REMOVED,
+        payload=ReactionRemovedPayload(
+            message_id=message_id,
+            user_id=current_user.user_id,
+            reaction_id=reaction_id,
+            reaction_type=reaction_type,
+        ),
+    )
 
-    for user_id in (chat.user_id, chat.user_id2):
-        await ws_manager.send_to_user(
-            user_id,
-            event_type=WSEventType.REACTION_REMOVED,
-            payload={
-                "message_id": message_id,
-                "user_id": current_user.user_id,
-                "reaction_id": reaction_id,
-            },
-        )
+
+@search_router.get(
+    path="",
+    response_model=MessageSearchPage,
+    status_code=status.HTTP_200_OK,
+)
+async def search_messages(
+    current_user: Annotated[UserIdentity, Depends(get_current_user_identity)],
+    message_repo: Annotated[MessageRepository, Depends(get_message_repo)],
+    q: Annotated[
+        str, Query(min_length=1, max_length=SEARCH_QUERY_MAX_LENGTH)
+    ],
+    chat_id: int | None = None,
+    limit: Annotated[
+        int, Query(ge=1, le=SEARCH_PAGE_SIZE_MAX)
+    ] = SEARCH_PAGE_SIZE,
+    cursor: str | None = None,
+):
+    after = None
+    if cursor is not None:
+        try:
+            after = decode_search_cursor(cursor)
+        except ValueError:
+            raise AppException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                message="Invalid cursor",
+                code=Codes.BAD_VALUE,
+            )
+
+    # Only conversations of the current user are searched, chat_id narrows
+    # it down
+    return await message_repo.search_messages(
+        user_id=current_user.user_id,
+        query=q,
+        limit=limit,
+        conversation_id=chat_id,
+        after=after,
+    )
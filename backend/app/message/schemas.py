@@ -2,6 +2,7 @@ from datetime import datetime
 from enum import Enum
 from typing import List
 
+from app.config import MESSAGE_BATCH_MAX
 from app.schemas import GeneralSchema
 from pydantic import Field
 
@@ -14,6 +15,12 @@ class MessageCreate(GeneralSchema):
     )
 
 
+class MessageBatchCreate(GeneralSchema):
+    messages: List[MessageCreate] = Field(
+        ..., min_length=1, max_length=MESSAGE_BATCH_MAX
+    )
+
+
 class MessageEdit(GeneralSchema):
     text: str = Field(
         ...,
@@ -44,6 +51,28 @@ class ReactionPublic(GeneralSchema):
         from_attributes = True
 
 
+class ReactionSummary(GeneralSchema):
+    reaction_type: ReactionType
+    count: int
+    reacted_by_me: bool = False
+    # To remove the reaction without listing reactors
+    my_reaction_id: int | None = None
+
+
+class Reactor(GeneralSchema):
+    reaction_id: int
+    reaction_type: ReactionType
+    user_id: int
+    tag: str
+    first_name: str
+    surname: str
+
+
+class ReactorPage(GeneralSchema):
+    items: List[Reactor]
+    next_cursor: int | None = None
+
+
 class MessagePublic(GeneralSchema):
     message_id: int
     text: str
@@ -51,7 +80,42 @@ class MessagePublic(GeneralSchema):
     created_at: datetime
     is_edited: bool
     conversation_id: int
-    reactions: List[ReactionPublic] = []
+    # Aggregated per type; who reacted is listed by the reactors endpoint
+    reactions: List[ReactionSummary] = []
 
     class Config:
         from_attributes = True
+
+
+class MessagePage(GeneralSchema):
+    items: List[MessagePublic]
+    next_cursor: int | None = None
+
+
+class ReactionRemovedPayload(GeneralSchema):
+    message_id: int
+    user_id: int
+    reaction_id: int
+    reaction_type: ReactionType
+
+
+class MessageBatchPublic(GeneralSchema):
+    items: List[MessagePublic]
+
+
+class MessagePreview(GeneralSchema):
+    message_id: int
+    text: str
+    user_id: int
+    created_at: datetime
+
+
+class MessageSearchHit(GeneralSchema):
+    message: MessagePublic
+    snippet: str
+    rank: float
+
+
+class MessageSearchPage(GeneralSchema):
+    items: List[MessageSearchHit]
+    next_cursor: str | None = None
@@ -0,0 +1,126 @@
+from app.chat.read_cursor import read_cursor_buffer
+from app.conversation.membership import membership_cache, require_member
+from app.exceptions.exceptions import NoAccessError, NotFoundError
+from app.message.coalescer import message_coalescer
+from app.message.schemas import MessagePublic, ReactionPublic, ReactionType
+from app.repository.message import MessageRepository
+from app.repository.reaction import ReactionRepository
+from app.user.schemas import UserIdentity
+from app.websocket.events import WSEventType
+from app.websocket.manager import ws_manager
+from app.websocket.schemas import (
+    NewMessageNotificationPayload,
+    NewReactionNotificationPayload,
+)
+
+# Shared by the HTTP routes and the websocket commands. Each one commits
+# before publishing its events, so nobody is told about an uncommitted write.
+
+
+async def send_message(
+    message_repo: MessageRepository,
+    current_user: UserIdentity,
+    conversation_id: int,
+    text: str,
+) -> MessagePublic:
+    membership = await require_member(conversation_id, current_user.user_id)
+
+    # The insert checks membership again, the cached members may be stale
+    try:
+        if message_coalescer is not None:
+            message_public = await message_coalescer.submit(
+                conversation_id=conversation_id,
+                user_id=current_user.user_id,
+                text=text,
+            )
+        else:
+            message_public = await message_repo.create_message(
+                conversation_id=conversation_id,
+                user_id=current_user.user_id,
+                text=text,
+            )
+            await message_repo.commit()
+    except (NoAccessError, NotFoundError):
+        membership_cache.invalidate(conversation_id)
+        raise
+
+    read_cursor_buffer.mark_sent(
+        current_user.user_id, conversation_id, message_public.message_id
+    )
+
+    await ws_manager.send_to_conversation(
+        conversation_id,
+        event_type=WSEventType.MESSAGE_CREATED,
+        payload=message_public,
+    )
+
+    notification = NewMessageNotificationPayload(
+        chat_name=membership.title or "",
+        sender_tag=current_user.tag,
+        text=text,
+    )
+    await ws_manager.send_to_conversation(
+        conversation_id,
+        event_type=WSEventType.NOTIFICATION,
+        payload=notification,
+        exclude_user_id=current_user.user_id,
+    )
+
+    return message_public
+
+
+async def edit_message(
+    message_repo: MessageRepository,
+    current_user: UserIdentity,
+    message_id: int,
+    text: str,
+) -> MessagePublic:
+    # Membership and authorship are checked by the update itself
+    message_public = await message_repo.edit_message(
+        message_id=message_id,
+        user_id=current_user.user_id,
+        new_text=text,
+    )
+    await message_repo.commit()
+
+    await ws_manager.send_to_conversation(
+        message_public.conversation_id,
+        event_type=WSEventType.MESSAGE_UPDATED,
+        payload=message_public,
+    )
+
+    return message_public
+
+
+async def add_reaction(
+    reaction_repo: ReactionRepository,
+    current_user: UserIdentity,
+    message_id: int,
+    reaction_type: ReactionType,
+) -> ReactionPublic:
+    reaction_public, conversation, author_id = await reaction_repo.add_reaction(
+        message_id=message_id,
+        user_id=current_user.user_id,
+        reaction_type=reaction_type,
+    )
+    await reaction_repo.commit()
+
+    await ws_manager.send_to_conversation(
+        conversation.conversation_id,
+        event_type=WSEventType.REACTION_ADDED,
+        payload=reaction_public,
+    )
+
+    if author_id != current_user.user_id:
+        notification = NewReactionNotificationPayload(
+            chat_name=conversation.title or "",
+            sender_tag=current_user.tag,
+            reaction_type=reaction_type,
+        )
+        await ws_manager.send(
+            (author_id,),
+            event_type=WSEventType.NOTIFICATION,
+            payload=notification,
+        )
+
+    return reaction_public
@@ -0,0 +1,60 @@
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.metrics.registry import Counter, Gauge, Histogram, registry
+
+http_requests_total = registry.register(Counter(
+    "http_requests_total",
+    "HTTP requests by route template and status.",
+    ("method", "route", "status"),
+))
+http_request_duration_seconds = registry.register(Histogram(
+    "http_request_duration_seconds",
+    "HTTP request duration until the response is sent.",
+    ("method", "route"),
+))
+http_requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight",
+    "HTTP requests being handled.",
+))
+
+
+class HTTPMetricsMiddleware:
+    """
+    Records requests per route template ("/api/v1/chat/{chat_id}"), not per
+    path, so the number of series stays bounded. Requests that match no
+    route share the "unmatched" one.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started_at = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_requests_in_flight.dec()
+            # The router puts the matched route into the same scope
+            route = scope.get("route")
+            route = getattr(route, "path", "unmatched")
+            method = scope["method"]
+
+            http_request_duration_seconds.observe(
+                time.perf_counter() - started_at, method, route
+            )
+            http_requests_total.inc(method, route, str(status_code))
@@ -0,0 +1,161 @@
+from bisect import bisect_left
+from typing import Callable, Iterable, TypeVar
+
+# Seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+FAST_LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5,
+)
+
+Collect = Callable[[], float | dict[tuple[str, ...], float]]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """
+    Values are kept per worker in plain dicts keyed by label values and are
+    only touched from the event loop, so recording takes no lock. Each
+    worker serves its own values on /metrics.
+
+    A metric with `collect` has no values of its own: they are read when
+    the metrics are rendered, from a number or from a dict of label values
+    to numbers.
+    """
+
+    type = ""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        collect: Collect | None = None,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.collect = collect
+        # A metric without labels has one series, shown from the start
+        self._values: dict[tuple[str, ...], float] = {} if labelnames else {(): 0}
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        lines.extend(self._render_samples())
+        return lines
+
+    def _render_samples(self) -> list[str]:
+        values = self._values
+        if self.collect is not None:
+            collected = self.collect()
+            values = collected if isinstance(collected, dict) else {(): collected}
+
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in values.items()
+        ]
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) - amount
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(float(bucket) for bucket in buckets))
+        # Per label values: counts per bucket, the last one is +Inf, and sum
+        self._observations: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        observations = self._observations.get(labels)
+        if observations is None:
+            observations = ([0] * (len(self.buckets) + 1), [0.0])
+            self._observations[labels] = observations
+
+        counts, total = observations
+        counts[bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def _render_samples(self) -> list[str]:
+        lines = []
+        bounds = [*self.buckets, float("inf")]
+        for labels, (counts, total) in self._observations.items():
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                bucket_labels = _format_labels(
+                    (*self.labelnames, "le"), (*labels, _format_value(bound))
+                )
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+
+            series = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{series} {_format_value(total[0])}")
+            lines.append(f"{self.name}_count{series} {cumulative}")
+
+        return lines
+
+
+M = TypeVar("M", bound=Metric)
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, Metric] = {}
+
+    def register(self, metric: M) -> M:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format, version 0.0.4."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
@@ -0,0 +1,53 @@
+from app.auth.hashing import password_hasher
+from app.db import get_pool_stats
+from app.logger import queue_handler
+from app.metrics.registry import Counter, Gauge, registry
+from fastapi import APIRouter
+from starlette.responses import Response
+
+metrics_router = APIRouter()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Read from the pool when the metrics are rendered
+POOL_METRICS = (
+    (Gauge, "db_pool_size", "size", "Connections the pool keeps open."),
+    (Gauge, "db_pool_checked_out", "checked_out", "Connections in use."),
+    (Gauge, "db_pool_checked_in", "checked_in", "Idle connections in the pool."),
+    (Gauge, "db_pool_overflow", "overflow", "Connections open beyond the pool size."),
+    (Gauge, "db_pool_wait_seconds_max", "wait_seconds_max",
+     "Longest wait for a connection."),
+    (Counter, "db_pool_checkouts_total", "checkouts",
+     "Connections checked out of the pool."),
+    (Counter, "db_pool_wait_seconds_total", "wait_seconds_total",
+     "Time spent waiting for a connection."),
+    (Counter, "db_pool_timeouts_total", "timeouts",
+     "Checkouts that timed out waiting for a connection."),
+)
+
+for metric, name, stat, documentation in POOL_METRICS:
+    registry.register(
+        metric(name, documentation, collect=lambda stat=stat: get_pool_stats()[stat])
+    )
+
+registry.register(Gauge(
+    "password_hash_pending",
+    "Password hashes and checks queued or running in the hashing pool.",
+    collect=lambda: password_hasher.pending,
+))
+registry.register(Counter(
+    "password_hash_rejected_total",
+    "Password hashes and checks refused because the hashing pool was full.",
+    collect=lambda: password_hasher.rejected,
+))
+
+registry.register(Counter(
+    "log_records_dropped_total",
+    "Log records dropped because the log queue was full.",
+    collect=lambda: queue_handler.dropped,
+))
+
+
+@metrics_router.get("/metrics")
+async def get_metrics():
+    return Response(registry.render(), media_type=CONTENT_TYPE)
@@ -0,0 +1,80 @@
+import time
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import SLOW_REQUEST_MS, SLOW_REQUEST_QUERIES
+from app.db import QueryStats, query_stats
+from app.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+SLOW_STATEMENT_LOG_LENGTH = 300
+
+
+class RequestTimingMiddleware:
+    """
+    Attributes the statements a request runs to it (see app.db.query_stats),
+    reports them in a Server-Timing header and logs slow requests.
+
+    Only the statements run before the response starts are in the header,
+    the log line covers the whole request. Websockets are passed through.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = query_stats.set(stats)
+        started_at = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                elapsed_ms = (time.perf_counter() - started_at) * 1000
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Server-Timing",
+                    f'db;dur={stats.seconds * 1000:.2f};desc="{stats.count} queries", '
+                    f"db-slowest;dur={stats.slowest_seconds * 1000:.2f}, "
+                    f"app;dur={elapsed_ms:.2f}",
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            query_stats.reset(token)
+            elapsed_ms = (time.perf_counter() - started_at) * 1000
+            if elapsed_ms >= SLOW_REQUEST_MS or stats.count > SLOW_REQUEST_QUERIES:
+                log_slow_request(scope, status_code, elapsed_ms, stats)
+
+
+def log_slow_request(
+    scope: Scope, status_code: int, elapsed_ms: float, stats: QueryStats
+) -> None:
+    slowest = " ".join((stats.slowest_statement or "").split())
+    logger.warning(
+        f"slow request method={scope['method']} path={scope['path']} "
+        f"status={status_code} duration_ms={elapsed_ms:.1f} "
+        f"queries={stats.count} db_ms={stats.seconds * 1000:.1f} "
+        f"slowest_ms={stats.slowest_seconds * 1000:.1f} "
+        f"slowest={slowest[:SLOW_STATEMENT_LOG_LENGTH]!r}",
+        extra={
+            "method": scope["method"],
+            "path": scope["path"],
+            "status": status_code,
+            "duration_ms": round(elapsed_ms, 1),
+            "queries": stats.count,
+            "db_ms": round(stats.seconds * 1000, 1),
+            "slowest_ms": round(stats.slowest_seconds * 1000, 1),
+            "slowest_statement": slowest[:SLOW_STATEMENT_LOG_LENGTH],
+        },
+    )
@@ -2,11 +2,25 @@ from datetime import datetime, timezone
 from enum import Enum
 from typing import List, Optional
 
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, String, Table
+from sqlalchemy import (
+    Boolean,
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    String,
+    Table,
+    UniqueConstraint,
+    func,
+    text,
+)
 from sqlalchemy import Enum as SQLEnum
+from sqlalchemy.dialects import postgresql  # noqa: F401  registers to_tsvector
 from sqlalchemy.ext.asyncio import AsyncAttrs
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
+from app.config import SEARCH_TEXT_CONFIG
+
 
 def utcnow():
     return datetime.now(timezone.utc)
@@ -17,6 +31,11 @@ class ConversationType(str, Enum):
     GROUP = "group"
 
 
+class MemberRole(str, Enum):
+    OWNER = "owner"
+    MEMBER = "member"
+
+
 class Base(AsyncAttrs, DeclarativeBase):
     pass
 
@@ -74,14 +93,26 @@ class Session(Base):
         nullable=False,
     )
 
+    revoked_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True,
+    )
+
     user_id: Mapped[int] = mapped_column(
-        ForeignKey("users.user_id"), nullable=False
+        ForeignKey("users.user_id"), nullable=False, index=True
     )
 
     user: Mapped["User"] = relationship(
         back_populates="session", lazy="noload")
 
 
+Index(
+    "ix_sessions_revoked_at",
+    Session.revoked_at,
+    postgresql_where=Session.revoked_at.is_not(None),
+)
+
+
 class Conversation(Base):
     __tablename__ = "conversations"
 
@@ -120,12 +151,14 @@ class Chat(Base):
 
     user_id: Mapped[int] = mapped_column(
         ForeignKey("users.user_id"),
-        nullable=False
+        nullable=False,
+        index=True,
     )
 
     user_id2: Mapped[int] = mapped_column(
         ForeignKey("users.user_id"),
-        nullable=False
+        nullable=False,
+        index=True,
     )
 
     conversation: Mapped["Conversation"] = relationship(
@@ -134,8 +167,60 @@ class Chat(Base):
     )
 
 
+# One chat per unordered pair of users: (a, b) and (b, a) collide.
+Index(
+    "uq_chats_user_pair",
+    func.least(Chat.user_id, Chat.user_id2),
+    func.greatest(Chat.user_id, Chat.user_id2),
+    unique=True,
+)
+
+
+class ConversationMember(Base):
+    __tablename__ = "conversation_members"
+    __table_args__ = (
+        # "Conversations of a user"; the primary key serves "members of a
+        # conversation" and membership checks
+        Index(
+            "ix_conversation_members_user_id_conversation_id",
+            "user_id",
+            "conversation_id",
+        ),
+    )
+
+    conversation_id: Mapped[int] = mapped_column(
+        ForeignKey(
+            "conversations.conversation_id",
+            ondelete="CASCADE",
+        ),
+        primary_key=True,
+    )
+
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.user_id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+
+    role: Mapped[MemberRole] = mapped_column(
+        SQLEnum(MemberRole), nullable=False, default=MemberRole.MEMBER
+    )
+
+    joined_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=utcnow,
+        nullable=False,
+    )
+
+
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        Index(
+            "ix_messages_conversation_id_message_id",
+            "conversation_id",
+            "message_id",
+        ),
+    )
 
     message_id: Mapped[int] = mapped_column(
         primary_key=True, autoincrement=True
@@ -181,8 +266,31 @@ class Message(Base):
     )
 
 
+# The configuration is inlined rather than bound, otherwise the planner
+# can not match search queries against the index expression. Ranking
+# recomputes the vector for matched rows only, so no stored column.
+search_config = text(f"'{SEARCH_TEXT_CONFIG}'::regconfig")
+message_search_document = func.to_tsvector(search_config, Message.text)
+
+Index(
+    "ix_messages_text_search",
+    message_search_document,
+    postgresql_using="gin",
+)
+
+
 class Reaction(Base):
     __tablename__ = "reactions"
+    __table_args__ = (
+        # One reaction of a type per user and message. Also serves lookups
+        # by message_id, so that column has no index of its own.
+        UniqueConstraint(
+            "message_id",
+            "user_id",
+            "reaction_type",
+            name="uq_reactions_message_id_user_id_reaction_type",
+        ),
+    )
 
     reaction_id: Mapped[int] = mapped_column(
         primary_key=True, autoincrement=True
@@ -203,7 +311,7 @@ class Reaction(Base):
             "messages.message_id",
             ondelete="CASCADE"
         ),
-        nullable=False
+        nullable=False,
     )
 
     user_id: Mapped[int] = mapped_column(
@@ -216,3 +324,28 @@ class Reaction(Base):
         lazy="noload"
     )
     user: Mapped["User"] = relationship(lazy="noload")
+
+
+class ReadCursor(Base):
+    __tablename__ = "read_cursors"
+
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.user_id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+
+    conversation_id: Mapped[int] = mapped_column(
+        ForeignKey(
+            "conversations.conversation_id",
+            ondelete="CASCADE",
+        ),
+        primary_key=True,
+    )
+
+    last_read_message_id: Mapped[int] = mapped_column(nullable=False)
+
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=utcnow,
+        nullable=False,
+    )
@@ -0,0 +1,40 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+class BaseRepository:
+    def __init__(self, session: AsyncSession) -> None:
+        self.session = session
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[None]:
+        """
+        Joins the transaction the session is already in, which is the
+        request's unit of work (see app.db.get_async_session), or runs a
+        transaction of its own. Pending ORM changes are flushed at the end
+        either way, so errors surface inside the repository method.
+        """
+        if self.session.in_transaction():
+            yield
+            await self.session.flush()
+        else:
+            async with self.session.begin():
+                yield
+
+    async def commit(self) -> None:
+        """
+        Ends the unit of work early: before publishing events about what
+        was written, or before slow work that shouldn't hold a connection.
+        """
+        await self.session.commit()
+
+    def on_commit(self, callback: Callable[[], None]) -> None:
+        event.listen(
+            self.session.sync_session,
+            "after_commit",
+            lambda _: callback(),
+            once=True,
+        )
@@ -1,94 +1,153 @@
 from typing import Annotated
 
-from app.chat.schemas import ChatPublic
+from app.chat.schemas import ChatListItem, ChatPublic
 from app.db import get_async_session
 from app.exceptions.exceptions import IntegrityError, NotFoundError
-from app.models import Chat, Conversation, ConversationType
+from app.models import (
+    Chat,
+    Conversation,
+    ConversationMember,
+    ConversationType,
+    MemberRole,
+    ReadCursor,
+)
+from app.repository.base import BaseRepository
+from app.repository.conversation import (
+    last_message_of,
+    message_preview,
+    unread_count_of,
+)
 from fastapi import Depends
-from sqlalchemy import delete, insert, or_, select
+from sqlalchemy import Integer, delete, exists, func, insert, literal, select, true
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.exc import IntegrityError as SQLAlchemyIntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
-class ChatRepository:
-    def __init__(self, session: AsyncSession) -> None:
-        self.session = session
-
+class ChatRepository(BaseRepository):
     async def insert_chat(
         self, title: str, user_id: int, user_id2: int
     ) -> ChatPublic | None:
-        try:
-            async with self.session.begin():
-                # Check if chat already exists
-                exists_stmt = select(Chat).where(
-                    or_(
-                        (Chat.user_id == user_id) & (
-                            Chat.user_id2 == user_id2),
-                        (Chat.user_id == user_id2) & (
-                            Chat.user_id2 == user_id),
-                    )
-                )
-
-                existing_chat = (await self.session.execute(exists_stmt)).scalar_one_or_none()
-                if existing_chat:
-                    return None
-
-                # 1. Create Conversation
-                conv_stmt = (
-                    insert(Conversation)
-                    .values(type=ConversationType.CHAT, title=title)
-                    .returning(Conversation)
-                )
-                conv = (await self.session.execute(conv_stmt)).scalar_one()
-
-                # 2. Create Chat
-                chat_stmt = insert(Chat).values(
-                    conversation_id=conv.conversation_id,
-                    user_id=user_id,
-                    user_id2=user_id2,
-                )
-                await self.session.execute(chat_stmt)
+        """
+        Creates the conversation, the chat and both members in one
+        statement. Returns None if the users already have a chat.
+
+        Column defaults are not applied to inserts nested in a CTE, so
+        every column is given.
+        """
+        # Probes uq_chats_user_pair, which also catches a concurrent insert
+        pair_exists = exists().where(
+            func.least(Chat.user_id, Chat.user_id2) == min(user_id, user_id2),
+            func.greatest(Chat.user_id, Chat.user_id2) == max(user_id, user_id2),
+        )
+        conv = (
+            insert(Conversation)
+            .from_select(
+                ["type", "title", "created_at"],
+                select(
+                    literal(ConversationType.CHAT, Conversation.type.type),
+                    literal(title, Conversation.title.type),
+                    func.now(),
+                ).where(~pair_exists),
+            )
+            .returning(Conversation.conversation_id, Conversation.title)
+            .cte("conv")
+        )
+        chat = (
+            insert(Chat)
+            .from_select(
+                ["conversation_id", "user_id", "user_id2"],
+                select(conv.c.conversation_id, literal(user_id), literal(user_id2)),
+            )
+            .cte("chat")
+        )
+        members = (
+            insert(ConversationMember)
+            .from_select(
+                ["conversation_id", "user_id", "role", "joined_at"],
+                select(
+                    conv.c.conversation_id,
+                    func.unnest(literal([user_id, user_id2], ARRAY(Integer))),
+                    literal(MemberRole.MEMBER, ConversationMember.role.type),
+                    func.now(),
+                ),
+            )
+            .cte("members")
+        )
+        stmt = select(conv.c.conversation_id, conv.c.title).add_cte(chat, members)
 
+        try:
+            async with self.transaction():
+                row = (await self.session.execute(stmt)).first()
         except SQLAlchemyIntegrityError as ie:
             raise IntegrityError(entity="chat", orig=ie.orig) from ie
 
+        if row is None:
+            return None
+
         return ChatPublic(
-            conversation_id=conv.conversation_id,
-            title=conv.title,
+            conversation_id=row.conversation_id,
+            title=row.title,
             user_id=user_id,
             user_id2=user_id2,
         )
 
-    async def get_chats_by_user_id(self, user_id: int) -> list[ChatPublic]:
+    async def get_chats_by_user_id(self, user_id: int) -> list[ChatListItem]:
+        """
+        Direct chats of the user, most recently active first. Groups are
+        listed by GroupRepository.get_groups_by_user_id, with the same
+        last message and unread count.
+        """
+        last_message = last_message_of(Chat.conversation_id)
+        unread = unread_count_of(Chat.conversation_id, user_id)
+
+        last_activity_at = func.coalesce(
+            last_message.c.created_at, Conversation.created_at
+        )
         stmt = (
             select(
                 Chat.conversation_id,
                 Chat.user_id,
                 Chat.user_id2,
                 Conversation.title,
+                last_message.c.message_id.label("last_message_id"),
+                last_message.c.text.label("last_message_text"),
+                last_message.c.user_id.label("last_message_user_id"),
+                last_message.c.created_at.label("last_message_created_at"),
+                last_activity_at.label("last_activity_at"),
+                ReadCursor.last_read_message_id,
+                unread.c.unread_count,
             )
             .join(Conversation, Conversation.conversation_id == Chat.conversation_id)
+            .outerjoin(
+                ReadCursor,
+                (ReadCursor.conversation_id == Chat.conversation_id)
+                & (ReadCursor.user_id == user_id),
+            )
+            .outerjoin(last_message, true())
+            .join(unread, true())
             .where(
                 (Chat.user_id == user_id) | (Chat.user_id2 == user_id)
             )
-            .order_by(Conversation.created_at.desc())
+            .order_by(last_activity_at.desc())
         )
 
-        async with self.session.begin():
+        async with self.transaction():
             result = await self.session.execute(stmt)
 
-        chats: list[ChatPublic] = []
-        for row in result.all():
-            chats.append(
-                ChatPublic(
-                    conversation_id=row.conversation_id,
-                    title=row.title,
-                    user_id=row.user_id,
-                    user_id2=row.user_id2,
-                )
+        return [
+            ChatListItem(
+                conversation_id=row.conversation_id,
+                title=row.title,
+                user_id=row.user_id,
+                user_id2=row.user_id2,
+                last_message=message_preview(row),
+                last_activity_at=row.last_activity_at,
+                last_read_message_id=row.last_read_message_id,
+                unread_count=row.unread_count,
             )
-
-        return chats
+            for row in result.all()
+        ]
 
     async def delete_chat_by_id(self, chat_id: int) -> None:
         stmt = delete(Conversation).where(
@@ -96,7 +155,7 @@ class ChatRepository:
         ).returning(Conversation.conversation_id)
 
         try:
-            async with self.session.begin():
+            async with self.transaction():
                 result = await self.session.execute(stmt)
                 deleted_id = result.scalar_one_or_none()
 
@@ -113,7 +172,7 @@ class ChatRepository:
             .where(Chat.conversation_id == chat_id)
         )
 
-        async with self.session.begin():
+        async with self.transaction():
             result = await self.session.execute(stmt)
             row = result.first()
 
@@ -0,0 +1,186 @@
+from typing import Annotated, Sequence
+
+from app.config import CHAT_PREVIEW_LENGTH, UNREAD_COUNT_CAP
+from app.conversation.schemas import Membership
+from app.db import get_async_session
+from app.exceptions.exceptions import IntegrityError
+from app.message.schemas import MessagePreview
+from app.models import (
+    Conversation,
+    ConversationMember,
+    MemberRole,
+    Message,
+    ReadCursor,
+)
+from app.repository.base import BaseRepository
+from fastapi import Depends
+from sqlalchemy import Integer, delete, exists, func, literal, select
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.exc import IntegrityError as SQLAlchemyIntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+class ConversationRepository(BaseRepository):
+    async def get_membership(self, conversation_id: int) -> Membership | None:
+        member_ids = (
+            select(func.array_agg(ConversationMember.user_id))
+            .where(ConversationMember.conversation_id == conversation_id)
+            .scalar_subquery()
+        )
+        owner_id = (
+            select(ConversationMember.user_id)
+            .where(
+                ConversationMember.conversation_id == conversation_id,
+                ConversationMember.role == MemberRole.OWNER,
+            )
+            .limit(1)
+            .scalar_subquery()
+        )
+        stmt = select(
+            Conversation.type,
+            Conversation.title,
+            owner_id.label("owner_id"),
+            member_ids.label("member_ids"),
+        ).where(Conversation.conversation_id == conversation_id)
+
+        async with self.transaction():
+            row = (await self.session.execute(stmt)).first()
+
+        if row is None:
+            return None
+
+        return Membership(
+            conversation_id=conversation_id,
+            type=row.type,
+            title=row.title,
+            owner_id=row.owner_id,
+            member_ids=frozenset(row.member_ids or ()),
+        )
+
+    async def add_members(
+        self,
+        conversation_id: int,
+        user_ids: Sequence[int],
+        role: MemberRole = MemberRole.MEMBER,
+    ) -> list[int]:
+        """
+        Adds members in one statement whatever their number. Returns the
+        ids that were added, users that are already members are skipped.
+        """
+        if not user_ids:
+            return []
+
+        rows = select(
+            literal(conversation_id),
+            func.unnest(literal(list(user_ids), ARRAY(Integer))),
+            literal(role, ConversationMember.role.type),
+        )
+        stmt = (
+            insert(ConversationMember)
+            .from_select(["conversation_id", "user_id", "role"], rows)
+            .on_conflict_do_nothing()
+            .returning(ConversationMember.user_id)
+        )
+
+        try:
+            async with self.transaction():
+                result = await self.session.execute(stmt)
+                added = list(result.scalars().all())
+        except SQLAlchemyIntegrityError as ie:
+            raise IntegrityError(entity="member", orig=ie.orig) from ie
+
+        return added
+
+    async def remove_member(self, conversation_id: int, user_id: int) -> bool:
+        stmt = delete(ConversationMember).where(
+            ConversationMember.conversation_id == conversation_id,
+            ConversationMember.user_id == user_id,
+        )
+
+        async with self.transaction():
+            result = await self.session.execute(stmt)
+
+        return result.rowcount > 0
+
+
+def is_member(user_id: int, conversation_id):
+    """
+    Membership of `user_id` in the conversation `conversation_id` refers
+    to (a column or a value), for guarding statements. Probes the primary
+    key of conversation_members.
+    """
+    return exists().where(
+        ConversationMember.conversation_id == conversation_id,
+        ConversationMember.user_id == user_id,
+    )
+
+
+def last_message_of(conversation_id):
+    """
+    LATERAL with the last message of the conversation `conversation_id`
+    refers to, one index probe per conversation.
+    """
+    return (
+        select(
+            Message.message_id,
+            func.substr(Message.text, 1, CHAT_PREVIEW_LENGTH).label("text"),
+            Message.user_id,
+            Message.created_at,
+        )
+        .where(Message.conversation_id == conversation_id)
+        .order_by(Message.message_id.desc())
+        .limit(1)
+        .lateral("last_message")
+    )
+
+
+def unread_count_of(conversation_id, user_id: int):
+    """
+    LATERAL counting the messages of others after the read cursor of
+    `user_id`, up to UNREAD_COUNT_CAP. ReadCursor must be outer joined on
+    the same conversation and user. Sending a message advances the
+    sender's cursor too (see ReadCursorBuffer.mark_sent), so the cursor
+    alone says what was read.
+    """
+    read_up_to = func.coalesce(ReadCursor.last_read_message_id, 0)
+    unread_messages = (
+        select(Message.message_id)
+        .where(
+            Message.conversation_id == conversation_id,
+            Message.message_id > read_up_to,
+            Message.user_id != user_id,
+        )
+        .limit(UNREAD_COUNT_CAP)
+        .correlate_except(Message)
+        .subquery("unread_messages")
+    )
+    return (
+        select(func.count().label("unread_count"))
+        .select_from(unread_messages)
+        .lateral("unread")
+    )
+
+
+def message_preview(row) -> MessagePreview | None:
+    """From a row with the columns of last_message_of, prefixed."""
+    if row.last_message_id is None:
+        return None
+
+    return MessagePreview(
+        message_id=row.last_message_id,
+        text=row.last_message_text,
+        user_id=row.last_message_user_id,
+        created_at=row.last_message_created_at,
+    )
+
+
+def conversations_of(user_id: int):
+    return select(ConversationMember.conversation_id).where(
+        ConversationMember.user_id == user_id
+    )
+
+
+async def get_conversation_repo(
+    session: Annotated[AsyncSession, Depends(get_async_session)],
+) -> ConversationRepository:
+    return ConversationRepository(session)
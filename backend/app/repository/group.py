@@ -0,0 +1,228 @@
+from typing import Annotated, Sequence
+
+from app.db import get_async_session
+from app.exceptions.exceptions import IntegrityError, NotFoundError
+from app.group.schemas import (
+    GroupListItem,
+    GroupMemberPage,
+    GroupMemberPublic,
+    GroupPublic,
+)
+from app.models import (
+    Conversation,
+    ConversationMember,
+    ConversationType,
+    MemberRole,
+    ReadCursor,
+    User,
+)
+from app.repository.base import BaseRepository
+from app.repository.conversation import (
+    last_message_of,
+    message_preview,
+    unread_count_of,
+)
+from fastapi import Depends
+from sqlalchemy import (
+    Integer,
+    case,
+    delete,
+    func,
+    insert,
+    literal,
+    select,
+    true,
+    update,
+)
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.exc import IntegrityError as SQLAlchemyIntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+
+class GroupRepository(BaseRepository):
+    async def insert_group(
+        self, title: str, owner_id: int, member_ids: Sequence[int]
+    ) -> GroupPublic:
+        """
+        Creates the conversation and all of its members in one statement.
+        Column defaults are not applied to inserts nested in a CTE, so
+        every column is given.
+        """
+        conv = (
+            insert(Conversation)
+            .values(type=ConversationType.GROUP, title=title, created_at=func.now())
+            .returning(Conversation.conversation_id, Conversation.title)
+            .cte("conv")
+        )
+        user_ids = [owner_id, *(m for m in member_ids if m != owner_id)]
+        member = (
+            func.unnest(literal(user_ids, ARRAY(Integer)))
+            .table_valued("user_id")
+            .render_derived("member")
+        )
+        role_type = ConversationMember.role.type
+        role = case(
+            (member.c.user_id == owner_id, literal(MemberRole.OWNER, role_type)),
+            else_=literal(MemberRole.MEMBER, role_type),
+        )
+        members = (
+            insert(ConversationMember)
+            .from_select(
+                ["conversation_id", "user_id", "role", "joined_at"],
+                select(conv.c.conversation_id, member.c.user_id, role, func.now())
+                .select_from(conv.join(member, true())),
+            )
+            .cte("members")
+        )
+        stmt = select(conv.c.conversation_id, conv.c.title).add_cte(members)
+
+        try:
+            async with self.transaction():
+                row = (await self.session.execute(stmt)).one()
+        except SQLAlchemyIntegrityError as ie:
+            raise IntegrityError(entity="group", orig=ie.orig) from ie
+
+        return GroupPublic(
+            conversation_id=row.conversation_id,
+            title=row.title,
+            owner_id=owner_id,
+        )
+
+    async def get_groups_by_user_id(self, user_id: int) -> list[GroupListItem]:
+        """Groups of the user, most recently active first."""
+        owner = aliased(ConversationMember)
+        owner_id = (
+            select(owner.user_id)
+            .where(
+                owner.conversation_id == Conversation.conversation_id,
+                owner.role == MemberRole.OWNER,
+            )
+            .limit(1)
+            .scalar_subquery()
+        )
+        last_message = last_message_of(Conversation.conversation_id)
+        unread = unread_count_of(Conversation.conversation_id, user_id)
+
+        last_activity_at = func.coalesce(
+            last_message.c.created_at, Conversation.created_at
+        )
+        stmt = (
+            select(
+                Conversation.conversation_id,
+                Conversation.title,
+                owner_id.label("owner_id"),
+                last_message.c.message_id.label("last_message_id"),
+                last_message.c.text.label("last_message_text"),
+                last_message.c.user_id.label("last_message_user_id"),
+                last_message.c.created_at.label("last_message_created_at"),
+                last_activity_at.label("last_activity_at"),
+                ReadCursor.last_read_message_id,
+                unread.c.unread_count,
+            )
+            .join(
+                ConversationMember,
+                ConversationMember.conversation_id == Conversation.conversation_id,
+            )
+            .outerjoin(
+                ReadCursor,
+                (ReadCursor.conversation_id == Conversation.conversation_id)
+                & (ReadCursor.user_id == user_id),
+            )
+            .outerjoin(last_message, true())
+            .join(unread, true())
+            .where(
+                ConversationMember.user_id == user_id,
+                Conversation.type == ConversationType.GROUP,
+            )
+            .order_by(last_activity_at.desc())
+        )
+
+        async with self.transaction():
+            result = await self.session.execute(stmt)
+
+        return [
+            GroupListItem(
+                conversation_id=row.conversation_id,
+                title=row.title,
+                owner_id=row.owner_id,
+                last_message=message_preview(row),
+                last_activity_at=row.last_activity_at,
+                last_read_message_id=row.last_read_message_id,
+                unread_count=row.unread_count,
+            )
+            for row in result.all()
+        ]
+
+    async def update_title(self, group_id: int, title: str) -> None:
+        stmt = (
+            update(Conversation)
+            .where(
+                Conversation.conversation_id == group_id,
+                Conversation.type == ConversationType.GROUP,
+            )
+            .values(title=title)
+        )
+
+        async with self.transaction():
+            result = await self.session.execute(stmt)
+            if result.rowcount == 0:
+                raise NotFoundError(entity="group", entity_id=group_id)
+
+    async def delete_group(self, group_id: int) -> None:
+        # Members, messages and read cursors go with the conversation
+        stmt = delete(Conversation).where(
+            Conversation.conversation_id == group_id,
+            Conversation.type == ConversationType.GROUP,
+        )
+
+        try:
+            async with self.transaction():
+                result = await self.session.execute(stmt)
+                if result.rowcount == 0:
+                    raise NotFoundError(entity="group", entity_id=group_id)
+
+        except SQLAlchemyIntegrityError as ie:
+            raise IntegrityError(entity="group", orig=ie.orig) from ie
+
+    async def get_members(
+        self, group_id: int, limit: int, after: int | None = None
+    ) -> GroupMemberPage:
+        # Keyset pagination on user_id, walks the primary key
+        stmt = (
+            select(
+                User.user_id,
+                User.tag,
+                User.first_name,
+                User.surname,
+                ConversationMember.role,
+                ConversationMember.joined_at,
+            )
+            .join(User, User.user_id == ConversationMember.user_id)
+            .where(ConversationMember.conversation_id == group_id)
+            .order_by(ConversationMember.user_id.asc())
+            .limit(limit + 1)
+        )
+        if after is not None:
+            stmt = stmt.where(ConversationMember.user_id > after)
+
+        async with self.transaction():
+            result = await self.session.execute(stmt)
+            rows = result.all()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        return GroupMemberPage(
+            items=[
+                GroupMemberPublic.model_validate(row, from_attributes=True)
+                for row in rows
+            ],
+            next_cursor=rows[-1].user_id if has_more else None,
+        )
+
+
+async def get_group_repo(
+    session: Annotated[AsyncSession, Depends(get_async_session)],
+) -> GroupRepository:
+    return GroupRepository(session)
@@ -1,24 +1,81 @@
-from typing import Annotated
+import html
+import math
+from typing import Annotated, Sequence
 
 from app.db import get_async_session
-from app.exceptions.exceptions import IntegrityError, NotFoundError
-from app.message.schemas import MessagePublic
-from app.models import Message
+from app.exceptions.exceptions import IntegrityError, NoAccessError, NotFoundError
+from app.message.schemas import (
+    MessagePage,
+    MessagePublic,
+    MessageSearchHit,
+    MessageSearchPage,
+    ReactionSummary,
+)
+from app.models import (
+    Conversation,
+    Message,
+    Reaction,
+    message_search_document,
+    search_config,
+)
+from app.repository.base import BaseRepository
+from app.repository.conversation import conversations_of, is_member
 from fastapi import Depends
-from sqlalchemy import delete, select, update
+from sqlalchemy import (
+    REAL,
+    Integer,
+    String,
+    cast,
+    delete,
+    func,
+    insert,
+    literal,
+    select,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.exc import IntegrityError as SQLAlchemyIntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 
 
-class MessageRepository:
-    def __init__(self, session: AsyncSession) -> None:
-        self.session = session
+# ts_headline marks matches with private use characters, so the snippet can
+# be HTML-escaped as a whole before they are turned into tags
+_MATCH_START = "\ue000"
+_MATCH_STOP = "\ue001"
+_HEADLINE_OPTIONS = (
+    f"StartSel={_MATCH_START}, StopSel={_MATCH_STOP}, "
+    "MaxWords=24, MinWords=8, MaxFragments=2"
+)
 
+
+def encode_search_cursor(rank: float, message_id: int) -> str:
+    return f"{rank!r}:{message_id}"
+
+
+def decode_search_cursor(cursor: str) -> tuple[float, int]:
+    """Raises ValueError on a malformed cursor."""
+    rank, message_id = cursor.split(":")
+    rank = float(rank)
+    # float() takes "nan" and "inf", which no rank is
+    if not math.isfinite(rank):
+        raise ValueError(f"Rank is not finite: {rank}")
+    return rank, int(message_id)
+
+
+def _render_snippet(headline: str) -> str:
+    return (
+        html.escape(headline)
+        .replace(_MATCH_START, "<mark>")
+        .replace(_MATCH_STOP, "</mark>")
+    )
+
+
+class MessageRepository(BaseRepository):
     async def get_message_by_id(self, message_id: int) -> MessagePublic | None:
         stmt = select(Message).where(Message.message_id == message_id)
 
-        async with self.session.begin():
+        async with self.transaction():
             result = await self.session.execute(stmt)
             res = result.scalar_one_or_none()
 
@@ -30,21 +87,167 @@ class MessageRepository:
     async def get_messages_by_chat_id(
         self,
         conversation_id: int,
-    ) -> list[MessagePublic]:
+        viewer_id: int,
+        limit: int,
+        before: int | None = None,
+        after: int | None = None,
+    ) -> MessagePage:
+        # Keyset pagination on message_id: walks backwards from `before`
+        # (or the newest message) unless `after` is given. Items are
+        # always returned in ascending order.
         stmt = (
             select(Message)
-            .options(
-                selectinload(Message.reactions)
-            )
             .where(Message.conversation_id == conversation_id)
-            .order_by(Message.created_at.asc())
+            .limit(limit + 1)
+        )
+
+        if after is not None:
+            stmt = stmt.where(Message.message_id > after).order_by(
+                Message.message_id.asc()
+            )
+        else:
+            if before is not None:
+                stmt = stmt.where(Message.message_id < before)
+            stmt = stmt.order_by(Message.message_id.desc())
+
+        async with self.transaction():
+            result = await self.session.execute(stmt)
+            messages = list(result.scalars().all())
+
+            has_more = len(messages) > limit
+            messages = messages[:limit]
+            reactions = await self._summarize_reactions(
+                [m.message_id for m in messages], viewer_id
+            )
+
+        next_cursor = messages[-1].message_id if has_more else None
+
+        if after is None:
+            messages.reverse()
+
+        return MessagePage(
+            items=[
+                MessagePublic(
+                    message_id=m.message_id,
+                    text=m.text,
+                    user_id=m.user_id,
+                    created_at=m.created_at,
+                    is_edited=m.is_edited,
+                    conversation_id=m.conversation_id,
+                    reactions=reactions.get(m.message_id, []),
+                )
+                for m in messages
+            ],
+            next_cursor=next_cursor,
+        )
+
+    async def _summarize_reactions(
+        self, message_ids: list[int], viewer_id: int
+    ) -> dict[int, list[ReactionSummary]]:
+        """
+        One row per (message, reaction type) instead of one per reaction,
+        types in the order they were first used on the message.
+        """
+        if not message_ids:
+            return {}
+
+        stmt = (
+            select(
+                Reaction.message_id,
+                Reaction.reaction_type,
+                func.count().label("count"),
+                func.max(Reaction.reaction_id)
+                .filter(Reaction.user_id == viewer_id)
+                .label("my_reaction_id"),
+            )
+            .where(Reaction.message_id.in_(message_ids))
+            .group_by(Reaction.message_id, Reaction.reaction_type)
+            .order_by(Reaction.message_id, func.min(Reaction.reaction_id))
+        )
+        result = await self.session.execute(stmt)
+
+        summaries: dict[int, list[ReactionSummary]] = {}
+        for row in result.all():
+            summaries.setdefault(row.message_id, []).append(
+                ReactionSummary(
+                    reaction_type=row.reaction_type,
+                    count=row.count,
+                    reacted_by_me=row.my_reaction_id is not None,
+                    my_reaction_id=row.my_reaction_id,
+                )
+            )
+
+        return summaries
+
+    async def search_messages(
+        self,
+        user_id: int,
+        query: str,
+        limit: int,
+        conversation_id: int | None = None,
+        after: tuple[float, int] | None = None,
+    ) -> MessageSearchPage:
+        # Matches come from ix_messages_text_search and are ordered by
+        # (rank, message_id) for keyset pagination. Headlines are the
+        # expensive part, so they are built for the returned page only.
+        tsquery = func.websearch_to_tsquery(search_config, query)
+        rank = func.ts_rank(message_search_document, tsquery)
+
+        matches = (
+            select(Message.message_id, rank.label("rank"))
+            .where(
+                message_search_document.bool_op("@@")(tsquery),
+                Message.conversation_id.in_(conversations_of(user_id)),
+            )
+            .order_by(rank.desc(), Message.message_id.desc())
+            .limit(limit + 1)
+        )
+        if conversation_id is not None:
+            matches = matches.where(Message.conversation_id == conversation_id)
+        if after is not None:
+            after_rank, after_id = after
+            matches = matches.where(
+                tuple_(rank, Message.message_id)
+                < tuple_(cast(after_rank, REAL), after_id)
+            )
+        matches = matches.subquery("matches")
+
+        stmt = (
+            select(
+                Message,
+                matches.c.rank,
+                func.ts_headline(
+                    search_config, Message.text, tsquery, _HEADLINE_OPTIONS
+                ).label("headline"),
+            )
+            .join(matches, matches.c.message_id == Message.message_id)
+            .order_by(matches.c.rank.desc(), matches.c.message_id.desc())
         )
 
-        async with self.session.begin():
+        async with self.transaction():
             result = await self.session.execute(stmt)
-            messages = result.scalars().all()
+            rows = result.all()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = None
+        if has_more:
+            last_message, last_rank, _ = rows[-1]
+            next_cursor = encode_search_cursor(last_rank, last_message.message_id)
 
-        return [MessagePublic.model_validate(m, from_attributes=True) for m in messages]
+        return MessageSearchPage(
+            items=[
+                MessageSearchHit(
+                    message=MessagePublic.model_validate(
+                        message, from_attributes=True
+                    ),
+                    snippet=_render_snippet(headline),
+                    rank=rank_value,
+                )
+                for message, rank_value, headline in rows
+            ],
+            next_cursor=next_cursor,
+        )
 
     async def create_message(
         self,
@@ -52,46 +255,141 @@ class MessageRepository:
         user_id: int,
         text: str,
     ) -> MessagePublic:
+        """
+        Inserts the message only if `user_id` is a member of the
+        conversation, so a membership change another worker hasn't heard
+        of yet can't let a former member write.
+        """
+        source = select(
+            literal(conversation_id, Integer),
+            literal(user_id, Integer),
+            literal(text, String),
+        ).where(is_member(user_id, conversation_id))
+        stmt = (
+            insert(Message)
+            .from_select(["conversation_id", "user_id", "text"], source)
+            .returning(Message)
+        )
+
         try:
-            async with self.session.begin():
-                message = Message(
-                    conversation_id=conversation_id,
-                    user_id=user_id,
-                    text=text,
-                )
+            async with self.transaction():
+                message = (await self.session.execute(stmt)).scalar_one_or_none()
+                if message is None:
+                    await check_conversation_access(
+                        self.session, conversation_id, user_id
+                    )
+                    # Deleted between the insert and the check
+                    raise NotFoundError(
+                        entity="conversation", entity_id=conversation_id
+                    )
+        except SQLAlchemyIntegrityError as ie:
+            raise IntegrityError(entity="message", orig=ie.orig) from ie
+
+        return MessagePublic.model_validate(message, from_attributes=True)
 
-                self.session.add(message)
-                await self.session.flush()   # получаем message_id
-                await self.session.refresh(message)
+    async def insert_messages(
+        self, rows: Sequence[tuple[int, int, str]]
+    ) -> list[MessagePublic | None]:
+        """
+        Inserts (conversation_id, user_id, text) rows in one statement
+        whatever their number, with three array parameters. The result is
+        aligned with `rows`, None where the sender is not a member of the
+        conversation (anymore), so one deleted conversation or user doesn't
+        fail a whole batch with a foreign key violation.
+        """
+        if not rows:
+            return []
+
+        conversation_ids, user_ids, texts = (list(col) for col in zip(*rows))
+        batch = (
+            func.unnest(
+                literal(conversation_ids, ARRAY(Integer)),
+                literal(user_ids, ARRAY(Integer)),
+                literal(texts, ARRAY(String)),
+            )
+            .table_valued(
+                "conversation_id", "user_id", "text", with_ordinality="position"
+            )
+            .render_derived("batch")
+        )
+        # Ordered, so message ids follow the order of `rows`
+        source = (
+            select(batch.c.conversation_id, batch.c.user_id, batch.c.text)
+            .where(is_member(batch.c.user_id, batch.c.conversation_id))
+            .order_by(batch.c.position)
+        )
+        stmt = (
+            insert(Message)
+            .from_select(["conversation_id", "user_id", "text"], source)
+            .returning(Message)
+        )
 
-            return MessagePublic.model_validate(message, from_attributes=True)
+        try:
+            async with self.transaction():
+                result = await self.session.execute(stmt)
+                inserted = sorted(result.scalars().all(), key=lambda m: m.message_id)
         except SQLAlchemyIntegrityError as ie:
             raise IntegrityError(entity="message", orig=ie.orig) from ie
 
+        # Inserted rows are a subsequence of `rows`, in the same order
+        messages: list[MessagePublic | None] = []
+        pending = iter(inserted)
+        message = next(pending, None)
+        for conversation_id, user_id, text in rows:
+            if (
+                message is not None
+                and message.conversation_id == conversation_id
+                and message.user_id == user_id
+                and message.text == text
+            ):
+                messages.append(MessagePublic.model_validate(message, from_attributes=True))
+                message = next(pending, None)
+            else:
+                messages.append(None)
+
+        return messages
+
+    async def check_access(self, conversation_id: int, user_id: int) -> None:
+        """For a batch insert_messages rejected, see check_conversation_access."""
+        async with self.transaction():
+            await check_conversation_access(self.session, conversation_id, user_id)
+
     async def edit_message(
         self,
         message_id: int,
         user_id: int,
         new_text: str,
     ) -> MessagePublic:
+        """
+        Edits a message of `user_id` in a conversation they are a member
+        of, in one statement.
+        """
         stmt = (
             update(Message)
             .where(
                 Message.message_id == message_id,
                 Message.user_id == user_id,
+                is_member(user_id, Message.conversation_id),
             )
             .values(
                 text=new_text,
                 is_edited=True,
             )
             .returning(Message)
+            .execution_options(synchronize_session=False)
         )
 
         try:
-            async with self.session.begin():
-                result = await self.session.execute(stmt)
-                message = result.scalar_one_or_none()
+            async with self.transaction():
+                message = (await self.session.execute(stmt)).scalar_one_or_none()
                 if message is None:
+                    await check_message_access(
+                        self.session,
+                        message_id=message_id,
+                        user_id=user_id,
+                        not_author_message="You can edit only your own messages",
+                    )
+                    # Deleted between the mutation and the check
                     raise NotFoundError(entity="message", entity_id=message_id)
 
         except SQLAlchemyIntegrityError as ie:
@@ -103,22 +401,82 @@ class MessageRepository:
         self,
         message_id: int,
         user_id: int,
-    ) -> None:
+    ) -> int:
+        """Like edit_message, returns the conversation of the message."""
         stmt = (
             delete(Message)
             .where(
                 Message.message_id == message_id,
                 Message.user_id == user_id,
+                is_member(user_id, Message.conversation_id),
             )
+            .returning(Message.conversation_id)
+            .execution_options(synchronize_session=False)
         )
 
         try:
-            async with self.session.begin():
-                await self.session.execute(stmt)
+            async with self.transaction():
+                conversation_id = (await self.session.execute(stmt)).scalar_one_or_none()
+                if conversation_id is None:
+                    await check_message_access(
+                        self.session,
+                        message_id=message_id,
+                        user_id=user_id,
+                        not_author_message="You can delete only your own messages",
+                    )
+                    # Deleted between the mutation and the check
+                    raise NotFoundError(entity="message", entity_id=message_id)
 
         except SQLAlchemyIntegrityError as ie:
             raise IntegrityError(entity="message", orig=ie.orig) from ie
 
+        return conversation_id
+
+
+async def check_message_access(
+    session: AsyncSession,
+    message_id: int,
+    user_id: int,
+    not_author_message: str | None = None,
+) -> None:
+    """
+    Called when a guarded mutation matched no row, to tell the client why:
+    raises NotFoundError or NoAccessError. Only runs on that failure path,
+    so the happy path stays one statement.
+    """
+    stmt = select(
+        Message.user_id,
+        is_member(user_id, Message.conversation_id).label("is_member"),
+    ).where(Message.message_id == message_id)
+    row = (await session.execute(stmt)).first()
+    if row is None:
+        raise NotFoundError(entity="message", entity_id=message_id)
+
+    author_id, member = row
+    if not member:
+        raise NoAccessError("You are not a member of the conversation")
+
+    if not_author_message is not None and author_id != user_id:
+        raise NoAccessError(not_author_message)
+
+
+async def check_conversation_access(
+    session: AsyncSession, conversation_id: int, user_id: int
+) -> None:
+    """
+    Like check_message_access, for a guarded insert into a conversation:
+    raises NotFoundError or NoAccessError.
+    """
+    stmt = select(is_member(user_id, Conversation.conversation_id)).where(
+        Conversation.conversation_id == conversation_id
+    )
+    member = (await session.execute(stmt)).scalar_one_or_none()
+    if member is None:
+        raise NotFoundError(entity="conversation", entity_id=conversation_id)
+
+    if not member:
+        raise NoAccessError("You are not a member of the conversation")
+
 
 async def get_message_repo(
     session: Annotated[AsyncSession, Depends(get_async_session)],
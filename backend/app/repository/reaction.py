@@ -1,23 +1,24 @@
 from typing import Annotated
 
+from app.conversation.schemas import ConversationPublic
 from app.db import get_async_session
-from app.exceptions.exceptions import IntegrityError
-from app.message.schemas import ReactionPublic
-from app.models import Reaction
+from app.exceptions.exceptions import IntegrityError, NoAccessError, NotFoundError
+from app.message.schemas import ReactionPublic, ReactionType, Reactor, ReactorPage
+from app.models import Conversation, Message, Reaction, User
+from app.repository.base import BaseRepository
+from app.repository.conversation import is_member
+from app.repository.message import check_message_access
 from fastapi import Depends
-from sqlalchemy import delete, select
+from sqlalchemy import delete, func, insert, literal, select, true
 from sqlalchemy.exc import IntegrityError as SQLAlchemyIntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
-class ReactionRepository:
-    def __init__(self, session: AsyncSession) -> None:
-        self.session = session
-
+class ReactionRepository(BaseRepository):
     async def get_reaction_by_id(self, reaction_id: int) -> ReactionPublic | None:
         stmt = select(Reaction).where(Reaction.reaction_id == reaction_id)
 
-        async with self.session.begin():
+        async with self.transaction():
             result = await self.session.execute(stmt)
             res = result.scalar_one_or_none()
 
@@ -26,49 +27,184 @@ class ReactionRepository:
 
         return ReactionPublic.model_validate(res, from_attributes=True)
 
+    async def get_reactors(
+        self,
+        message_id: int,
+        user_id: int,
+        limit: int,
+        after: int | None = None,
+        reaction_type: ReactionType | None = None,
+    ) -> ReactorPage:
+        """
+        Who reacted to a message of a conversation `user_id` is a member
+        of, oldest first. Keyset pagination on reaction_id.
+        """
+        stmt = (
+            select(
+                Reaction.reaction_id,
+                Reaction.reaction_type,
+                User.user_id,
+                User.tag,
+                User.first_name,
+                User.surname,
+            )
+            .join(User, User.user_id == Reaction.user_id)
+            .join(Message, Message.message_id == Reaction.message_id)
+            .where(
+                Reaction.message_id == message_id,
+                is_member(user_id, Message.conversation_id),
+            )
+            .order_by(Reaction.reaction_id.asc())
+            .limit(limit + 1)
+        )
+        if after is not None:
+            stmt = stmt.where(Reaction.reaction_id > after)
+        if reaction_type is not None:
+            stmt = stmt.where(Reaction.reaction_type == reaction_type)
+
+        async with self.transaction():
+            result = await self.session.execute(stmt)
+            rows = result.all()
+            if not rows:
+                # Nobody reacted, or the message is not accessible
+                await check_message_access(
+                    self.session, message_id=message_id, user_id=user_id
+                )
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        return ReactorPage(
+            items=[Reactor.model_validate(row, from_attributes=True) for row in rows],
+            next_cursor=rows[-1].reaction_id if has_more else None,
+        )
+
     async def add_reaction(
         self,
         message_id: int,
         user_id: int,
         reaction_type: str,
-    ) -> ReactionPublic:
+    ) -> tuple[ReactionPublic, ConversationPublic, int]:
+        """
+        Adds a reaction if `user_id` is a member of the conversation of the
+        message, in one statement. Returns the reaction, the conversation
+        and the author of the message, for the fan-out.
+        """
+        target = (
+            select(
+                Message.message_id,
+                Message.user_id.label("author_id"),
+                Conversation.conversation_id,
+                Conversation.title,
+            )
+            .join(Conversation, Conversation.conversation_id == Message.conversation_id)
+            .where(
+                Message.message_id == message_id,
+                is_member(user_id, Message.conversation_id),
+            )
+            .cte("target")
+        )
+        inserted = (
+            insert(Reaction)
+            .from_select(
+                # Column defaults are not applied inside a CTE
+                ["reaction_type", "message_id", "user_id", "created_at"],
+                select(
+                    literal(reaction_type),
+                    target.c.message_id,
+                    literal(user_id),
+                    func.now(),
+                ),
+            )
+            .returning(
+                Reaction.reaction_id,
+                Reaction.reaction_type,
+                Reaction.message_id,
+                Reaction.user_id,
+            )
+            .cte("inserted")
+        )
+        stmt = select(
+            inserted,
+            target.c.author_id,
+            target.c.conversation_id,
+            target.c.title,
+        ).select_from(inserted.join(target, true()))
+
         try:
-            async with self.session.begin():
-                reaction = Reaction(
-                    message_id=message_id,
-                    user_id=user_id,
-                    reaction_type=reaction_type,
-                )
-                self.session.add(reaction)
-                await self.session.flush()
-                await self.session.refresh(reaction)
+            async with self.transaction():
+                row = (await self.session.execute(stmt)).first()
+                if row is None:
+                    await check_message_access(
+                        self.session, message_id=message_id, user_id=user_id
+                    )
+                    raise NotFoundError(entity="message", entity_id=message_id)
 
-            return ReactionPublic.model_validate(reaction, from_attributes=True)
         except SQLAlchemyIntegrityError as ie:
             raise IntegrityError(entity="reaction", orig=ie.orig) from ie
 
+        reaction = ReactionPublic(
+            reaction_id=row.reaction_id,
+            reaction_type=row.reaction_type,
+            message_id=row.message_id,
+            user_id=row.user_id,
+        )
+        conversation = ConversationPublic(
+            conversation_id=row.conversation_id,
+            title=row.title,
+        )
+        return reaction, conversation, row.author_id
+
     async def remove_reaction(
         self,
         message_id: int,
         user_id: int,
         reaction_id: int,
-    ) -> None:
+    ) -> tuple[int, str]:
+        """
+        Removes a reaction of `user_id` from a message of a conversation
+        they are a member of, in one statement. Returns the conversation
+        and the type of the reaction.
+        """
         stmt = (
             delete(Reaction)
             .where(
+                Reaction.reaction_id == reaction_id,
                 Reaction.message_id == message_id,
                 Reaction.user_id == user_id,
-                Reaction.reaction_id == reaction_id,
+                Message.message_id == Reaction.message_id,
+                is_member(user_id, Message.conversation_id),
             )
+            .returning(Message.conversation_id, Reaction.reaction_type)
+            .execution_options(synchronize_session=False)
         )
 
         try:
-            async with self.session.begin():
-                _ = await self.session.execute(stmt)
+            async with self.transaction():
+                row = (await self.session.execute(stmt)).first()
+                if row is None:
+                    await check_message_access(
+                        self.session, message_id=message_id, user_id=user_id
+                    )
+                    await self._check_reaction_owner(reaction_id, message_id, user_id)
+                    raise NotFoundError(entity="reaction", entity_id=reaction_id)
 
         except SQLAlchemyIntegrityError as ie:
             raise IntegrityError(entity="reaction", orig=ie.orig) from ie
 
+        return row.conversation_id, row.reaction_type
+
+    async def _check_reaction_owner(
+        self, reaction_id: int, message_id: int, user_id: int
+    ) -> None:
+        stmt = select(Reaction.user_id).where(
+            Reaction.reaction_id == reaction_id,
+            Reaction.message_id == message_id,
+        )
+        author_id = (await self.session.execute(stmt)).scalar_one_or_none()
+        if author_id is not None and author_id != user_id:
+            raise NoAccessError("You can remove only your own reactions")
+
 
 async def get_reaction_repo(
     session: Annotated[AsyncSession, Depends(get_async_session)],
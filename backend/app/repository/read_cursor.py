@@ -0,0 +1,93 @@
+from typing import Annotated, Sequence
+
+from app.chat.schemas import ReadCursorPublic
+from app.db import get_async_session
+from app.models import Message, ReadCursor
+from app.repository.base import BaseRepository
+from app.repository.conversation import is_member
+from fastapi import Depends
+from sqlalchemy import Integer, func, literal, select
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+class ReadCursorRepository(BaseRepository):
+    async def get_cursors(self, conversation_id: int) -> list[ReadCursorPublic]:
+        stmt = select(ReadCursor).where(
+            ReadCursor.conversation_id == conversation_id
+        )
+
+        async with self.transaction():
+            result = await self.session.execute(stmt)
+            cursors = result.scalars().all()
+
+        return [
+            ReadCursorPublic.model_validate(cursor, from_attributes=True)
+            for cursor in cursors
+        ]
+
+    async def upsert_cursors(
+        self, cursors: Sequence[tuple[int, int, int]]
+    ) -> list[tuple[int, int, int]]:
+        """
+        Writes (user_id, conversation_id, message_id) cursors in one
+        statement. A cursor never moves backwards and never past the last
+        message of its conversation; cursors of conversations that have no
+        messages, or whose user is no longer a member, are dropped. Returns
+        the cursors as stored.
+        """
+        if not cursors:
+            return []
+
+        user_ids, conversation_ids, message_ids = (list(col) for col in zip(*cursors))
+        rows = select(
+            func.unnest(literal(user_ids, ARRAY(Integer))).label("user_id"),
+            func.unnest(literal(conversation_ids, ARRAY(Integer))).label("conversation_id"),
+            func.unnest(literal(message_ids, ARRAY(Integer))).label("message_id"),
+        ).subquery("rows")
+
+        last_message_id = (
+            select(func.max(Message.message_id))
+            .where(Message.conversation_id == rows.c.conversation_id)
+            .scalar_subquery()
+        )
+        source = (
+            select(
+                rows.c.user_id,
+                rows.c.conversation_id,
+                func.least(rows.c.message_id, last_message_id),
+            )
+            .where(
+                last_message_id.is_not(None),
+                is_member(rows.c.user_id, rows.c.conversation_id),
+            )
+        )
+
+        stmt = insert(ReadCursor).from_select(
+            ["user_id", "conversation_id", "last_read_message_id"], source
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ReadCursor.user_id, ReadCursor.conversation_id],
+            set_={
+                "last_read_message_id": func.greatest(
+                    ReadCursor.last_read_message_id,
+                    stmt.excluded.last_read_message_id,
+                ),
+                "updated_at": func.now(),
+            },
+        ).returning(
+            ReadCursor.user_id,
+            ReadCursor.conversation_id,
+            ReadCursor.last_read_message_id,
+        )
+
+        async with self.transaction():
+            result = await self.session.execute(stmt)
+
+        return [tuple(row) for row in result]
+
+
+async def get_read_cursor_repo(
+    session: Annotated[AsyncSession, Depends(get_async_session)],
+) -> ReadCursorRepository:
+    return ReadCursorRepository(session)
@@ -1,68 +1,97 @@
+from datetime import datetime
 from typing import Annotated
 
 from app.auth.schemas import SessionRead
 from app.db import get_async_session
 from app.exceptions.exceptions import IntegrityError
-from app.models import Session, User
+from app.models import Session
+from app.repository.base import BaseRepository
 from fastapi import Depends
-from sqlalchemy import delete, select
+from sqlalchemy import delete, func, insert, select, update
 from sqlalchemy.exc import IntegrityError as SQLAlchemyIntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
-class SessionRepository:
-    def __init__(self, session: AsyncSession) -> None:
-        self.session = session
-
+class SessionRepository(BaseRepository):
     async def insert_session(self, token: str, user_id: int) -> SessionRead:
+        stmt = (
+            insert(Session)
+            .values(refresh_token=token, user_id=user_id)
+            .returning(Session)
+        )
+
         try:
-            async with self.session.begin():
-                session = Session(refresh_token=token, user_id=user_id)
-                self.session.add(session)
+            async with self.transaction():
+                session = (await self.session.execute(stmt)).scalar_one()
         except SQLAlchemyIntegrityError as ie:
             raise IntegrityError(entity="session", orig=ie.orig) from ie
 
         return SessionRead.model_validate(session, from_attributes=True)
 
-    async def delete_session_by_user_id(self, user_id: int) -> bool:
-        stmt = delete(Session).where(Session.user_id == user_id)
-        async with self.session.begin():
-            result = await self.session.execute(stmt)
+    async def get_session_by_id(self, session_id: int) -> SessionRead | None:
+        query = select(Session).where(Session.session_id == session_id)
 
-        return result.rowcount > 0
+        async with self.transaction():
+            session = (await self.session.execute(query)).scalar_one_or_none()
+
+        if session is None:
+            return None
+
+        return SessionRead.model_validate(session, from_attributes=True)
 
-    async def delete_session_by_user_tag(self, tag: str) -> bool:
-        stmt = delete(Session).where(
-            Session.user_id
-            == select(User.user_id).where(User.tag == tag).scalar_subquery()
+    async def revoke_session(self, session_id: int) -> bool:
+        stmt = (
+            update(Session)
+            .where(
+                Session.session_id == session_id,
+                Session.revoked_at.is_(None),
+            )
+            .values(revoked_at=func.now())
         )
-        async with self.session.begin():
+
+        async with self.transaction():
             result = await self.session.execute(stmt)
 
         return result.rowcount > 0
 
-    async def get_session_by_user_id(
-        self, user_id: int
-    ) -> SessionRead | None:
-        query = select(Session).where(Session.user_id == user_id)
+    async def revoke_sessions_by_user_id(
+        self, user_id: int, purge_revoked_before: datetime
+    ) -> list[int]:
+        """
+        Revokes the live sessions of the user and deletes the ones revoked
+        long enough ago that no access token of theirs is valid anymore.
+        """
+        revoke_stmt = (
+            update(Session)
+            .where(
+                Session.user_id == user_id,
+                Session.revoked_at.is_(None),
+            )
+            .values(revoked_at=func.now())
+            .returning(Session.session_id)
+        )
+        purge_stmt = delete(Session).where(
+            Session.user_id == user_id,
+            Session.revoked_at < purge_revoked_before,
+        )
 
-        session = (await self.session.execute(query)).scalar()
-        if session is None:
-            return None
+        async with self.transaction():
+            revoked = (await self.session.execute(revoke_stmt)).scalars().all()
+            await self.session.execute(purge_stmt)
 
-        return SessionRead.model_validate(session, from_attributes=True)
+        return list(revoked)
 
-    async def get_session_by_user_tag(self, tag: str) -> SessionRead | None:
-        query = select(Session).where(
-            Session.user_id
-            == select(User.user_id).where(User.tag == tag).scalar_subquery()
+    async def get_revoked_sessions(
+        self, since: datetime
+    ) -> list[tuple[int, datetime]]:
+        query = select(Session.session_id, Session.revoked_at).where(
+            Session.revoked_at >= since
         )
 
-        session = (await self.session.execute(query)).scalar()
-        if session is None:
-            return None
+        async with self.transaction():
+            result = await self.session.execute(query)
 
-        return SessionRead.model_validate(session, from_attributes=True)
+        return [(row.session_id, row.revoked_at) for row in result]
 
 
 async def get_session_repo(
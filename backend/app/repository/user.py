@@ -1,52 +1,59 @@
-from typing import Annotated, List
+from typing import Annotated, List, Sequence
 
 from app.db import get_async_session
 from app.exceptions.exceptions import IntegrityError, NotFoundError
 from app.models import User, contacts_association
-from app.user.schemas import UserCreateResponse, UserRead
+from app.repository.base import BaseRepository
+from app.user.cache import user_cache
+from app.user.schemas import UserCreateResponse, UserIdentity, UserRead
 from fastapi import Depends
-from sqlalchemy import delete, insert, select, update
+from sqlalchemy import String, any_, delete, insert, literal, select, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.exc import IntegrityError as SQLAlchemyIntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 
-class UserRepository:
-    def __init__(self, session: AsyncSession) -> None:
-        self.session = session
-
+class UserRepository(BaseRepository):
     async def insert_user(
         self, first_name: str, surname: str, tag: str, password_hashed: str
     ) -> UserCreateResponse:
+        stmt = (
+            insert(User)
+            .values(
+                first_name=first_name,
+                surname=surname,
+                tag=tag,
+                password_hashed=password_hashed,
+            )
+            .returning(User.user_id)
+        )
+
         try:
-            async with self.session.begin():
-                user = User(
-                    first_name=first_name,
-                    surname=surname,
-                    tag=tag,
-                    password_hashed=password_hashed,
-                )
-                self.session.add(user)
+            async with self.transaction():
+                user_id = (await self.session.execute(stmt)).scalar_one()
         except SQLAlchemyIntegrityError as ie:
             raise IntegrityError(entity="user", orig=ie.orig) from ie
 
-        return UserCreateResponse.model_validate(user, from_attributes=True)
+        return UserCreateResponse(user_id=user_id)
 
     async def delete_user_by_tag(self, tag: str) -> None:
-        stmt = delete(User).where(User.tag == tag)
+        stmt = delete(User).where(User.tag == tag).returning(User.user_id)
 
         try:
-            async with self.session.begin():
-                result = await self.session.execute(stmt)
-                if result.rowcount == 0:
+            async with self.transaction():
+                user_id = (await self.session.execute(stmt)).scalar_one_or_none()
+                if user_id is None:
                     raise NotFoundError(entity="user", entity_id=None)
+                self.on_commit(lambda: user_cache.invalidate(user_id))
         except SQLAlchemyIntegrityError as ie:
             raise IntegrityError(entity="user", orig=ie.orig) from ie
 
     async def get_user_by_id(self, user_id: int) -> UserRead | None:
         q = select(User).options(selectinload(
             User.contacts)).where(User.user_id == user_id)
-        async with self.session.begin():
+        async with self.transaction():
             coro = await self.session.execute(q)
 
             user = coro.scalar()
@@ -58,7 +65,7 @@ class UserRepository:
     async def get_user_by_tag(self, tag: str) -> UserRead | None:
         q = select(User).options(selectinload(
             User.contacts)).where(User.tag == tag)
-        async with self.session.begin():
+        async with self.transaction():
             coro = await self.session.execute(q)
 
             user = coro.scalar()
@@ -67,17 +74,42 @@ class UserRepository:
 
         return UserRead.model_validate(user, from_attributes=True)
 
+    async def get_user_identity_by_tag(self, tag: str) -> UserIdentity | None:
+        q = select(User.user_id, User.tag).where(User.tag == tag)
+        async with self.transaction():
+            row = (await self.session.execute(q)).first()
+
+        if row is None:
+            return None
+
+        return UserIdentity(user_id=row.user_id, tag=row.tag)
+
+    async def get_user_identities_by_tags(
+        self, tags: Sequence[str]
+    ) -> list[UserIdentity]:
+        # One array parameter however many tags there are
+        q = select(User.user_id, User.tag).where(
+            User.tag == any_(literal(list(tags), ARRAY(String)))
+        )
+        async with self.transaction():
+            rows = (await self.session.execute(q)).all()
+
+        return [UserIdentity(user_id=row.user_id, tag=row.tag) for row in rows]
+
     async def add_contact(self, user_id: int, contact_id: int) -> None:
-        stmt = insert(contacts_association).values(
-            user_id=user_id,
-            contact_id=contact_id,
+        # Adding a contact twice is a no-op, without failing the transaction
+        stmt = (
+            pg_insert(contacts_association)
+            .values(user_id=user_id, contact_id=contact_id)
+            .on_conflict_do_nothing()
         )
 
+        self.on_commit(lambda: user_cache.invalidate(user_id))
         try:
-            await self.session.execute(stmt)
-            await self.session.commit()
-        except SQLAlchemyIntegrityError:
-            await self.session.rollback()
+            async with self.transaction():
+                await self.session.execute(stmt)
+        except SQLAlchemyIntegrityError as ie:
+            raise IntegrityError(entity="contact", orig=ie.orig) from ie
 
     async def delete_contact(self, user_id: int, contact_id: int) -> None:
         stmt = (
@@ -88,12 +120,26 @@ class UserRepository:
             )
         )
 
+        self.on_commit(lambda: user_cache.invalidate(user_id))
         try:
-            async with self.session.begin():
+            async with self.transaction():
                 await self.session.execute(stmt)
         except SQLAlchemyIntegrityError as ie:
             raise IntegrityError(entity="contact", orig=ie.orig) from ie
 
+    async def update_password_hash(
+        self, user_id: int, password_hashed: str
+    ) -> None:
+        stmt = (
+            update(User)
+            .where(User.user_id == user_id)
+            .values(password_hashed=password_hashed)
+        )
+
+        self.on_commit(lambda: user_cache.invalidate(user_id))
+        async with self.transaction():
+            await self.session.execute(stmt)
+
     async def update_user(self, user_id: int, bio: str | None) -> UserRead:
         stmt = (
             update(User)
@@ -102,8 +148,9 @@ class UserRepository:
             .returning(User)
         )
 
+        self.on_commit(lambda: user_cache.invalidate(user_id))
         try:
-            async with self.session.begin():
+            async with self.transaction():
                 result = await self.session.execute(stmt)
                 user = result.scalar_one_or_none()
 
@@ -0,0 +1,61 @@
+import time
+from collections import OrderedDict
+from typing import Generic, TypeVar
+
+from app.config import USER_CACHE_MAX_SIZE, USER_CACHE_TTL_SECONDS
+from app.user.schemas import UserRead
+
+T = TypeVar("T", bound=UserRead)
+
+
+class UserCache(Generic[T]):
+    """
+    Per-process TTL + LRU cache of users keyed by user_id, the one claim
+    of an access token that never changes. Other workers only see a
+    change once the TTL expires.
+    """
+
+    def __init__(self, max_size: int, ttl: float) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        # Bumped on every invalidation so that a lookup which raced with
+        # one doesn't put a stale user back (see `put`).
+        self.version = 0
+
+        self._entries: OrderedDict[int, tuple[float, T]] = OrderedDict()
+
+    def get(self, user_id: int) -> T | None:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+
+        expires_at, user = entry
+        if expires_at < time.monotonic():
+            del self._entries[user_id]
+            return None
+
+        self._entries.move_to_end(user_id)
+        return user
+
+    def put(self, user: T, version: int) -> None:
+        if self.max_size <= 0 or version != self.version:
+            return
+
+        self._entries[user.user_id] = (time.monotonic() + self.ttl, user)
+        self._entries.move_to_end(user.user_id)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        self.version += 1
+        self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        self.version += 1
+        self._entries.clear()
+
+
+user_cache: UserCache[UserRead] = UserCache(
+    max_size=USER_CACHE_MAX_SIZE, ttl=USER_CACHE_TTL_SECONDS
+)
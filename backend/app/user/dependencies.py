@@ -1,31 +1,48 @@
 from typing import Annotated
 
-import jwt
 from app.auth.dependencies import get_formatted_token
-from app.config import ALGORITHM, SECRET_KEY
+from app.auth.denylist import session_denylist
+from app.auth.schemas import AccessClaims
+from app.auth.utils import decode_access_claims
 from app.exceptions.exceptions import InvalidTokenException
 from app.repository.user import UserRepository, get_user_repo
-from app.user.schemas import UserRead
+from app.user.cache import user_cache
+from app.user.schemas import UserIdentity, UserRead
 from fastapi import Depends
 
 
-async def get_current_user_by_token(
+async def get_access_claims(
     token: Annotated[str, Depends(get_formatted_token)],
+) -> AccessClaims:
+    claims = decode_access_claims(token)
+    if session_denylist.is_revoked(claims.session_id):
+        raise InvalidTokenException()
+
+    return claims
+
+
+async def get_current_user_by_token(
+    claims: Annotated[AccessClaims, Depends(get_access_claims)],
     user_repo: Annotated[UserRepository, Depends(get_user_repo)]
 ) -> UserRead:
-    try:
-        payload = jwt.decode(
-            token, SECRET_KEY, algorithms=[ALGORITHM]
-        )
-        tag: str = payload.get("sub")
-        if tag is None:
-            raise InvalidTokenException()
-
-    except jwt.InvalidTokenError as e:
-        raise InvalidTokenException() from e
-
-    user = await user_repo.get_user_by_tag(tag=tag)
+    user = user_cache.get(claims.user_id)
+    if user is not None:
+        return user
+
+    version = user_cache.version
+    user = await user_repo.get_user_by_id(user_id=claims.user_id)
     if not user:
         raise InvalidTokenException()
 
+    user_cache.put(user, version)
     return user
+
+
+async def get_current_user_identity(
+    claims: Annotated[AccessClaims, Depends(get_access_claims)],
+) -> UserIdentity:
+    """
+    Like get_current_user_by_token, but taken from the token alone: no
+    database session is opened for it.
+    """
+    return UserIdentity(user_id=claims.user_id, tag=claims.tag)
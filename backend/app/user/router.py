@@ -5,10 +5,14 @@ from app.exceptions.codes import Codes
 from app.exceptions.exceptions import AppException, NotFoundError
 from app.repository.user import UserRepository, get_user_repo
 from app.schemas import OkResponse
-from app.user.dependencies import get_current_user_by_token
+from app.user.dependencies import (
+    get_current_user_by_token,
+    get_current_user_identity,
+)
 from app.user.schemas import (
     UpdateProfile,
     UserCreate,
+    UserIdentity,
     UserPublicWithContacts,
     UserRead,
 )
@@ -29,7 +33,7 @@ async def create_user(
         first_name=user_data.first_name,
         surname=user_data.surname,
         tag=user_data.tag,
-        password_hashed=get_password_hash(user_data.password),
+        password_hashed=await get_password_hash(user_data.password),
     )
 
     return OkResponse(ok=True)
@@ -52,7 +56,7 @@ async def get_me(
     status_code=status.HTTP_200_OK,
 )
 async def get_user_by_id(
-    _current_user: Annotated[UserRead, Depends(get_current_user_by_token)],
+    _current_user: Annotated[UserIdentity, Depends(get_current_user_identity)],
     id: int,
     user_repo: Annotated[UserRepository, Depends(get_user_repo)]
 ):
@@ -69,7 +73,7 @@ async def get_user_by_id(
     status_code=status.HTTP_200_OK,
 )
 async def get_user_by_tag(
-    _current_user: Annotated[UserRead, Depends(get_current_user_by_token)],
+    _current_user: Annotated[UserIdentity, Depends(get_current_user_identity)],
     tag: str,
     user_repo: Annotated[UserRepository, Depends(get_user_repo)]
 ):
@@ -89,9 +93,8 @@ async def delete_user_by_tag(
     tag: str,
     user_repo: Annotated[UserRepository, Depends(get_user_repo)]
 ):
-    user = await user_repo.delete_user_by_tag(tag=tag)
-    if not user:
-        raise NotFoundError(entity="user", entity_id=None)
+    # Raises NotFoundError if there is no such user
+    await user_repo.delete_user_by_tag(tag=tag)
 
     return OkResponse(ok=True)
 
@@ -103,10 +106,10 @@ async def delete_user_by_tag(
 )
 async def add_contact(
     tag: str,
-    current_user: Annotated[UserRead, Depends(get_current_user_by_token)],
+    current_user: Annotated[UserIdentity, Depends(get_current_user_identity)],
     user_repo: Annotated[UserRepository, Depends(get_user_repo)],
 ):
-    user = await user_repo.get_user_by_tag(tag)
+    user = await user_repo.get_user_identity_by_tag(tag)
     if not user:
         raise NotFoundError(entity="user", entity_id=None)
 
@@ -132,10 +135,10 @@ async def add_contact(
 )
 async def remove_contact(
     tag: str,
-    current_user: Annotated[UserRead, Depends(get_current_user_by_token)],
+    current_user: Annotated[UserIdentity, Depends(get_current_user_identity)],
     user_repo: Annotated[UserRepository, Depends(get_user_repo)],
 ):
-    user = await user_repo.get_user_by_tag(tag)
+    user = await user_repo.get_user_identity_by_tag(tag)
     if not user:
         raise NotFoundError(entity="user", entity_id=None)
 
@@ -153,7 +156,7 @@ async def remove_contact(
 )
 async def update_profile(
     payload: UpdateProfile,
-    current_user: Annotated[UserRead, Depends(get_current_user_by_token)],
+    current_user: Annotated[UserIdentity, Depends(get_current_user_identity)],
     user_repo: Annotated[UserRepository, Depends(get_user_repo)],
 ):
     user = await user_repo.update_user(
@@ -34,6 +34,11 @@ class UserPublic(UserBase):
     user_id: int
 
 
+class UserIdentity(GeneralSchema):
+    user_id: int
+    tag: str
+
+
 class UserPublicWithContacts(UserPublic):
     contacts: List["UserPublic"]
 
@@ -0,0 +1,357 @@
+import asyncio
+import contextlib
+import os
+import socket
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Protocol, Sequence
+
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from app.config import (
+    WS_EVENT_BUS,
+    WS_EVENT_BUS_CHANNEL,
+    WS_EVENT_BUS_SOCKET_DIR,
+)
+from app.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class EventHandler(Protocol):
+    def deliver(self, user_ids: Sequence[int], frame: str) -> None: ...
+
+    def deliver_to_conversation(
+        self, conversation_id: int, exclude_user_id: int | None, frame: str
+    ) -> None: ...
+
+    def invalidate_membership(self, conversation_id: int) -> None: ...
+
+
+class EventBus(ABC):
+    """
+    Pub/sub between workers. `publish*` may be called on any worker; the
+    handler set by ConnectionManager is called on every worker, which then
+    delivers the encoded frame to its own sockets.
+
+    On the wire a message is a header, a newline and the frame, so the
+    frame itself is never decoded or re-encoded. The header addresses
+    either users ("1,2,3"), the members of a conversation ("c42", or
+    "c42:7" to leave out user 7) or, with an empty frame, tells that the
+    members of a conversation changed ("m42").
+    """
+
+    def __init__(self) -> None:
+        self._handler: EventHandler | None = None
+
+    def set_handler(self, handler: EventHandler) -> None:
+        self._handler = handler
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    async def publish(self, user_ids: Sequence[int], frame: str) -> None:
+        await self._publish(",".join(map(str, user_ids)) + "\n" + frame)
+
+    async def publish_to_conversation(
+        self,
+        conversation_id: int,
+        frame: str,
+        exclude_user_id: int | None = None,
+    ) -> None:
+        header = f"c{conversation_id}"
+        if exclude_user_id is not None:
+            header += f":{exclude_user_id}"
+
+        await self._publish(header + "\n" + frame)
+
+    async def publish_membership_change(self, conversation_id: int) -> None:
+        await self._publish(f"m{conversation_id}\n")
+
+    @abstractmethod
+    async def _publish(self, message: str) -> None:
+        """Sends an encoded message to every worker, this one included."""
+
+    def _deliver_encoded(self, message: str) -> None:
+        if self._handler is None:
+            return
+
+        header, _, frame = message.partition("\n")
+        try:
+            if header.startswith("c"):
+                conversation_id, _, exclude = header[1:].partition(":")
+                deliver = self._handler.deliver_to_conversation
+                args = (int(conversation_id), int(exclude) if exclude else None, frame)
+            elif header.startswith("m"):
+                deliver = self._handler.invalidate_membership
+                args = (int(header[1:]),)
+            else:
+                deliver = self._handler.deliver
+                args = ([int(user_id) for user_id in header.split(",")], frame)
+        except ValueError:
+            logger.exception("Dropping malformed bus message")
+            return
+
+        deliver(*args)
+
+
+class InMemoryEventBus(EventBus):
+    """Single worker: publishing is delivering."""
+
+    async def _publish(self, message: str) -> None:
+        self._deliver_encoded(message)
+
+
+class PostgresEventBus(EventBus):
+    """
+    LISTEN/NOTIFY over one connection of the application engine that stays
+    checked out for the lifetime of the worker. Publishes are queued and
+    sent in batches by a single task, since an asyncpg connection runs one
+    statement at a time. A lost connection is re-established with backoff;
+    events published by other workers meanwhile are missed.
+
+    A message too large for one NOTIFY is sent in parts, prefixed with "+"
+    and the last one with "=", and put back together per sending backend,
+    whose notifications arrive in order.
+    """
+
+    # NOTIFY payloads must be shorter than 8000 bytes
+    MAX_PAYLOAD_BYTES = 7999
+    MAX_BATCH = 500
+    RECONNECT_MIN_SECONDS = 0.5
+    RECONNECT_MAX_SECONDS = 30.0
+
+    def __init__(self, engine: AsyncEngine, channel: str) -> None:
+        super().__init__()
+        self.engine = engine
+        self.channel = channel
+
+        self._queue: asyncio.Queue[str] = asyncio.Queue()
+        self._conn: AsyncConnection | None = None
+        self._driver_conn: Any = None
+        self._connected = asyncio.Event()
+        self._lost = asyncio.Event()
+        self._partial: dict[int, list[str]] = {}
+        self._sender: asyncio.Task | None = None
+        self._reconnector: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        await self._connect()
+        self._sender = asyncio.create_task(self._send_loop())
+        self._reconnector = asyncio.create_task(self._reconnect_loop())
+
+    async def stop(self) -> None:
+        for task in (self._sender, self._reconnector):
+            if task is not None:
+                task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await task
+        self._sender = None
+        self._reconnector = None
+
+        await self._disconnect()
+
+    async def _publish(self, message: str) -> None:
+        for part in self._split(message):
+            self._queue.put_nowait(part)
+
+    def _split(self, message: str) -> list[str]:
+        data = message.encode()
+        if len(data) <= self.MAX_PAYLOAD_BYTES:
+            return [message]
+
+        parts = []
+        size = self.MAX_PAYLOAD_BYTES - 1
+        while len(data) > size:
+            end = size
+            # Not inside a UTF-8 sequence
+            while data[end] & 0xC0 == 0x80:
+                end -= 1
+            parts.append("+" + data[:end].decode())
+            data = data[end:]
+        parts.append("=" + data.decode())
+
+        return parts
+
+    async def _connect(self) -> None:
+        self._conn = await self.engine.connect()
+        raw = await self._conn.get_raw_connection()
+        self._driver_conn = raw.driver_connection
+        self._driver_conn.add_termination_listener(self._on_terminated)
+        await self._driver_conn.add_listener(self.channel, self._on_notify)
+        self._connected.set()
+
+    async def _disconnect(self) -> None:
+        self._connected.clear()
+        if self._conn is None:
+            return
+
+        with contextlib.suppress(Exception):
+            self._driver_conn.remove_termination_listener(self._on_terminated)
+        with contextlib.suppress(Exception):
+            await self._driver_conn.remove_listener(self.channel, self._on_notify)
+        with contextlib.suppress(Exception):
+            await self._conn.close()
+
+        self._conn = None
+        self._driver_conn = None
+        self._partial.clear()
+
+    def _on_terminated(self, connection) -> None:
+        self._lost.set()
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        if payload.startswith("+"):
+            self._partial.setdefault(pid, []).append(payload[1:])
+            return
+
+        if payload.startswith("="):
+            parts = self._partial.pop(pid, None)
+            if parts is None:
+                logger.warning(f"Dropping the tail of an event from backend {pid}")
+                return
+            parts.append(payload[1:])
+            payload = "".join(parts)
+
+        self._deliver_encoded(payload)
+
+    async def _reconnect_loop(self) -> None:
+        delay = self.RECONNECT_MIN_SECONDS
+        while True:
+            await self._lost.wait()
+            self._lost.clear()
+            await self._disconnect()
+
+            try:
+                await self._connect()
+            except Exception:
+                logger.exception(
+                    f"Failed to reconnect the event bus, retrying in {delay}s"
+                )
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.RECONNECT_MAX_SECONDS)
+                self._lost.set()
+                continue
+
+            logger.info("Event bus reconnected")
+            delay = self.RECONNECT_MIN_SECONDS
+
+    async def _send_loop(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            # The parts of a message go in one statement, so a failure
+            # doesn't leave half of it sent
+            while not self._queue.empty() and (
+                len(batch) < self.MAX_BATCH or batch[-1].startswith("+")
+            ):
+                batch.append(self._queue.get_nowait())
+
+            await self._connected.wait()
+            try:
+                await self._driver_conn.execute(
+                    "SELECT pg_notify($1, payload) FROM unnest($2::text[]) AS payload",
+                    self.channel,
+                    batch,
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception(
+                    f"Failed to publish {len(batch)} events, reconnecting"
+                )
+                self._lost.set()
+                self._connected.clear()
+
+
+class UnixSocketEventBus(EventBus):
+    """
+    For several workers on one host. Every worker binds a datagram socket
+    in a shared directory and publishes by sending to all the others.
+    """
+
+    PEERS_REFRESH_SECONDS = 1.0
+    MAX_DATAGRAM = 256 * 1024
+
+    def __init__(self, directory: str) -> None:
+        super().__init__()
+        self.directory = Path(directory)
+        self.path = self.directory / f"{os.getpid()}.sock"
+
+        self._sock: socket.socket | None = None
+        self._peers: list[str] = []
+        self._peers_refreshed_at = 0.0
+
+    async def start(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with contextlib.suppress(FileNotFoundError):
+            self.path.unlink()
+
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.setblocking(False)
+        self._sock.bind(str(self.path))
+        asyncio.get_running_loop().add_reader(self._sock.fileno(), self._on_readable)
+
+    async def stop(self) -> None:
+        if self._sock is None:
+            return
+
+        asyncio.get_running_loop().remove_reader(self._sock.fileno())
+        self._sock.close()
+        self._sock = None
+        with contextlib.suppress(FileNotFoundError):
+            self.path.unlink()
+
+    async def _publish(self, message: str) -> None:
+        self._deliver_encoded(message)
+
+        if self._sock is None:
+            return
+
+        data = message.encode()
+        for peer in self._get_peers():
+            try:
+                self._sock.sendto(data, peer)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # The worker is gone but its socket file is left behind
+                with contextlib.suppress(OSError):
+                    os.unlink(peer)
+                self._peers_refreshed_at = 0.0
+            except BlockingIOError:
+                logger.warning(f"Bus peer {peer} is not reading, event dropped")
+
+    def _get_peers(self) -> list[str]:
+        now = time.monotonic()
+        if now - self._peers_refreshed_at > self.PEERS_REFRESH_SECONDS:
+            self._peers = [
+                str(path)
+                for path in self.directory.glob("*.sock")
+                if path != self.path
+            ]
+            self._peers_refreshed_at = now
+
+        return self._peers
+
+    def _on_readable(self) -> None:
+        while self._sock is not None:
+            try:
+                data = self._sock.recv(self.MAX_DATAGRAM)
+            except BlockingIOError:
+                return
+
+            self._deliver_encoded(data.decode())
+
+
+def create_event_bus() -> EventBus:
+    if WS_EVENT_BUS == "postgres":
+        from app.db import engine
+
+        return PostgresEventBus(engine=engine, channel=WS_EVENT_BUS_CHANNEL)
+
+    if WS_EVENT_BUS == "unix":
+        return UnixSocketEventBus(directory=WS_EVENT_BUS_SOCKET_DIR)
+
+    return InMemoryEventBus()
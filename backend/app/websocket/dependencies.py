@@ -1,14 +1,26 @@
-from app.auth.utils import decode_access_token
-from app.repository.user import UserRepository
-from app.user.schemas import UserRead
-from sqlalchemy.ext.asyncio import AsyncSession
+from app.auth.denylist import session_denylist
+from app.auth.utils import decode_access_claims
+from app.exceptions.exceptions import InvalidTokenException
+from app.user.schemas import UserIdentity
+from fastapi import WebSocket
 
 
-async def get_current_user_ws(token: str, session: AsyncSession) -> UserRead | None:
-    payload = decode_access_token(token)
-    tag = payload.get("sub")
-    if not tag:
+def get_current_user_ws(websocket: WebSocket) -> UserIdentity | None:
+    """
+    Like get_current_user_identity, taken from the access token alone: a
+    socket stays open for hours, so it must not hold a database session
+    or open one just to be accepted.
+    """
+    token_cookie = websocket.cookies.get("jwt")
+    if not token_cookie:
         return None
 
-    repo = UserRepository(session)
-    return await repo.get_user_by_tag(tag)
+    try:
+        claims = decode_access_claims(token_cookie.removeprefix("Bearer ").strip())
+    except InvalidTokenException:
+        return None
+
+    if session_denylist.is_revoked(claims.session_id):
+        return None
+
+    return UserIdentity(user_id=claims.user_id, tag=claims.tag)
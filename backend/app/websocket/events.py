@@ -1,4 +1,13 @@
+import json
 from enum import Enum
+from typing import Any
+
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
 
 
 class WSEventType(str, Enum):
@@ -12,5 +21,67 @@ class WSEventType(str, Enum):
     CHAT_CREATED = "chat.created"
     CHAT_DELETED = "chat.deleted"
 
+    GROUP_CREATED = "group.created"
+    GROUP_UPDATED = "group.updated"
+    GROUP_DELETED = "group.deleted"
+    GROUP_MEMBER_ADDED = "group.member_added"
+    GROUP_MEMBER_REMOVED = "group.member_removed"
+
+    READ_UPDATED = "read.updated"
+
+    TYPING = "typing"
+
     NOTIFICATION = "notification"
     ERROR = "error"
+    ACK = "ack"
+
+    PING = "ping"
+
+
+class WSCommandType(str, Enum):
+    """Frames sent by clients."""
+
+    MESSAGE_SEND = "message.send"
+    MESSAGE_EDIT = "message.edit"
+    REACTION_ADD = "reaction.add"
+    TYPING = "typing"
+    READ_CURSOR = "read.cursor"
+    PONG = "pong"
+
+
+def dumps(obj: Any) -> str:
+    if orjson is not None:
+        return orjson.dumps(obj).decode()
+
+    return json.dumps(obj, separators=(",", ":"))
+
+
+def encode_event(
+    event_type: WSEventType,
+    payload: BaseModel | dict[str, Any] | None = None,
+) -> str:
+    """
+    Encodes an event frame once, so it can be sent as is to every
+    recipient and device. Models are dumped straight to JSON by pydantic
+    and spliced into the envelope instead of going through a dict.
+    """
+    if payload is None:
+        return dumps({"type": event_type.value})
+
+    if isinstance(payload, BaseModel):
+        raw_payload = payload.model_dump_json()
+    else:
+        raw_payload = dumps(payload)
+
+    return f'{{"type":{dumps(event_type.value)},"payload":{raw_payload}}}'
+
+
+_TYPE_PREFIX = '{"type":"'
+_EVENT_TYPES = frozenset(event_type.value for event_type in WSEventType)
+
+
+def event_type_of(frame: str) -> str:
+    """Type of a frame made by encode_event, read without decoding it."""
+    end = frame.find('"', len(_TYPE_PREFIX))
+    event_type = frame[len(_TYPE_PREFIX):end]
+    return event_type if event_type in _EVENT_TYPES else "unknown"
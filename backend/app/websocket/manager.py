@@ -1,43 +1,394 @@
-import json
-from typing import Any
+import asyncio
+import contextlib
+import time
+from typing import Any, Iterable, Sequence
 
 from fastapi import WebSocket
+from pydantic import BaseModel
+from starlette import status
 
-from app.websocket.events import WSEventType
+from app.config import (
+    WS_HEARTBEAT_INTERVAL_SECONDS,
+    WS_HEARTBEAT_TIMEOUT_SECONDS,
+    WS_MAX_CONNECTIONS,
+    WS_MAX_CONNECTIONS_PER_USER,
+    WS_SEND_QUEUE_SIZE,
+    WS_SEND_TIMEOUT_SECONDS,
+)
+from app.conversation.membership import membership_cache
+from app.logger import setup_logger
+from app.metrics.registry import (
+    FAST_LATENCY_BUCKETS,
+    Counter,
+    Gauge,
+    Histogram,
+    registry,
+)
+from app.websocket.bus import EventBus, create_event_bus
+from app.websocket.events import WSEventType, encode_event, event_type_of
+
+logger = setup_logger(__name__)
+
+ws_event_publish_seconds = registry.register(Histogram(
+    "ws_event_publish_seconds",
+    "Time to encode and publish an event; with the in-memory bus this "
+    "includes queueing it for every local recipient.",
+    ("event_type",),
+    buckets=FAST_LATENCY_BUCKETS,
+))
+ws_event_delivery_seconds = registry.register(Histogram(
+    "ws_event_delivery_seconds",
+    "Time from queueing an event for a socket until it is written to it.",
+    ("event_type",),
+    buckets=FAST_LATENCY_BUCKETS,
+))
+ws_evictions_total = registry.register(Counter(
+    "ws_evictions_total",
+    "Sockets closed for not keeping up with their events.",
+))
+ws_reaped_total = registry.register(Counter(
+    "ws_reaped_total",
+    "Sockets closed for not answering the heartbeat.",
+))
+ws_rejected_total = registry.register(Counter(
+    "ws_rejected_total",
+    "Sockets refused or closed by the connection caps.",
+    ("reason",),
+))
+
+
+class Connection:
+    """
+    One socket of a user. Events are put on a bounded queue and written by
+    a dedicated task, so a slow client never blocks whoever produced them.
+    """
+
+    def __init__(self, user_id: int, websocket: WebSocket) -> None:
+        self.user_id = user_id
+        self.websocket = websocket
+        # Frames with the time they were queued at
+        self.queue: asyncio.Queue[tuple[str, float]] = asyncio.Queue(
+            maxsize=WS_SEND_QUEUE_SIZE
+        )
+        self._writer: asyncio.Task | None = None
+
+        self.connected_at = time.monotonic()
+        # Any frame from the client counts, pongs are only the fallback
+        self.last_seen = self.connected_at
+
+    def touch(self) -> None:
+        self.last_seen = time.monotonic()
+
+    def start(self, on_failure) -> None:
+        self._writer = asyncio.create_task(self._write_loop(on_failure))
+
+    def stop(self) -> None:
+        if self._writer is not None and self._writer is not asyncio.current_task():
+            self._writer.cancel()
+        self._writer = None
+
+    def enqueue(self, frame: str) -> bool:
+        try:
+            self.queue.put_nowait((frame, time.perf_counter()))
+        except asyncio.QueueFull:
+            return False
+
+        return True
+
+    async def close(self, code: int, reason: str = "") -> None:
+        with contextlib.suppress(Exception):
+            await asyncio.wait_for(
+                self.websocket.close(code=code, reason=reason),
+                timeout=WS_SEND_TIMEOUT_SECONDS,
+            )
+
+    async def _write_loop(self, on_failure) -> None:
+        while True:
+            frame, queued_at = await self.queue.get()
+            try:
+                await asyncio.wait_for(
+                    self.websocket.send_text(frame),
+                    timeout=WS_SEND_TIMEOUT_SECONDS,
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Timed out or the socket is gone
+                on_failure(self)
+                return
+
+            ws_event_delivery_seconds.observe(
+                time.perf_counter() - queued_at, event_type_of(frame)
+            )
 
 
 class ConnectionManager:
-    def __init__(self) -> None:
-        self.active_connections: dict[int, WebSocket] = {}
+    # User ids per bus message, so that a NOTIFY payload stays small
+    SEND_CHUNK_SIZE = 500
+
+    def __init__(self, bus: EventBus) -> None:
+        self.active_connections: dict[int, set[Connection]] = {}
+        # Frames for conversations whose members are being loaded, in the
+        # order they were published
+        self._awaiting_members: dict[int, list[tuple[int | None, str]]] = {}
+        self.connection_count = 0
+
+        self._heartbeat: asyncio.Task | None = None
+        # Close handshakes and member loads in flight: the loop only holds
+        # weak references to tasks, so they are kept here until they finish
+        self._background: set[asyncio.Task] = set()
+
+        self.bus = bus
+        self.bus.set_handler(self)
+
+    async def start(self) -> None:
+        await self.bus.start()
+        self._heartbeat = asyncio.create_task(self._heartbeat_loop())
+
+    async def stop(self) -> None:
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._heartbeat
+            self._heartbeat = None
+
+        await self.bus.stop()
+
+    async def connect(self, user_id: int, websocket: WebSocket) -> Connection | None:
+        """None if the socket was refused, it is closed already."""
+        if self.connection_count >= WS_MAX_CONNECTIONS:
+            ws_rejected_total.inc("worker_full")
+            await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+            return None
+
+        # The slot is taken before the handshake is awaited, so that
+        # concurrent handshakes can't all pass the check above
+        self.connection_count += 1
+        logger.info(f"Connecting user {user_id}", extra={"user_id": user_id})
+        try:
+            await websocket.accept()
+        except BaseException:
+            # Also when cancelled
+            self.connection_count -= 1
+            raise
+
+        # A new socket usually means the old ones are stale, so the oldest
+        # gives way rather than the new one
+        connections = self.active_connections.get(user_id, ())
+        if len(connections) >= WS_MAX_CONNECTIONS_PER_USER:
+            ws_rejected_total.inc("user_full")
+            oldest = min(connections, key=lambda c: c.connected_at)
+            self.close(
+                oldest,
+                code=status.WS_1008_POLICY_VIOLATION,
+                reason="too many connections",
+            )
+
+        connection = Connection(user_id, websocket)
+        self.active_connections.setdefault(user_id, set()).add(connection)
+        connection.start(on_failure=self.evict)
+        return connection
+
+    def disconnect(self, connection: Connection) -> None:
+        """Safe to call more than once for the same connection."""
+        connections = self.active_connections.get(connection.user_id)
+        if connections is not None and connection in connections:
+            connections.discard(connection)
+            self.connection_count -= 1
+            if not connections:
+                del self.active_connections[connection.user_id]
+
+        connection.stop()
+
+    def close(self, connection: Connection, code: int, reason: str) -> None:
+        self.disconnect(connection)
+        self._spawn(connection.close(code=code, reason=reason))
 
-    async def connect(self, user_id: int, websocket: WebSocket):
-        print("Connecting user:", user_id)
-        await websocket.accept()
-        self.active_connections[user_id] = websocket
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background_done)
 
-    def disconnect(self, user_id: int):
-        self.active_connections.pop(user_id, None)
+    def _background_done(self, task: asyncio.Task) -> None:
+        self._background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Background task failed", exc_info=task.exception())
 
-    async def send_to_user(
+    def evict(self, connection: Connection) -> None:
+        ws_evictions_total.inc()
+        self.close(
+            connection, code=status.WS_1013_TRY_AGAIN_LATER, reason="slow consumer"
+        )
+
+    async def send(
         self,
-        user_id: int,
+        user_ids: Iterable[int],
         event_type: WSEventType,
-        payload: dict | None = None,
-        str_payload: str | None = None,
-    ):
-        ws = self.active_connections.get(user_id)
-        if ws:
-            event: dict[str, Any] = {
-                "type": event_type,
-            }
-            if payload is not None:
-                event["payload"] = payload
+        payload: BaseModel | dict[str, Any] | None = None,
+    ) -> None:
+        user_ids = list(dict.fromkeys(user_ids))
+        if not user_ids:
+            return
+
+        started_at = time.perf_counter()
+        frame = encode_event(event_type, payload)
+        for i in range(0, len(user_ids), self.SEND_CHUNK_SIZE):
+            await self.bus.publish(user_ids[i:i + self.SEND_CHUNK_SIZE], frame)
+
+        ws_event_publish_seconds.observe(
+            time.perf_counter() - started_at, event_type.value
+        )
+
+    def reply(
+        self,
+        connection: Connection,
+        event_type: WSEventType,
+        payload: BaseModel | dict[str, Any] | None = None,
+    ) -> None:
+        """Sends to this one socket only, e.g. the answer to its command."""
+        if not connection.enqueue(encode_event(event_type, payload)):
+            self.evict(connection)
+
+    async def send_to_conversation(
+        self,
+        conversation_id: int,
+        event_type: WSEventType,
+        payload: BaseModel | dict[str, Any] | None = None,
+        exclude_user_id: int | None = None,
+    ) -> None:
+        """
+        Sends to every member of the conversation. Members are resolved by
+        each worker from its membership cache, so the event costs the same
+        to publish whatever the size of the conversation.
+        """
+        started_at = time.perf_counter()
+        frame = encode_event(event_type, payload)
+        await self.bus.publish_to_conversation(
+            conversation_id, frame, exclude_user_id=exclude_user_id
+        )
+
+        ws_event_publish_seconds.observe(
+            time.perf_counter() - started_at, event_type.value
+        )
+
+    async def membership_changed(self, conversation_id: int) -> None:
+        """Call once the change is committed."""
+        membership_cache.invalidate(conversation_id)
+        await self.bus.publish_membership_change(conversation_id)
+
+    def deliver(self, user_ids: Sequence[int], frame: str) -> None:
+        for user_id in user_ids:
+            connections = self.active_connections.get(user_id)
+            if not connections:
+                continue
+
+            for connection in list(connections):
+                if not connection.enqueue(frame):
+                    self.evict(connection)
+
+    def deliver_to_conversation(
+        self, conversation_id: int, exclude_user_id: int | None, frame: str
+    ) -> None:
+        awaiting = self._awaiting_members.get(conversation_id)
+        if awaiting is not None:
+            awaiting.append((exclude_user_id, frame))
+            return
+
+        membership = membership_cache.peek(conversation_id)
+        if membership is not None:
+            self._deliver_to_members(membership.member_ids, exclude_user_id, frame)
+            return
+
+        self._awaiting_members[conversation_id] = [(exclude_user_id, frame)]
+        self._spawn(self._deliver_when_loaded(conversation_id))
+
+    def invalidate_membership(self, conversation_id: int) -> None:
+        membership_cache.invalidate(conversation_id)
+
+    def _deliver_to_members(
+        self, member_ids: frozenset[int], exclude_user_id: int | None, frame: str
+    ) -> None:
+        # Walks the smaller side: a large group mostly has members connected
+        # to other workers, a busy worker has sockets of many conversations
+        if len(member_ids) <= len(self.active_connections):
+            user_ids = member_ids
+        else:
+            user_ids = member_ids.intersection(self.active_connections)
+
+        self.deliver(
+            [user_id for user_id in user_ids if user_id != exclude_user_id], frame
+        )
+
+    async def _heartbeat_loop(self) -> None:
+        ping = encode_event(WSEventType.PING)
+        while True:
+            await asyncio.sleep(WS_HEARTBEAT_INTERVAL_SECONDS)
+            try:
+                self._check_heartbeats(ping)
+            except Exception:
+                logger.exception("Heartbeat round failed")
+
+    def _check_heartbeats(self, ping: str) -> None:
+        # Half-open sockets never fail a write, they only stop talking
+        deadline = time.monotonic() - WS_HEARTBEAT_TIMEOUT_SECONDS
+        for connections in list(self.active_connections.values()):
+            for connection in list(connections):
+                if connection.last_seen < deadline:
+                    ws_reaped_total.inc()
+                    self.close(
+                        connection,
+                        code=status.WS_1001_GOING_AWAY,
+                        reason="heartbeat timeout",
+                    )
+                elif not connection.enqueue(ping):
+                    self.evict(connection)
+
+    async def _deliver_when_loaded(self, conversation_id: int) -> None:
+        try:
+            membership = await membership_cache.get(conversation_id)
+        except Exception:
+            logger.exception(
+                f"Failed to load members of conversation {conversation_id}, "
+                f"events dropped"
+            )
+            membership = None
+
+        awaiting = self._awaiting_members.pop(conversation_id, [])
+        if membership is None:
+            return
+
+        for exclude_user_id, frame in awaiting:
+            self._deliver_to_members(membership.member_ids, exclude_user_id, frame)
+
+
+ws_manager = ConnectionManager(bus=create_event_bus())
 
-            if str_payload is not None:
-                payload = json.loads(str_payload)
-                event["payload"] = payload
 
-            await ws.send_json(event)
+def _queue_depths() -> list[int]:
+    return [
+        connection.queue.qsize()
+        for connections in ws_manager.active_connections.values()
+        for connection in connections
+    ]
 
 
-ws_manager = ConnectionManager()
+registry.register(Gauge(
+    "ws_connections",
+    "Open sockets.",
+    collect=lambda: ws_manager.connection_count,
+))
+registry.register(Gauge(
+    "ws_connected_users",
+    "Users with at least one open socket.",
+    collect=lambda: len(ws_manager.active_connections),
+))
+registry.register(Gauge(
+    "ws_send_queue_depth",
+    "Events queued for all sockets.",
+    collect=lambda: sum(_queue_depths()),
+))
+registry.register(Gauge(
+    "ws_send_queue_depth_max",
+    "Events queued for the most backed up socket.",
+    collect=lambda: max(_queue_depths(), default=0),
+))
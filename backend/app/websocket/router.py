@@ -1,33 +1,175 @@
-from app.db import get_async_session
+from typing import Any
+
+from app.chat.read_cursor import advance_read_cursor
+from app.config import WS_TYPING_INTERVAL_SECONDS
+from app.conversation.membership import require_member
+from app.db import async_session_maker
+from app.exceptions.codes import Codes
+from app.exceptions.exceptions import AppException
+from app.exceptions.schemas import ErrorContent
+from app.logger import setup_logger
+from app.message import service as message_service
+from app.repository.message import MessageRepository
+from app.repository.reaction import ReactionRepository
+from app.user.schemas import UserIdentity
 from app.websocket.dependencies import get_current_user_ws
-from app.websocket.manager import ws_manager
-from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect
-from sqlalchemy.ext.asyncio import AsyncSession
+from app.websocket.events import WSCommandType, WSEventType
+from app.websocket.manager import Connection, ws_manager
+from app.websocket.schemas import (
+    MessageEditCommandPayload,
+    MessageSendCommandPayload,
+    ReactionAddCommandPayload,
+    ReadCursorCommandPayload,
+    TypingCommandPayload,
+    TypingPayload,
+    WSAckPayload,
+    WSCommand,
+    WSErrorPayload,
+)
+from app.websocket.throttle import Throttle
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+from sqlalchemy.exc import SQLAlchemyError
+
+logger = setup_logger(__name__)
 
 ws_router = APIRouter()
 
+# A typing event goes to every member on every worker, clients send one
+# per keystroke
+typing_throttle = Throttle(interval=WS_TYPING_INTERVAL_SECONDS)
 
-@ws_router.websocket("/ws")
-async def websocket_endpoint(
-    websocket: WebSocket,
-    session: AsyncSession = Depends(get_async_session),
-):
-    token_cookie = websocket.cookies.get("jwt")
-    if not token_cookie:
-        await websocket.close(code=1008)
+
+async def run_command(user: UserIdentity, command: WSCommand) -> Any:
+    """
+    Runs a command the way the matching HTTP route would and returns its
+    result. Writes get a session of their own, which is closed before the
+    next command is read, so an open socket holds no connection.
+    """
+    if command.type == WSCommandType.MESSAGE_SEND:
+        payload = MessageSendCommandPayload.model_validate(command.payload)
+        async with async_session_maker() as session:
+            return await message_service.send_message(
+                MessageRepository(session),
+                user,
+                conversation_id=payload.conversation_id,
+                text=payload.text,
+            )
+
+    if command.type == WSCommandType.MESSAGE_EDIT:
+        payload = MessageEditCommandPayload.model_validate(command.payload)
+        async with async_session_maker() as session:
+            return await message_service.edit_message(
+                MessageRepository(session),
+                user,
+                message_id=payload.message_id,
+                text=payload.text,
+            )
+
+    if command.type == WSCommandType.REACTION_ADD:
+        payload = ReactionAddCommandPayload.model_validate(command.payload)
+        async with async_session_maker() as session:
+            return await message_service.add_reaction(
+                ReactionRepository(session),
+                user,
+                message_id=payload.message_id,
+                reaction_type=payload.reaction_type,
+            )
+
+    if command.type == WSCommandType.TYPING:
+        payload = TypingCommandPayload.model_validate(command.payload)
+        await require_member(payload.conversation_id, user.user_id)
+        if not typing_throttle.allow((user.user_id, payload.conversation_id)):
+            return None
+
+        await ws_manager.send_to_conversation(
+            payload.conversation_id,
+            event_type=WSEventType.TYPING,
+            payload=TypingPayload(
+                conversation_id=payload.conversation_id, user_id=user.user_id
+            ),
+            exclude_user_id=user.user_id,
+        )
+        return None
+
+    if command.type == WSCommandType.READ_CURSOR:
+        payload = ReadCursorCommandPayload.model_validate(command.payload)
+        await require_member(payload.conversation_id, user.user_id)
+        await advance_read_cursor(
+            payload.conversation_id, user.user_id, payload.message_id
+        )
+        return None
+
+    # A pong only keeps the socket alive, which receiving it already did
+    return None
+
+
+async def handle_command(user: UserIdentity, connection: Connection, raw: str) -> None:
+    """
+    Commands with an id are answered with an ack carrying the result, or an
+    error frame with the same body as the HTTP error responses. Failed
+    commands without an id still get their error frame, with a null id.
+    """
+    command_id = None
+    try:
+        command = WSCommand.model_validate_json(raw)
+        command_id = command.id
+        result = await run_command(user, command)
+    except ValidationError as exc:
+        error = ErrorContent(
+            code=Codes.REQUEST_VALIDATION_ERROR,
+            message="Validation failed",
+            details={"errors": exc.errors(include_url=False, include_context=False)},
+        )
+    except AppException as exc:
+        error = ErrorContent(code=exc.code, message=exc.message, details=exc.details)
+    except Exception as exc:
+        # The socket stays open, the next command may well succeed
+        logger.exception(
+            "Websocket command failed",
+            extra={"user_id": user.user_id, "command_id": command_id},
+        )
+        if isinstance(exc, SQLAlchemyError):
+            error = ErrorContent(
+                code=Codes.DB_ERROR, message="Database error", details={}
+            )
+        else:
+            error = ErrorContent(
+                code=Codes.UNKNOWN_ERROR, message="Unexpected server error", details={}
+            )
+    else:
+        if command_id is not None:
+            ws_manager.reply(
+                connection,
+                WSEventType.ACK,
+                WSAckPayload(id=command_id, result=result),
+            )
         return
 
-    token = token_cookie.removeprefix("Bearer ").strip()
+    ws_manager.reply(
+        connection, WSEventType.ERROR, WSErrorPayload(id=command_id, error=error)
+    )
+
 
-    user = await get_current_user_ws(token, session)
+@ws_router.websocket("/ws")
+async def websocket_endpoint(websocket: WebSocket):
+    user = get_current_user_ws(websocket)
     if not user:
         await websocket.close(code=1008)
         return
 
-    await ws_manager.connect(user.user_id, websocket)
+    connection = await ws_manager.connect(user.user_id, websocket)
+    if connection is None:
+        return
 
     try:
+        # Commands of one socket run one at a time, in the order sent
         while True:
-            await websocket.receive_text()
+            raw = await websocket.receive_text()
+            connection.touch()
+            await handle_command(user, connection, raw)
     except WebSocketDisconnect:
-        ws_manager.disconnect(user.user_id)
+        pass
+    finally:
+        # Also when receiving or handling failed, so no socket is leaked
+        ws_manager.disconnect(connection)
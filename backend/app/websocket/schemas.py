@@ -1,7 +1,16 @@
 from enum import Enum
+from typing import Any
 
-from app.message.schemas import ReactionType
+from app.exceptions.schemas import ErrorContent
+from app.message.schemas import (
+    MessageCreate,
+    MessageEdit,
+    ReactionCreate,
+    ReactionType,
+)
 from app.schemas import GeneralSchema
+from app.websocket.events import WSCommandType
+from pydantic import Field
 
 
 class NotificationType(str, Enum):
@@ -21,3 +30,46 @@ class NewReactionNotificationPayload(GeneralSchema):
     chat_name: str
     sender_tag: str
     reaction_type: ReactionType
+
+
+class TypingPayload(GeneralSchema):
+    conversation_id: int
+    user_id: int
+
+
+class WSCommand(GeneralSchema):
+    type: WSCommandType
+    # Given back in the ack or error frame of the command
+    id: str | int | None = None
+    payload: dict = {}
+
+
+class MessageSendCommandPayload(MessageCreate):
+    conversation_id: int
+
+
+class MessageEditCommandPayload(MessageEdit):
+    message_id: int
+
+
+class ReactionAddCommandPayload(ReactionCreate):
+    message_id: int
+
+
+class TypingCommandPayload(GeneralSchema):
+    conversation_id: int
+
+
+class ReadCursorCommandPayload(GeneralSchema):
+    conversation_id: int
+    message_id: int = Field(..., ge=1)
+
+
+class WSAckPayload(GeneralSchema):
+    id: str | int
+    result: Any = None
+
+
+class WSErrorPayload(GeneralSchema):
+    id: str | int | None = None
+    error: ErrorContent
@@ -0,0 +1,34 @@
+import time
+from collections import OrderedDict
+
+
+class Throttle:
+    """
+    Lets an event through once per `interval` seconds per key, per worker.
+    Keys are kept in the order they were last let through, so the ones
+    whose interval is over are forgotten from the front, and the oldest
+    ones too when more than `max_keys` are kept.
+    """
+
+    def __init__(self, interval: float, max_keys: int = 10_000) -> None:
+        self.interval = interval
+        self.max_keys = max_keys
+        self._last: OrderedDict[tuple[int, int], float] = OrderedDict()
+
+    def allow(self, key: tuple[int, int]) -> bool:
+        now = time.monotonic()
+        last = self._last.get(key)
+        if last is not None and now - last < self.interval:
+            return False
+
+        self._last[key] = now
+        self._last.move_to_end(key)
+        self._forget(now)
+        return True
+
+    def _forget(self, now: float) -> None:
+        while self._last:
+            last = next(iter(self._last.values()))
+            if now - last < self.interval and len(self._last) <= self.max_keys:
+                return
+            self._last.popitem(last=False)
@@ -0,0 +1,187 @@
+"""
+Query plans of the hot paths before and after the model indexes.
+
+Builds a scratch schema in the database pointed to by URL_DB, seeds it,
+runs EXPLAIN (ANALYZE, BUFFERS) for every hot query with the secondary
+indexes dropped and then again with them created, and drops the schema.
+
+    python -m benchmarks.index_plans --users 2000 --messages 500000
+"""
+import argparse
+import asyncio
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, create_async_engine
+
+from app.config import URL_DB
+from app.models import Base
+
+SCHEMA = "bench_index_plans"
+
+SEED = [
+    """
+    INSERT INTO users (first_name, surname, tag, password_hashed)
+    SELECT 'user', 'bench', 'user' || i, 'x'
+    FROM generate_series(1, :users) AS i
+    """,
+    """
+    INSERT INTO conversations (type, created_at, title)
+    SELECT 'CHAT', now() - i * interval '1 minute', 'chat' || i
+    FROM generate_series(1, :chats) AS i
+    """,
+    """
+    INSERT INTO chats (conversation_id, user_id, user_id2)
+    SELECT DISTINCT ON (least(a, b), greatest(a, b)) i, a, b
+    FROM (
+        SELECT i, 1 + (i % :users) AS a, 1 + ((i / :users + i + 1) % :users) AS b
+        FROM generate_series(1, :chats) AS i
+    ) AS pairs
+    WHERE a <> b
+    """,
+    """
+    INSERT INTO conversation_members (conversation_id, user_id, role, joined_at)
+    SELECT conversation_id, member.user_id, 'MEMBER', now()
+    FROM chats
+    CROSS JOIN LATERAL (VALUES (chats.user_id), (chats.user_id2)) AS member (user_id)
+    """,
+    """
+    INSERT INTO messages (text, is_edited, created_at, user_id, conversation_id)
+    SELECT 'message ' || md5(i::text) || ' word' || (i % 5000),
+           false, now(), 1 + (i % :users), 1 + (i % :chats)
+    FROM generate_series(1, :messages) AS i
+    WHERE EXISTS (SELECT 1 FROM chats WHERE conversation_id = 1 + (i % :chats))
+    """,
+    """
+    INSERT INTO reactions (reaction_type, created_at, message_id, user_id)
+    SELECT 'like', now(), message_id, user_id
+    FROM messages
+    WHERE message_id % 3 = 0
+    """,
+    """
+    INSERT INTO sessions (refresh_token, created_at, user_id)
+    SELECT md5(i::text), now(), i
+    FROM generate_series(1, :users) AS i
+    """,
+]
+
+QUERIES = {
+    "history page": """
+        SELECT * FROM messages
+        WHERE conversation_id = 1
+        ORDER BY message_id DESC
+        LIMIT 51
+    """,
+    "reaction counts of a page": """
+        SELECT message_id, reaction_type, count(*),
+               max(reaction_id) FILTER (WHERE user_id = 2)
+        FROM reactions
+        WHERE message_id IN (
+            SELECT message_id FROM messages
+            WHERE conversation_id = 1
+            ORDER BY message_id DESC
+            LIMIT 50
+        )
+        GROUP BY message_id, reaction_type
+        ORDER BY message_id, min(reaction_id)
+    """,
+    "reactors of a message": """
+        SELECT reactions.reaction_id, reactions.reaction_type, users.tag
+        FROM reactions JOIN users ON users.user_id = reactions.user_id
+        WHERE reactions.message_id = 3
+        ORDER BY reactions.reaction_id
+        LIMIT 51
+    """,
+    "chat list": """
+        SELECT chats.conversation_id, chats.user_id, chats.user_id2,
+               conversations.title
+        FROM chats
+        JOIN conversations
+            ON conversations.conversation_id = chats.conversation_id
+        WHERE chats.user_id = 2 OR chats.user_id2 = 2
+        ORDER BY conversations.created_at DESC
+    """,
+    "chat exists": """
+        SELECT * FROM chats
+        WHERE least(user_id, user_id2) = 2 AND greatest(user_id, user_id2) = 3
+    """,
+    "message search": """
+        SELECT message_id,
+               ts_rank(to_tsvector('simple'::regconfig, text), query) AS rank
+        FROM messages, websearch_to_tsquery('simple'::regconfig, 'word42') AS query
+        WHERE to_tsvector('simple'::regconfig, text) @@ query
+          AND conversation_id IN (
+              SELECT conversation_id FROM conversation_members
+              WHERE user_id = 43
+          )
+        ORDER BY rank DESC, message_id DESC
+        LIMIT 21
+    """,
+    "conversation members": """
+        SELECT array_agg(user_id) FROM conversation_members
+        WHERE conversation_id = 1
+    """,
+    "is member": """
+        SELECT EXISTS (
+            SELECT 1 FROM conversation_members
+            WHERE conversation_id = 1 AND user_id = 2
+        )
+    """,
+    "session by tag": """
+        SELECT * FROM sessions
+        WHERE user_id = (SELECT user_id FROM users WHERE tag = 'user2')
+    """,
+}
+
+
+def secondary_indexes():
+    return [index for table in Base.metadata.sorted_tables for index in table.indexes]
+
+
+async def explain_all(conn: AsyncConnection, title: str) -> None:
+    await conn.execute(text("ANALYZE"))
+    print(f"\n######## {title} ########")
+    for name, query in QUERIES.items():
+        result = await conn.execute(
+            text(f"EXPLAIN (ANALYZE, BUFFERS, COSTS OFF) {query}")
+        )
+        print(f"\n--- {name}")
+        for (line,) in result:
+            print(line)
+
+
+async def main(users: int, chats: int, messages: int) -> None:
+    engine = create_async_engine(URL_DB)
+    try:
+        async with engine.connect() as conn:
+            await conn.execution_options(isolation_level="AUTOCOMMIT")
+            await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+            await conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+            await conn.execute(text(f"SET search_path TO {SCHEMA}"))
+
+            await conn.run_sync(Base.metadata.create_all)
+            for index in secondary_indexes():
+                await conn.run_sync(index.drop)
+
+            params = {"users": users, "chats": chats, "messages": messages}
+            for stmt in SEED:
+                await conn.execute(text(stmt), params)
+
+            try:
+                await explain_all(conn, "before")
+                for index in secondary_indexes():
+                    await conn.run_sync(index.create)
+                await explain_all(conn, "after")
+            finally:
+                await conn.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=2_000)
+    parser.add_argument("--chats", type=int, default=20_000)
+    parser.add_argument("--messages", type=int, default=500_000)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.users, args.chats, args.messages))
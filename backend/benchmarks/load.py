@@ -0,0 +1,463 @@
+"""
+Load test of the REST and WebSocket paths: login, chat list, paginated
+history, sends fanned out to connected receivers and a reaction storm.
+
+Builds a scratch schema in the database pointed to by URL_DB, seeds it,
+serves app.main:app with uvicorn from a thread of this process and drives
+it over HTTP and WebSocket. Every scenario reports p50/p99 latency,
+throughput and the statements the app sent per request; sends also report
+how long a message took to reach the receivers.
+
+Baselines are plain JSON: save one, then compare later runs against it to
+catch regressions in routers and repositories.
+
+    python -m benchmarks.load --users 2000 --receivers 500 --save base.json
+    python -m benchmarks.load --users 2000 --receivers 500 --compare base.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import sys
+import time
+from dataclasses import asdict, dataclass
+from typing import Awaitable, Callable, Iterable
+
+import httpx
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from websockets.asyncio.client import connect as ws_connect
+
+from app.auth.hashing import _hash
+from app.auth.utils import create_access_token
+from app.config import URL_DB
+from app.models import Base
+from benchmarks.server import Server, cookie, free_port
+
+SCHEMA = "bench_load"
+PASSWORD = "bench-password"
+REACTION_TYPES = ("like", "laugh", "sad", "heart", "embarrassed")
+
+Call = Callable[[], Awaitable[httpx.Response]]
+
+SEED = [
+    """
+    INSERT INTO users (first_name, surname, tag, password_hashed)
+    SELECT 'user', 'bench', 'user' || i, :password_hashed
+    FROM generate_series(1, :users) AS i
+    """,
+    """
+    INSERT INTO sessions (refresh_token, user_id, created_at)
+    SELECT 'bench', user_id, now() FROM users ORDER BY user_id
+    """,
+    # User a chats with the next chats_per_user users, so pairs are unique
+    # as long as users > 2 * chats_per_user
+    """
+    INSERT INTO conversations (type, created_at, title)
+    SELECT 'CHAT', now() - n * interval '1 second', 'chat' || n
+    FROM generate_series(1, :users * :chats_per_user) AS n
+    """,
+    """
+    INSERT INTO chats (conversation_id, user_id, user_id2)
+    SELECT n, a, 1 + (a + (n - 1) % :chats_per_user) % :users
+    FROM (
+        SELECT n, 1 + (n - 1) / :chats_per_user AS a
+        FROM generate_series(1, :users * :chats_per_user) AS n
+    ) AS pairs
+    """,
+    """
+    INSERT INTO conversation_members (conversation_id, user_id, role, joined_at)
+    SELECT conversation_id, member.user_id, 'MEMBER', now()
+    FROM chats
+    CROSS JOIN LATERAL (VALUES (chats.user_id), (chats.user_id2)) AS member (user_id)
+    """,
+    """
+    INSERT INTO messages (conversation_id, user_id, text, created_at, is_edited)
+    SELECT chats.conversation_id,
+           CASE WHEN i % 2 = 0 THEN chats.user_id ELSE chats.user_id2 END,
+           'message ' || i, now() - (:messages_per_chat - i) * interval '1 second',
+           false
+    FROM chats CROSS JOIN generate_series(1, :messages_per_chat) AS i
+    ORDER BY chats.conversation_id, i
+    """,
+    # The group every receiver is a member of, user 1 owns it and sends
+    """
+    INSERT INTO conversations (type, created_at, title)
+    VALUES ('GROUP', now(), 'bench group')
+    """,
+    """
+    INSERT INTO conversation_members (conversation_id, user_id, role, joined_at)
+    SELECT (SELECT max(conversation_id) FROM conversations), i,
+           CASE WHEN i = 1 THEN 'OWNER' ELSE 'MEMBER' END::memberrole, now()
+    FROM generate_series(1, :receivers + 1) AS i
+    """,
+    """
+    INSERT INTO messages (conversation_id, user_id, text, created_at, is_edited)
+    SELECT max(conversation_id), 1, 'react to me', now(), false
+    FROM conversations
+    """,
+]
+
+
+@dataclass
+class Result:
+    requests: int
+    errors: int
+    p50_ms: float
+    p99_ms: float
+    throughput: float
+    queries_per_request: float
+
+
+def percentile(values: list[float], p: float) -> float:
+    # Nearest rank
+    ordered = sorted(values)
+    return ordered[max(math.ceil(p * len(ordered)) - 1, 0)]
+
+
+class Bench:
+    def __init__(self, args: argparse.Namespace, server: Server, base_url: str):
+        self.args = args
+        self.server = server
+        self.base_url = base_url
+        self.ws_url = base_url.replace("http://", "ws://") + "/ws"
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            limits=httpx.Limits(max_connections=args.concurrency),
+            timeout=60,
+        )
+        self.tokens: dict[int, str] = {}
+        self.chats: dict[int, list[int]] = {}
+        self.group_id = 0
+        self.group_message_id = 0
+
+    async def load_fixtures(self, conn) -> None:
+        sessions = await conn.execute(text(
+            "SELECT users.user_id, users.tag, sessions.session_id "
+            "FROM users JOIN sessions USING (user_id)"
+        ))
+        for user_id, tag, session_id in sessions:
+            self.tokens[user_id] = create_access_token(user_id, tag, session_id)
+
+        chats = await conn.execute(text(
+            "SELECT user_id, conversation_id FROM conversation_members "
+            "JOIN conversations USING (conversation_id) WHERE type = 'CHAT'"
+        ))
+        for user_id, conversation_id in chats:
+            self.chats.setdefault(user_id, []).append(conversation_id)
+
+        self.group_id, self.group_message_id = (await conn.execute(text(
+            "SELECT conversation_id, message_id FROM messages "
+            "ORDER BY message_id DESC LIMIT 1"
+        ))).one()
+
+    async def run(self, name: str, sequences: Iterable[list[Call]]) -> Result:
+        """Workers take a sequence of requests each and send it in order."""
+        latencies: list[float] = []
+        errors = 0
+        sequences = iter(sequences)
+
+        async def worker() -> None:
+            nonlocal errors
+            for sequence in sequences:
+                for call in sequence:
+                    started = time.perf_counter()
+                    try:
+                        response = await call()
+                        failed = response.status_code >= 400
+                    except httpx.HTTPError:
+                        failed = True
+                    latencies.append(time.perf_counter() - started)
+                    errors += failed
+
+        statements = self.server.statements.count
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(self.args.concurrency)))
+        elapsed = time.perf_counter() - started
+        statements = self.server.statements.count - statements
+
+        result = Result(
+            requests=len(latencies),
+            errors=errors,
+            p50_ms=round(percentile(latencies, 0.50) * 1000, 3),
+            p99_ms=round(percentile(latencies, 0.99) * 1000, 3),
+            throughput=round(len(latencies) / elapsed, 1),
+            queries_per_request=round(statements / len(latencies), 2),
+        )
+        print_result(name, result)
+        return result
+
+    def user_ids(self) -> Iterable[int]:
+        users = self.args.users
+        return ((i % users) + 1 for i in range(self.args.requests))
+
+    async def chat_list(self) -> Result:
+        return await self.run("chat list", (
+            [lambda user_id=user_id: self.client.get(
+                "/api/v1/chat", headers=cookie(self.tokens[user_id])
+            )]
+            for user_id in self.user_ids()
+        ))
+
+    async def history(self) -> Result:
+        def walk(user_id: int) -> list[Call]:
+            # Each page continues from the cursor of the one before
+            chat_id = self.chats[user_id][0]
+            cursor = {"before": None}
+
+            async def page() -> httpx.Response:
+                params = {"limit": self.args.page_size}
+                if cursor["before"] is not None:
+                    params["before"] = cursor["before"]
+                response = await self.client.get(
+                    f"/api/v1/chat/{chat_id}/message",
+                    params=params,
+                    headers=cookie(self.tokens[user_id]),
+                )
+                if response.status_code == 200:
+                    cursor["before"] = response.json()["next_cursor"]
+                return response
+
+            return [page] * self.args.history_pages
+
+        return await self.run("history", (walk(user_id) for user_id in self.user_ids()))
+
+    async def send_with_receivers(self) -> tuple[Result, Result]:
+        receivers = range(2, self.args.receivers + 2)
+        expected = self.args.requests * len(receivers)
+        sent_at: dict[str, float] = {}
+        deliveries: list[float] = []
+        all_delivered = asyncio.Event()
+
+        async def receive(websocket) -> None:
+            async for frame in websocket:
+                event = json.loads(frame)
+                if event["type"] == "ping":
+                    await websocket.send('{"type":"pong"}')
+                    continue
+                if event["type"] != "message.created":
+                    continue
+                sent = sent_at.get(event["payload"]["text"])
+                if sent is not None:
+                    deliveries.append(time.perf_counter() - sent)
+                    if len(deliveries) >= expected:
+                        all_delivered.set()
+
+        sockets = [
+            await ws_connect(
+                self.ws_url,
+                additional_headers=cookie(self.tokens[user_id]),
+                max_queue=None,
+            )
+            for user_id in receivers
+        ]
+        readers = [asyncio.create_task(receive(ws)) for ws in sockets]
+
+        def call(i: int):
+            body = f"bench {i}"
+            sent_at[body] = time.perf_counter()
+            return self.client.post(
+                f"/api/v1/chat/{self.group_id}/message",
+                json={"text": body},
+                headers=cookie(self.tokens[1]),
+            )
+
+        try:
+            result = await self.run(
+                f"send x{len(receivers)}",
+                ([lambda i=i: call(i)] for i in range(self.args.requests)),
+            )
+            try:
+                await asyncio.wait_for(all_delivered.wait(), timeout=30)
+            except asyncio.TimeoutError:
+                pass
+        finally:
+            for reader in readers:
+                reader.cancel()
+            await asyncio.gather(*(ws.close() for ws in sockets))
+
+        delivery = Result(
+            requests=len(deliveries),
+            errors=expected - len(deliveries),
+            p50_ms=round(percentile(deliveries or [0], 0.50) * 1000, 3),
+            p99_ms=round(percentile(deliveries or [0], 0.99) * 1000, 3),
+            throughput=0.0,
+            queries_per_request=0.0,
+        )
+        print_result("  delivered", delivery)
+        return result, delivery
+
+    async def reaction_storm(self) -> Result:
+        # Every (member, type) pair once, all on the same message
+        members = self.args.receivers + 1
+        pairs = [
+            (user_id, reaction_type)
+            for reaction_type in REACTION_TYPES
+            for user_id in range(1, members + 1)
+        ][:self.args.requests]
+
+        return await self.run("reactions", (
+            [lambda user_id=user_id, reaction_type=reaction_type: self.client.post(
+                f"/api/v1/message/{self.group_message_id}/reaction",
+                json={"reaction_type": reaction_type},
+                headers=cookie(self.tokens[user_id]),
+            )]
+            for user_id, reaction_type in pairs
+        ))
+
+    async def login(self) -> Result:
+        # Last: logging in revokes the sessions the other scenarios use
+        logins = min(self.args.logins, self.args.users)
+        return await self.run("login", (
+            [lambda user_id=user_id: self.client.post(
+                "/api/v1/auth/token",
+                data={"username": f"user{user_id}", "password": PASSWORD},
+            )]
+            for user_id in range(1, logins + 1)
+        ))
+
+
+def print_result(name: str, result: Result) -> None:
+    print(
+        f"{name:<14} {result.requests:>7} req  {result.errors:>5} err  "
+        f"p50 {result.p50_ms:9.2f} ms  p99 {result.p99_ms:9.2f} ms  "
+        f"{result.throughput:9.1f} req/s  {result.queries_per_request:6.2f} q/req"
+    )
+
+
+def compare(baseline: dict, results: dict[str, Result], tolerance: float) -> bool:
+    """Prints the changes against the baseline, True if anything regressed."""
+    if baseline["config"] != results["config"]:
+        print("\nwarning: the baseline was recorded with other settings")
+
+    regressed = False
+    print(f"\n{'scenario':<14} {'metric':<20} {'baseline':>10} {'now':>10} {'change':>8}")
+    for name, now in results["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if before is None:
+            continue
+
+        for metric, value in now.items():
+            if metric in ("requests", "errors") or not before[metric]:
+                continue
+            change = (value - before[metric]) / before[metric]
+            # Throughput is the only metric where less is worse
+            worse = -change if metric == "throughput" else change
+            flag = "  REGRESSION" if worse > tolerance else ""
+            regressed |= bool(flag)
+            print(
+                f"{name:<14} {metric:<20} {before[metric]:>10} {value:>10} "
+                f"{change:>+8.1%}{flag}"
+            )
+
+    return regressed
+
+
+async def main(args: argparse.Namespace) -> int:
+    admin = create_async_engine(URL_DB)
+    async with admin.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        await conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        await conn.execute(text(f"SET search_path TO {SCHEMA}"))
+
+        await conn.run_sync(Base.metadata.create_all)
+        params = {
+            "users": args.users,
+            "chats_per_user": args.chats_per_user,
+            "messages_per_chat": args.messages_per_chat,
+            "receivers": args.receivers,
+            "password_hashed": _hash(PASSWORD),
+        }
+        for stmt in SEED:
+            await conn.execute(text(stmt), params)
+        await conn.execute(text("ANALYZE"))
+
+    port = free_port()
+    server = Server(port, SCHEMA)
+    bench = Bench(args, server, f"http://127.0.0.1:{port}")
+    try:
+        async with admin.connect() as conn:
+            await conn.execute(text(f"SET search_path TO {SCHEMA}"))
+            await bench.load_fixtures(conn)
+
+        await server.start()
+        scenarios: dict[str, Result] = {}
+        if "chats" in args.scenarios:
+            scenarios["chat list"] = await bench.chat_list()
+        if "history" in args.scenarios:
+            scenarios["history"] = await bench.history()
+        if "send" in args.scenarios:
+            scenarios["send"], scenarios["delivery"] = await bench.send_with_receivers()
+        if "reactions" in args.scenarios:
+            scenarios["reactions"] = await bench.reaction_storm()
+        if "login" in args.scenarios:
+            scenarios["login"] = await bench.login()
+    finally:
+        await bench.client.aclose()
+        if server.thread.is_alive():
+            server.stop()
+        async with admin.connect() as conn:
+            await conn.execution_options(isolation_level="AUTOCOMMIT")
+            await conn.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+        await admin.dispose()
+
+    config = {
+        name: value
+        for name, value in vars(args).items()
+        if name not in ("save", "compare", "tolerance")
+    }
+    results = {
+        "config": config,
+        "scenarios": {name: asdict(result) for name, result in scenarios.items()},
+    }
+
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump(results, file, indent=2)
+        print(f"\nbaseline saved to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        if compare(baseline, results, args.tolerance):
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--chats-per-user", type=int, default=10)
+    parser.add_argument("--messages-per-chat", type=int, default=200)
+    parser.add_argument("--receivers", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=2_000)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--history-pages", type=int, default=4)
+    parser.add_argument(
+        "--scenarios",
+        nargs="+",
+        default=["chats", "history", "send", "reactions", "login"],
+        choices=["chats", "history", "send", "reactions", "login"],
+    )
+    parser.add_argument("--save", metavar="PATH", help="write the results as a baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare against a baseline")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="relative change that counts as a regression (default 0.2)",
+    )
+    args = parser.parse_args()
+
+    if args.users <= 2 * args.chats_per_user:
+        parser.error("--users must be more than twice --chats-per-user")
+    if args.receivers >= args.users:
+        parser.error("--receivers must be less than --users")
+
+    sys.exit(asyncio.run(main(args)))
@@ -0,0 +1,124 @@
+"""
+Message write throughput: one transaction per message, batches through
+insert_messages, and concurrent single sends through the coalescer.
+
+Builds a scratch schema in the database pointed to by URL_DB, runs every
+mode on a single pooled connection and drops the schema.
+
+    python -m benchmarks.message_ingest --messages 5000 --batch 100
+"""
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.config import URL_DB
+from app.message.coalescer import MessageWriteCoalescer
+from app.models import Base
+from app.repository.message import MessageRepository
+
+SCHEMA = "bench_message_ingest"
+
+SEED = [
+    """
+    INSERT INTO users (first_name, surname, tag, password_hashed)
+    VALUES ('user', 'bench', 'bench', 'x')
+    """,
+    """
+    INSERT INTO conversations (type, created_at, title)
+    VALUES ('GROUP', now(), 'bench')
+    """,
+]
+
+
+def report(name: str, messages: int, elapsed: float) -> None:
+    print(f"{name:<12} {messages:>7} messages  {elapsed:7.2f} s  "
+          f"{messages / elapsed:9.0f} msg/s")
+
+
+async def single(session_maker, messages: int) -> None:
+    started = time.perf_counter()
+    for i in range(messages):
+        async with session_maker() as session:
+            async with session.begin():
+                await MessageRepository(session).create_message(
+                    conversation_id=1, user_id=1, text=f"single {i}"
+                )
+    report("single", messages, time.perf_counter() - started)
+
+
+async def batched(session_maker, messages: int, batch: int) -> None:
+    started = time.perf_counter()
+    for offset in range(0, messages, batch):
+        rows = [
+            (1, 1, f"batch {i}")
+            for i in range(offset, min(offset + batch, messages))
+        ]
+        async with session_maker() as session:
+            await MessageRepository(session).insert_messages(rows)
+    report("batched", messages, time.perf_counter() - started)
+
+
+async def coalesced(
+    session_maker, messages: int, batch: int, concurrency: int, window: float
+) -> None:
+    coalescer = MessageWriteCoalescer(
+        window=window, max_batch=batch, session_maker=session_maker
+    )
+    queue = iter(range(messages))
+
+    async def sender() -> None:
+        for i in queue:
+            await coalescer.submit(conversation_id=1, user_id=1, text=f"coalesced {i}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(sender() for _ in range(concurrency)))
+    await coalescer.stop()
+    report("coalesced", messages, time.perf_counter() - started)
+
+
+async def main(messages: int, batch: int, concurrency: int, window: float) -> None:
+    admin = create_async_engine(URL_DB)
+    async with admin.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        await conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+
+    # One connection, so the modes compare writes per connection
+    engine = create_async_engine(
+        URL_DB,
+        pool_size=1,
+        max_overflow=0,
+        connect_args={"server_settings": {"search_path": SCHEMA}},
+    )
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            for stmt in SEED:
+                await conn.execute(text(stmt))
+
+        await single(session_maker, messages)
+        await batched(session_maker, messages, batch)
+        await coalesced(session_maker, messages, batch, concurrency, window)
+    finally:
+        await engine.dispose()
+        async with admin.connect() as conn:
+            await conn.execution_options(isolation_level="AUTOCOMMIT")
+            await conn.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+        await admin.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=5_000)
+    parser.add_argument("--batch", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--window-ms", type=float, default=2)
+    args = parser.parse_args()
+
+    asyncio.run(
+        main(args.messages, args.batch, args.concurrency, args.window_ms / 1000)
+    )
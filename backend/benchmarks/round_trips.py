@@ -0,0 +1,121 @@
+"""
+Statements per create path: every repository method that creates rows
+must write and return them in a single statement.
+
+Builds a scratch schema in the database pointed to by URL_DB, calls each
+create inside an open transaction, as the request's unit of work does,
+counts the statements it sends and drops the schema. Exits non-zero if a
+create takes more than one statement.
+
+    python -m benchmarks.round_trips
+"""
+import asyncio
+import sys
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.config import URL_DB
+from app.models import Base
+from app.repository.chat import ChatRepository
+from app.repository.conversation import ConversationRepository
+from app.repository.group import GroupRepository
+from app.repository.message import MessageRepository
+from app.repository.reaction import ReactionRepository
+from app.repository.read_cursor import ReadCursorRepository
+from app.repository.session import SessionRepository
+from app.repository.user import UserRepository
+
+SCHEMA = "bench_round_trips"
+
+SEED = [
+    """
+    INSERT INTO users (first_name, surname, tag, password_hashed)
+    SELECT 'user', 'bench', 'bench' || i, 'x' FROM generate_series(1, 4) i
+    """,
+    """
+    INSERT INTO conversations (type, created_at, title)
+    VALUES ('GROUP', now(), 'bench')
+    """,
+    """
+    INSERT INTO conversation_members (conversation_id, user_id, role, joined_at)
+    VALUES (1, 1, 'OWNER', now())
+    """,
+    """
+    INSERT INTO messages (conversation_id, user_id, text, created_at, is_edited)
+    VALUES (1, 1, 'seed', now(), false)
+    """,
+]
+
+CREATES = [
+    ("user", lambda s: UserRepository(s).insert_user("user", "bench", "new", "x")),
+    ("session", lambda s: SessionRepository(s).insert_session("token", 1)),
+    ("contact", lambda s: UserRepository(s).add_contact(1, 2)),
+    ("chat", lambda s: ChatRepository(s).insert_chat("chat", 1, 2)),
+    ("group", lambda s: GroupRepository(s).insert_group("group", 1, [2, 3])),
+    ("members", lambda s: ConversationRepository(s).add_members(1, [2, 3])),
+    ("message", lambda s: MessageRepository(s).create_message(1, 1, "hello")),
+    (
+        "messages",
+        lambda s: MessageRepository(s).insert_messages([(1, 1, "a"), (1, 2, "b")]),
+    ),
+    ("reaction", lambda s: ReactionRepository(s).add_reaction(1, 2, "like")),
+    ("read cursors", lambda s: ReadCursorRepository(s).upsert_cursors([(2, 1, 1)])),
+]
+
+
+async def main() -> int:
+    admin = create_async_engine(URL_DB)
+    async with admin.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        await conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+
+    engine = create_async_engine(
+        URL_DB,
+        pool_size=1,
+        max_overflow=0,
+        connect_args={"server_settings": {"search_path": SCHEMA}},
+    )
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+
+    statements: list[str] = []
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    failed = 0
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            for stmt in SEED:
+                await conn.execute(text(stmt))
+
+        for name, create in CREATES:
+            async with session_maker() as session:
+                async with session.begin():
+                    # Opens the transaction, so that only the create is counted
+                    await session.execute(text("SELECT 1"))
+                    statements.clear()
+                    await create(session)
+                    sent = len(statements)
+
+            status = "ok" if sent == 1 else "FAIL"
+            failed += sent != 1
+            print(f"{name:<14} {sent} statement(s)  {status}")
+            if sent != 1:
+                for statement in statements:
+                    print("    " + " ".join(statement.split())[:120])
+    finally:
+        await engine.dispose()
+        async with admin.connect() as conn:
+            await conn.execution_options(isolation_level="AUTOCOMMIT")
+            await conn.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+        await admin.dispose()
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
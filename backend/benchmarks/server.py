@@ -0,0 +1,63 @@
+"""
+The app served by uvicorn from a thread of the benchmark process, on a
+scratch schema. app.main is imported when the server is created, so a
+benchmark can change the settings in the environment before that.
+"""
+import asyncio
+import socket
+import threading
+
+import uvicorn
+from sqlalchemy import event
+
+
+class StatementCounter:
+    """Counts statements the app sends, from the server's thread."""
+
+    def __init__(self) -> None:
+        self.count = 0
+
+    def __call__(self, *args) -> None:
+        self.count += 1
+
+
+class Server:
+    """uvicorn on its own thread and event loop, so that the clients
+    driving it don't share a loop with the app."""
+
+    def __init__(self, port: int, schema: str) -> None:
+        from app.db import engine
+        from app.main import app
+
+        @event.listens_for(engine.sync_engine, "do_connect")
+        def use_scratch_schema(dialect, conn_rec, cargs, cparams):
+            cparams.setdefault("server_settings", {})["search_path"] = schema
+
+        self.statements = StatementCounter()
+        event.listen(engine.sync_engine, "before_cursor_execute", self.statements)
+
+        self.server = uvicorn.Server(
+            uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+        )
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    async def start(self) -> None:
+        self.thread.start()
+        while not self.server.started:
+            if not self.thread.is_alive():
+                raise RuntimeError("The server failed to start")
+            await asyncio.sleep(0.05)
+
+    def stop(self) -> None:
+        self.server.should_exit = True
+        self.thread.join()
+
+
+def cookie(token: str) -> dict[str, str]:
+    return {"Cookie": f'jwt="Bearer {token}"'}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
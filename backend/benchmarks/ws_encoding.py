@@ -0,0 +1,72 @@
+"""
+CPU cost of encoding one WebSocket event for N recipient sockets.
+
+"per recipient" is the old path: model_dump_json -> json.loads -> envelope
+dict -> json.dumps inside send_json, for every socket. "once" is
+encode_event, whose frame is reused for all sockets.
+
+    python -m benchmarks.ws_encoding --recipients 1 2 10 100
+"""
+import argparse
+import json
+import timeit
+from datetime import datetime, timezone
+
+from app.message.schemas import MessagePublic, ReactionPublic
+from app.websocket.events import WSEventType, encode_event, orjson
+
+
+def make_message() -> MessagePublic:
+    return MessagePublic(
+        message_id=123456,
+        text="Lorem ipsum dolor sit amet, consectetur adipiscing elit " * 8,
+        user_id=42,
+        created_at=datetime.now(timezone.utc),
+        is_edited=False,
+        conversation_id=777,
+        reactions=[
+            ReactionPublic(
+                reaction_id=i, reaction_type="like", message_id=123456, user_id=i
+            )
+            for i in range(10)
+        ],
+    )
+
+
+def per_recipient(message: MessagePublic, recipients: int) -> None:
+    str_payload = message.model_dump_json()
+    for _ in range(recipients):
+        event = {
+            "type": WSEventType.MESSAGE_CREATED,
+            "payload": json.loads(str_payload),
+        }
+        json.dumps(event, separators=(",", ":"), ensure_ascii=False)
+
+
+def once(message: MessagePublic, recipients: int) -> None:
+    frame = encode_event(WSEventType.MESSAGE_CREATED, message)
+    for _ in range(recipients):
+        _ = frame
+
+
+def main(recipients: list[int], number: int) -> None:
+    message = make_message()
+    print(f"orjson: {'yes' if orjson is not None else 'no'}, {number} events")
+    print(f"{'recipients':>10} {'per recipient':>16} {'once':>12} {'speedup':>8}")
+
+    for n in recipients:
+        old = timeit.timeit(lambda: per_recipient(message, n), number=number)
+        new = timeit.timeit(lambda: once(message, n), number=number)
+        print(
+            f"{n:>10} {old / number * 1e6:>13.1f} us {new / number * 1e6:>9.1f} us "
+            f"{old / new:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--recipients", type=int, nargs="+", default=[1, 2, 10, 100])
+    parser.add_argument("--number", type=int, default=2_000)
+    args = parser.parse_args()
+
+    main(args.recipients, args.number)
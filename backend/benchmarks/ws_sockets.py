@@ -0,0 +1,203 @@
+"""
+Holds many WebSocket connections open against a small connection pool and
+checks that they hold no database resources: accepting a socket must not
+check out a connection, the sockets must not pin the pool while they are
+open, and a REST request must still get a connection.
+
+Builds a scratch schema in the database pointed to by URL_DB, seeds a
+user per socket, serves the app from a thread of this process with
+DB_POOL_SIZE=2 and DB_MAX_OVERFLOW=0 unless set otherwise, and drops the
+schema. Client and server sockets share this process, so it needs about
+two file descriptors per socket; the soft limit is raised to the hard one.
+
+    python -m benchmarks.ws_sockets --sockets 10000 --hold 30
+"""
+import argparse
+import asyncio
+import os
+import resource
+import sys
+import time
+
+import httpx
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from websockets.asyncio.client import connect as ws_connect
+
+from benchmarks.server import Server, cookie, free_port
+
+SCHEMA = "bench_ws_sockets"
+
+SEED = [
+    """
+    INSERT INTO users (first_name, surname, tag, password_hashed)
+    SELECT 'user', 'bench', 'user' || i, 'x'
+    FROM generate_series(1, :sockets) AS i
+    """,
+    """
+    INSERT INTO sessions (refresh_token, user_id, created_at)
+    SELECT 'bench', user_id, now() FROM users ORDER BY user_id
+    """,
+]
+
+
+def open_fds() -> int:
+    return len(os.listdir("/proc/self/fd"))
+
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as file:
+        pages = int(file.read().split()[1])
+    return pages * resource.getpagesize() / 2**20
+
+
+def raise_fd_limit(needed: int) -> None:
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    if hard < needed:
+        print(f"warning: {needed} file descriptors needed, the limit is {hard}")
+
+
+async def hold(websocket) -> None:
+    # Answers the heartbeat, everything else is dropped
+    async for frame in websocket:
+        if frame == '{"type":"ping"}':
+            await websocket.send('{"type":"pong"}')
+
+
+async def main(args: argparse.Namespace) -> int:
+    # The settings are read when app.config is imported, after main set them
+    from app.auth.utils import create_access_token
+    from app.config import URL_DB
+    from app.models import Base
+
+    raise_fd_limit(2 * args.sockets + 1000)
+
+    admin = create_async_engine(URL_DB)
+    async with admin.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        await conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        await conn.execute(text(f"SET search_path TO {SCHEMA}"))
+
+        await conn.run_sync(Base.metadata.create_all)
+        for stmt in SEED:
+            await conn.execute(text(stmt), {"sockets": args.sockets})
+
+        sessions = await conn.execute(text(
+            "SELECT users.user_id, users.tag, sessions.session_id "
+            "FROM users JOIN sessions USING (user_id)"
+        ))
+        tokens = [
+            create_access_token(user_id, tag, session_id)
+            for user_id, tag, session_id in sessions
+        ]
+
+    port = free_port()
+    server = Server(port, SCHEMA)
+    sockets = []
+    holders = []
+    failures = []
+    try:
+        await server.start()
+
+        from app.db import get_pool_stats
+        from app.websocket.manager import ws_manager
+
+        fds_before, rss_before = open_fds(), rss_mb()
+        checkouts_before = get_pool_stats()["checkouts"]
+
+        async def open_socket(token: str) -> None:
+            websocket = await ws_connect(
+                f"ws://127.0.0.1:{port}/ws",
+                additional_headers=cookie(token),
+                open_timeout=60,
+            )
+            sockets.append(websocket)
+            holders.append(asyncio.create_task(hold(websocket)))
+
+        started = time.perf_counter()
+        for i in range(0, len(tokens), args.batch):
+            await asyncio.gather(
+                *(open_socket(token) for token in tokens[i:i + args.batch])
+            )
+        opened_in = time.perf_counter() - started
+
+        checkouts_on_connect = get_pool_stats()["checkouts"] - checkouts_before
+        print(f"opened {len(sockets)} sockets in {opened_in:.1f} s, "
+              f"{checkouts_on_connect} pool checkouts")
+
+        # A request that needs the database, while every socket is open
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}") as client:
+            deadline = time.monotonic() + args.hold
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                response = await client.get("/api/v1/chat", headers=cookie(tokens[0]))
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                pool = get_pool_stats()
+                print(
+                    f"  sockets {ws_manager.connection_count:>6}  "
+                    f"pool {pool['checked_out']}/{pool['size']} checked out  "
+                    f"request {response.status_code} in {elapsed_ms:.1f} ms  "
+                    f"fds {open_fds()}  rss {rss_mb():.0f} MB"
+                )
+                if response.status_code != 200:
+                    failures.append(f"request failed with {response.status_code}")
+                # Background jobs may hold one for a moment, sockets never
+                if pool["checked_out"] >= pool["size"]:
+                    failures.append("the pool is pinned")
+                await asyncio.sleep(min(5, args.hold))
+
+        if ws_manager.connection_count != args.sockets:
+            failures.append(
+                f"{ws_manager.connection_count} of {args.sockets} sockets registered"
+            )
+        if checkouts_on_connect >= args.sockets:
+            failures.append("accepting sockets checked out connections")
+
+        for holder in holders:
+            holder.cancel()
+        await asyncio.gather(*(websocket.close() for websocket in sockets))
+        sockets.clear()
+        await asyncio.sleep(1)
+
+        print(
+            f"closed: sockets {ws_manager.connection_count}  "
+            f"fds {open_fds()} (before {fds_before})  "
+            f"rss {rss_mb():.0f} MB (before {rss_before:.0f} MB)"
+        )
+        if ws_manager.connection_count:
+            failures.append("sockets left registered after closing")
+    finally:
+        for holder in holders:
+            holder.cancel()
+        await asyncio.gather(
+            *(websocket.close() for websocket in sockets), return_exceptions=True
+        )
+        if server.thread.is_alive():
+            server.stop()
+        async with admin.connect() as conn:
+            await conn.execution_options(isolation_level="AUTOCOMMIT")
+            await conn.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+        await admin.dispose()
+
+    for failure in dict.fromkeys(failures):
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--sockets", type=int, default=10_000)
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--hold", type=float, default=30)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DB_POOL_SIZE", "2")
+    os.environ.setdefault("DB_MAX_OVERFLOW", "0")
+    os.environ.setdefault("WS_MAX_CONNECTIONS", str(args.sockets))
+
+    sys.exit(asyncio.run(main(args)))
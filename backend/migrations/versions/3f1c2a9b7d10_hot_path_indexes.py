@@ -0,0 +1,108 @@
+"""hot path indexes
+
+Revision ID: 3f1c2a9b7d10
+Revises:
+Create Date: 2026-10-18 10:00:00.000000
+
+Tables are created by the application on startup (Base.metadata.create_all),
+which already emits these indexes, so on a fresh database this revision is a
+no-op. On an existing database the indexes are built CONCURRENTLY to avoid
+blocking writes; uq_chats_user_pair fails if duplicate chats already exist,
+those have to be merged first.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3f1c2a9b7d10"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TABLES = ("messages", "reactions", "chats", "sessions")
+
+
+def _tables_exist() -> bool:
+    if op.get_context().as_sql:
+        return True
+
+    inspector = sa.inspect(op.get_bind())
+    return all(inspector.has_table(table) for table in TABLES)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not _tables_exist():
+        return
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_messages_conversation_id_message_id",
+            "messages",
+            ["conversation_id", "message_id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_reactions_message_id",
+            "reactions",
+            ["message_id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_chats_user_id",
+            "chats",
+            ["user_id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_chats_user_id2",
+            "chats",
+            ["user_id2"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "uq_chats_user_pair",
+            "chats",
+            [
+                sa.text("least(user_id, user_id2)"),
+                sa.text("greatest(user_id, user_id2)"),
+            ],
+            unique=True,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_sessions_user_id",
+            "sessions",
+            ["user_id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for table, index in (
+            ("sessions", "ix_sessions_user_id"),
+            ("chats", "uq_chats_user_pair"),
+            ("chats", "ix_chats_user_id2"),
+            ("chats", "ix_chats_user_id"),
+            ("reactions", "ix_reactions_message_id"),
+            ("messages", "ix_messages_conversation_id_message_id"),
+        ):
+            op.drop_index(
+                index,
+                table_name=table,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
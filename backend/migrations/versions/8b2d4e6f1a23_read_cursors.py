@@ -0,0 +1,59 @@
+"""read cursors
+
+Revision ID: 8b2d4e6f1a23
+Revises: 3f1c2a9b7d10
+Create Date: 2026-10-18 12:00:00.000000
+
+On a fresh database the table is created by the application on startup,
+so this revision only creates it next to existing tables.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "8b2d4e6f1a23"
+down_revision: Union[str, None] = "3f1c2a9b7d10"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _should_create() -> bool:
+    if op.get_context().as_sql:
+        return True
+
+    inspector = sa.inspect(op.get_bind())
+    return inspector.has_table("conversations") and not inspector.has_table(
+        "read_cursors"
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not _should_create():
+        return
+
+    op.create_table(
+        "read_cursors",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("conversation_id", sa.Integer(), nullable=False),
+        sa.Column("last_read_message_id", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["user_id"], ["users.user_id"], ondelete="CASCADE"
+        ),
+        sa.ForeignKeyConstraint(
+            ["conversation_id"],
+            ["conversations.conversation_id"],
+            ondelete="CASCADE",
+        ),
+        sa.PrimaryKeyConstraint("user_id", "conversation_id"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("read_cursors", if_exists=True)
@@ -0,0 +1,92 @@
+"""reaction uniqueness
+
+Revision ID: a7d3f9e2b614
+Revises: e5a8c3d17f90
+Create Date: 2026-10-18 12:00:00.000000
+
+Duplicate reactions (same message, user and type) are deleted, the oldest
+one is kept. The unique index is built CONCURRENTLY and then attached as a
+constraint; it fails if duplicates are inserted while it is being built,
+running the revision again cleans them up. ix_reactions_message_id is
+dropped, the unique index leads with message_id.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a7d3f9e2b614"
+down_revision: Union[str, None] = "e5a8c3d17f90"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CONSTRAINT = "uq_reactions_message_id_user_id_reaction_type"
+
+
+def _should_add_constraint() -> bool:
+    if op.get_context().as_sql:
+        return True
+
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("reactions"):
+        return False
+
+    constraints = {c["name"] for c in inspector.get_unique_constraints("reactions")}
+    return CONSTRAINT not in constraints
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not _should_add_constraint():
+        return
+
+    op.execute(
+        """
+        DELETE FROM reactions
+        USING reactions AS kept
+        WHERE kept.message_id = reactions.message_id
+          AND kept.user_id = reactions.user_id
+          AND kept.reaction_type = reactions.reaction_type
+          AND kept.reaction_id < reactions.reaction_id
+        """
+    )
+
+    with op.get_context().autocommit_block():
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {CONSTRAINT}")
+        op.create_index(
+            CONSTRAINT,
+            "reactions",
+            ["message_id", "user_id", "reaction_type"],
+            unique=True,
+            postgresql_concurrently=True,
+        )
+
+    op.execute(
+        f"ALTER TABLE reactions ADD CONSTRAINT {CONSTRAINT} "
+        f"UNIQUE USING INDEX {CONSTRAINT}"
+    )
+
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_reactions_message_id",
+            table_name="reactions",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_reactions_message_id",
+            "reactions",
+            ["message_id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+    op.execute(f"ALTER TABLE reactions DROP CONSTRAINT IF EXISTS {CONSTRAINT}")
@@ -0,0 +1,65 @@
+"""read cursors from sent messages
+
+Revision ID: b3e9d2c7a415
+Revises: a7d3f9e2b614
+Create Date: 2026-10-18 13:00:00.000000
+
+Sending a message now advances the sender's read cursor, and unread
+counts are taken from the cursor alone. Cursors are moved up to the last
+message each member sent, so that what was read before keeps counting as
+read. A cursor never moves backwards.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b3e9d2c7a415"
+down_revision: Union[str, None] = "a7d3f9e2b614"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _should_backfill() -> bool:
+    if op.get_context().as_sql:
+        return True
+
+    inspector = sa.inspect(op.get_bind())
+    return inspector.has_table("read_cursors") and inspector.has_table(
+        "conversation_members"
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not _should_backfill():
+        return
+
+    op.execute(
+        """
+        INSERT INTO read_cursors
+            (user_id, conversation_id, last_read_message_id, updated_at)
+        SELECT messages.user_id, messages.conversation_id,
+               max(messages.message_id), now()
+        FROM messages
+        JOIN conversation_members
+          ON conversation_members.conversation_id = messages.conversation_id
+         AND conversation_members.user_id = messages.user_id
+        GROUP BY messages.user_id, messages.conversation_id
+        ON CONFLICT (user_id, conversation_id) DO UPDATE
+        SET last_read_message_id = greatest(
+                read_cursors.last_read_message_id,
+                excluded.last_read_message_id
+            ),
+            updated_at = now()
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # The cursors stay valid, only further ahead
+    pass
@@ -0,0 +1,58 @@
+"""message text search
+
+Revision ID: c4e7a1b9d052
+Revises: 8b2d4e6f1a23
+Create Date: 2026-10-18 13:00:00.000000
+
+GIN expression index for full-text search on messages.text. The text
+search configuration is part of the expression and has to be the same as
+SEARCH_TEXT_CONFIG; after changing it, downgrade and upgrade this revision.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.config import SEARCH_TEXT_CONFIG
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c4e7a1b9d052"
+down_revision: Union[str, None] = "8b2d4e6f1a23"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _table_exists() -> bool:
+    if op.get_context().as_sql:
+        return True
+
+    return sa.inspect(op.get_bind()).has_table("messages")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not _table_exists():
+        return
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_messages_text_search",
+            "messages",
+            [sa.text(f"to_tsvector('{SEARCH_TEXT_CONFIG}'::regconfig, text)")],
+            postgresql_using="gin",
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_messages_text_search",
+            table_name="messages",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
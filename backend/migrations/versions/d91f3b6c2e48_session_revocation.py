@@ -0,0 +1,58 @@
+"""session revocation
+
+Revision ID: d91f3b6c2e48
+Revises: c4e7a1b9d052
+Create Date: 2026-10-18 14:00:00.000000
+
+Sessions are revoked instead of deleted, so that other workers can
+denylist their access tokens until these expire.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d91f3b6c2e48"
+down_revision: Union[str, None] = "c4e7a1b9d052"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _should_add_column() -> bool:
+    if op.get_context().as_sql:
+        return True
+
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("sessions"):
+        return False
+
+    columns = {column["name"] for column in inspector.get_columns("sessions")}
+    return "revoked_at" not in columns
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not _should_add_column():
+        return
+
+    op.add_column(
+        "sessions",
+        sa.Column("revoked_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index(
+        "ix_sessions_revoked_at",
+        "sessions",
+        ["revoked_at"],
+        postgresql_where=sa.text("revoked_at IS NOT NULL"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        "ix_sessions_revoked_at", table_name="sessions", if_exists=True
+    )
+    op.drop_column("sessions", "revoked_at")
@@ -0,0 +1,87 @@
+"""conversation members
+
+Revision ID: e5a8c3d17f90
+Revises: d91f3b6c2e48
+Create Date: 2026-10-18 12:00:00.000000
+
+On a fresh database the table is created by the application on startup,
+so this revision only creates it next to existing tables. Both users of
+every existing chat become members of its conversation, also when the
+table was already created by the application.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e5a8c3d17f90"
+down_revision: Union[str, None] = "d91f3b6c2e48"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+member_role = sa.Enum("OWNER", "MEMBER", name="memberrole")
+
+
+def _has_table(name: str) -> bool:
+    if op.get_context().as_sql:
+        return name != "conversation_members"
+
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def _create_table() -> None:
+    op.create_table(
+        "conversation_members",
+        sa.Column("conversation_id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("role", member_role, nullable=False),
+        sa.Column("joined_at", sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["conversation_id"],
+            ["conversations.conversation_id"],
+            ondelete="CASCADE",
+        ),
+        sa.ForeignKeyConstraint(
+            ["user_id"], ["users.user_id"], ondelete="CASCADE"
+        ),
+        sa.PrimaryKeyConstraint("conversation_id", "user_id"),
+    )
+    op.create_index(
+        "ix_conversation_members_user_id_conversation_id",
+        "conversation_members",
+        ["user_id", "conversation_id"],
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not _has_table("chats"):
+        return
+
+    if not _has_table("conversation_members"):
+        _create_table()
+
+    op.execute(
+        """
+        INSERT INTO conversation_members (conversation_id, user_id, role, joined_at)
+        SELECT chats.conversation_id, member.user_id, 'MEMBER', conversations.created_at
+        FROM chats
+        JOIN conversations ON conversations.conversation_id = chats.conversation_id
+        CROSS JOIN LATERAL (VALUES (chats.user_id), (chats.user_id2)) AS member (user_id)
+        ON CONFLICT DO NOTHING
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        "ix_conversation_members_user_id_conversation_id",
+        table_name="conversation_members",
+        if_exists=True,
+    )
+    op.drop_table("conversation_members", if_exists=True)
+    member_role.drop(op.get_bind(), checkfirst=True)
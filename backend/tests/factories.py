@@ -0,0 +1,31 @@
+"""Rows the database tests build on, through the repositories."""
+from app.repository.group import GroupRepository
+from app.repository.message import MessageRepository
+from app.repository.user import UserRepository
+
+
+async def create_users(session_maker, count: int) -> list[int]:
+    async with session_maker() as session:
+        repo = UserRepository(session)
+        user_ids = [
+            (await repo.insert_user("user", "test", f"user{i}", "x")).user_id
+            for i in range(count)
+        ]
+        await repo.commit()
+    return user_ids
+
+
+async def create_group(session_maker, owner_id: int, member_ids: list[int]) -> int:
+    async with session_maker() as session:
+        repo = GroupRepository(session)
+        group = await repo.insert_group("group", owner_id, member_ids)
+        await repo.commit()
+    return group.conversation_id
+
+
+async def send(session_maker, conversation_id: int, user_id: int, text: str) -> int:
+    async with session_maker() as session:
+        repo = MessageRepository(session)
+        message = await repo.create_message(conversation_id, user_id, text)
+        await repo.commit()
+    return message.message_id
@@ -0,0 +1,31 @@
+import asyncio
+
+import pytest
+
+from app.exceptions.exceptions import NoAccessError, NotFoundError
+from app.message.coalescer import MessageWriteCoalescer
+from tests.factories import create_group, create_users
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_rejected_sends_fail_alone(session_maker):
+    user_id, other_id, outsider_id = await create_users(session_maker, 3)
+    conversation_id = await create_group(session_maker, user_id, [other_id])
+    coalescer = MessageWriteCoalescer(
+        window=0.01, max_batch=10, session_maker=session_maker
+    )
+
+    sent, outsider, missing, other = await asyncio.gather(
+        coalescer.submit(conversation_id, user_id, "a"),
+        coalescer.submit(conversation_id, outsider_id, "b"),
+        coalescer.submit(conversation_id + 1000, user_id, "c"),
+        coalescer.submit(conversation_id, other_id, "d"),
+        return_exceptions=True,
+    )
+    await coalescer.stop()
+
+    assert (sent.user_id, sent.text) == (user_id, "a")
+    assert (other.user_id, other.text) == (other_id, "d")
+    assert isinstance(outsider, NoAccessError)
+    assert isinstance(missing, NotFoundError)
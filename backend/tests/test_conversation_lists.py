@@ -0,0 +1,64 @@
+import pytest
+
+from app.repository.chat import ChatRepository
+from app.repository.group import GroupRepository
+from app.repository.read_cursor import ReadCursorRepository
+from tests.factories import create_group, create_users, send
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_chat_list(session_maker):
+    user_id, other_id, third_id = await create_users(session_maker, 3)
+    async with session_maker() as session:
+        repo = ChatRepository(session)
+        chat = await repo.insert_chat("chat", user_id, other_id)
+        empty = await repo.insert_chat("empty", user_id, third_id)
+        await repo.commit()
+
+    first = await send(session_maker, chat.conversation_id, other_id, "one")
+    await send(session_maker, chat.conversation_id, other_id, "two")
+    await send(session_maker, chat.conversation_id, user_id, "mine")
+    last = await send(session_maker, chat.conversation_id, other_id, "three")
+
+    async with session_maker() as session:
+        await ReadCursorRepository(session).upsert_cursors(
+            [(user_id, chat.conversation_id, first)]
+        )
+        chats = await ChatRepository(session).get_chats_by_user_id(user_id)
+
+    # Most recently active first, a chat without messages by its creation
+    assert [c.conversation_id for c in chats] == [
+        chat.conversation_id, empty.conversation_id
+    ]
+    listed, listed_empty = chats
+    assert listed.last_message.message_id == last
+    assert listed.last_message.text == "three"
+    assert listed.last_read_message_id == first
+    # Messages of others after the cursor, own messages don't count
+    assert listed.unread_count == 2
+
+    assert listed_empty.last_message is None
+    assert listed_empty.last_read_message_id is None
+    assert listed_empty.unread_count == 0
+
+
+async def test_group_list(session_maker):
+    owner_id, member_id = await create_users(session_maker, 2)
+    group_id = await create_group(session_maker, owner_id, [member_id])
+    other_group_id = await create_group(session_maker, member_id, [owner_id])
+
+    await send(session_maker, other_group_id, owner_id, "old")
+    await send(session_maker, group_id, owner_id, "a")
+    last = await send(session_maker, group_id, owner_id, "b")
+
+    async with session_maker() as session:
+        groups = await GroupRepository(session).get_groups_by_user_id(member_id)
+
+    assert [g.conversation_id for g in groups] == [group_id, other_group_id]
+    listed = groups[0]
+    assert listed.owner_id == owner_id
+    assert listed.last_message.message_id == last
+    assert listed.last_read_message_id is None
+    assert listed.unread_count == 2
+    assert groups[1].unread_count == 1
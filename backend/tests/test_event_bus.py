@@ -0,0 +1,128 @@
+import asyncio
+import os
+import uuid
+
+import pytest
+
+from app.websocket.bus import InMemoryEventBus, PostgresEventBus
+
+
+class RecordingHandler:
+    def __init__(self) -> None:
+        self.frames: list[tuple] = []
+        self.received = asyncio.Event()
+
+    def deliver(self, user_ids, frame):
+        self.frames.append(("users", list(user_ids), frame))
+        self.received.set()
+
+    def deliver_to_conversation(self, conversation_id, exclude_user_id, frame):
+        self.frames.append(("conversation", conversation_id, exclude_user_id, frame))
+        self.received.set()
+
+    def invalidate_membership(self, conversation_id):
+        self.frames.append(("membership", conversation_id))
+        self.received.set()
+
+
+@pytest.mark.anyio
+async def test_codec():
+    bus = InMemoryEventBus()
+    handler = RecordingHandler()
+    bus.set_handler(handler)
+
+    await bus.publish([1, 2, 3], '{"type":"ping"}')
+    await bus.publish_to_conversation(42, "frame\nwith newline")
+    await bus.publish_to_conversation(42, "frame", exclude_user_id=7)
+    await bus.publish_membership_change(42)
+
+    assert handler.frames == [
+        ("users", [1, 2, 3], '{"type":"ping"}'),
+        ("conversation", 42, None, "frame\nwith newline"),
+        ("conversation", 42, 7, "frame"),
+        ("membership", 42),
+    ]
+
+
+def test_malformed_messages_are_dropped():
+    bus = InMemoryEventBus()
+    handler = RecordingHandler()
+    bus.set_handler(handler)
+
+    for message in ("cx\nframe", "c42:y\nframe", "m\n", "1,a\nframe", "frame"):
+        bus._deliver_encoded(message)
+
+    assert handler.frames == []
+
+
+def test_postgres_bus_splits_large_messages():
+    bus = PostgresEventBus(engine=None, channel="test")
+    handler = RecordingHandler()
+    bus.set_handler(handler)
+
+    # Multi-byte characters straddle the part boundaries
+    frame = '{"text": "' + "ё" * 9000 + '"}'
+    parts = bus._split("c42:7\n" + frame)
+    assert len(parts) == 3
+    assert all(len(part.encode()) <= bus.MAX_PAYLOAD_BYTES for part in parts)
+    assert [part[0] for part in parts] == ["+", "+", "="]
+    assert bus._split("1,2\nsmall") == ["1,2\nsmall"]
+
+    # Parts of two backends interleaved
+    other = bus._split("c43\n" + frame)
+    for first, second in zip(parts, other):
+        bus._on_notify(None, 1, "test", first)
+        bus._on_notify(None, 2, "test", second)
+    bus._on_notify(None, 1, "test", "=orphan tail")
+
+    assert handler.frames == [
+        ("conversation", 42, 7, frame),
+        ("conversation", 43, None, frame),
+    ]
+
+
+@pytest.fixture
+async def engine():
+    url = os.getenv("TEST_URL_DB")
+    if url is None:
+        pytest.skip("TEST_URL_DB is not set")
+
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    engine = create_async_engine(url)
+    yield engine
+    await engine.dispose()
+
+
+async def receive(handler: RecordingHandler) -> tuple:
+    await asyncio.wait_for(handler.received.wait(), timeout=5)
+    handler.received.clear()
+    return handler.frames.pop()
+
+
+@pytest.mark.anyio
+async def test_postgres_bus_reconnects(engine):
+    bus = PostgresEventBus(engine=engine, channel=f"test_{uuid.uuid4().hex[:12]}")
+    bus.RECONNECT_MIN_SECONDS = 0.05
+    handler = RecordingHandler()
+    bus.set_handler(handler)
+    await bus.start()
+    try:
+        frame = "x" * 20_000
+        await bus.publish([1, 2], frame)
+        assert await receive(handler) == ("users", [1, 2], frame)
+
+        pid = bus._driver_conn.get_server_pid()
+        async with engine.connect() as conn:
+            await conn.exec_driver_sql(f"SELECT pg_terminate_backend({pid})")
+
+        for _ in range(100):
+            if bus._connected.is_set() and bus._driver_conn.get_server_pid() != pid:
+                break
+            await asyncio.sleep(0.05)
+        assert bus._driver_conn.get_server_pid() != pid
+
+        await bus.publish_membership_change(42)
+        assert await receive(handler) == ("membership", 42)
+    finally:
+        await bus.stop()
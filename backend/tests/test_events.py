@@ -0,0 +1,34 @@
+import json
+
+from app.websocket.events import WSEventType, encode_event, event_type_of
+from app.websocket.schemas import TypingPayload
+
+
+def test_encode_model():
+    frame = encode_event(
+        WSEventType.TYPING, TypingPayload(conversation_id=4, user_id=2)
+    )
+
+    assert json.loads(frame) == {
+        "type": "typing",
+        "payload": {"conversation_id": 4, "user_id": 2},
+    }
+
+
+def test_encode_dict_and_none():
+    frame = encode_event(WSEventType.ERROR, {"message": 'a "quoted" é'})
+    assert json.loads(frame) == {
+        "type": "error",
+        "payload": {"message": 'a "quoted" é'},
+    }
+    assert json.loads(encode_event(WSEventType.PING)) == {"type": "ping"}
+
+
+def test_event_type_of():
+    for event_type in WSEventType:
+        assert event_type_of(encode_event(event_type, {"a": 1})) == event_type.value
+        assert event_type_of(encode_event(event_type)) == event_type.value
+
+    assert event_type_of('{"type":"made.up"}') == "unknown"
+    assert event_type_of("not a frame") == "unknown"
+    assert event_type_of("") == "unknown"
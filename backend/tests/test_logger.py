@@ -0,0 +1,87 @@
+import json
+import logging
+import sys
+
+import pytest
+
+from app import logger as logger_module
+from app.logger import DuplicateFilter, JSONFormatter, TextFormatter
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(logger_module.time, "monotonic", clock)
+    return clock
+
+
+def make_record(message: str, name: str = "app.test", **extra) -> logging.LogRecord:
+    record = logging.LogRecord(name, logging.WARNING, __file__, 1, message, None, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_duplicates_are_counted_once_per_window(clock):
+    dedupe = DuplicateFilter(window=10)
+
+    assert dedupe.filter(make_record("disk full"))
+    assert not dedupe.filter(make_record("disk full"))
+    assert not dedupe.filter(make_record("disk full"))
+    # Another message, or the same one from another logger, is let through
+    assert dedupe.filter(make_record("disk almost full"))
+    assert dedupe.filter(make_record("disk full", name="app.other"))
+
+    clock.now += 10
+    record = make_record("disk full")
+    assert dedupe.filter(record)
+    assert record.suppressed == 2
+
+    clock.now += 10
+    record = make_record("disk full")
+    assert dedupe.filter(record)
+    assert not hasattr(record, "suppressed")
+
+
+def test_no_window_lets_everything_through():
+    dedupe = DuplicateFilter(window=0)
+    assert all(dedupe.filter(make_record("same")) for _ in range(3))
+
+
+def test_json_formatter():
+    record = make_record("sent", user_id=7, suppressed=3)
+    entry = json.loads(JSONFormatter().format(record))
+
+    assert entry["level"] == "WARNING"
+    assert entry["logger"] == "app.test"
+    assert entry["message"] == "sent"
+    assert entry["user_id"] == 7
+    assert entry["suppressed"] == 3
+    assert "exc" not in entry
+
+
+def test_json_formatter_exception():
+    try:
+        raise RuntimeError("boom")
+    except RuntimeError:
+        record = make_record("failed")
+        record.exc_info = sys.exc_info()
+
+    entry = json.loads(JSONFormatter().format(record))
+    assert "RuntimeError: boom" in entry["exc"]
+
+
+def test_text_formatter_suppressed():
+    formatter = TextFormatter("%(levelname)s %(message)s")
+
+    assert formatter.format(make_record("sent")) == "WARNING sent"
+    assert formatter.format(make_record("sent", suppressed=4)) == (
+        "WARNING sent (4 similar messages suppressed)"
+    )
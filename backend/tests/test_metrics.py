@@ -0,0 +1,71 @@
+import pytest
+
+from app.metrics.registry import Counter, Gauge, Histogram, Registry
+
+
+def test_counter_and_gauge():
+    registry = Registry()
+    requests = registry.register(
+        Counter("requests_total", "Requests.", labelnames=("method", "path"))
+    )
+    in_flight = registry.register(Gauge("in_flight", "In flight."))
+
+    requests.inc("GET", "/chat")
+    requests.inc("GET", "/chat")
+    requests.inc("POST", 'say "hi"\n', amount=2)
+    in_flight.inc()
+    in_flight.inc()
+    in_flight.dec()
+
+    assert registry.render().splitlines() == [
+        "# HELP requests_total Requests.",
+        "# TYPE requests_total counter",
+        'requests_total{method="GET",path="/chat"} 2',
+        'requests_total{method="POST",path="say \\"hi\\"\\n"} 2',
+        "# HELP in_flight In flight.",
+        "# TYPE in_flight gauge",
+        "in_flight 1",
+    ]
+
+
+def test_metric_without_labels_starts_at_zero():
+    assert Counter("events_total", "Events.").render()[-1] == "events_total 0"
+
+
+def test_collected_values():
+    connections = Gauge(
+        "connections",
+        "Connections.",
+        labelnames=("kind",),
+        collect=lambda: {("ws",): 3, ("sse",): 1.5},
+    )
+    uptime = Gauge("uptime_seconds", "Uptime.", collect=lambda: 12.5)
+
+    assert connections.render()[2:] == [
+        'connections{kind="ws"} 3',
+        'connections{kind="sse"} 1.5',
+    ]
+    assert uptime.render()[2:] == ["uptime_seconds 12.5"]
+
+
+def test_histogram():
+    latency = Histogram(
+        "latency_seconds", "Latency.", labelnames=("route",), buckets=(0.5, 0.1)
+    )
+    for value in (0.05, 0.1, 0.3, 2):
+        latency.observe(value, "/chat")
+
+    assert latency.render()[2:] == [
+        'latency_seconds_bucket{route="/chat",le="0.1"} 2',
+        'latency_seconds_bucket{route="/chat",le="0.5"} 3',
+        'latency_seconds_bucket{route="/chat",le="+Inf"} 4',
+        'latency_seconds_sum{route="/chat"} 2.45',
+        'latency_seconds_count{route="/chat"} 4',
+    ]
+
+
+def test_duplicate_name():
+    registry = Registry()
+    registry.register(Counter("events_total", "Events."))
+    with pytest.raises(ValueError):
+        registry.register(Gauge("events_total", "Events."))
@@ -0,0 +1,64 @@
+import pytest
+
+from app.chat.read_cursor import ReadCursorBuffer
+from app.repository.read_cursor import ReadCursorRepository
+from tests.factories import create_group, create_users, send
+
+
+@pytest.mark.anyio
+async def test_upsert_cursors_clamps(session_maker):
+    user_id, other_id, outsider_id = await create_users(session_maker, 3)
+    group_id = await create_group(session_maker, user_id, [other_id])
+    empty_id = await create_group(session_maker, user_id, [other_id])
+    first = await send(session_maker, group_id, other_id, "one")
+    last = await send(session_maker, group_id, other_id, "two")
+
+    async with session_maker() as session:
+        repo = ReadCursorRepository(session)
+        stored = await repo.upsert_cursors(
+            [
+                (user_id, group_id, last + 1000),
+                (other_id, group_id, first),
+                (user_id, empty_id, last),
+                (outsider_id, group_id, last),
+            ]
+        )
+        assert sorted(stored) == sorted(
+            [(user_id, group_id, last), (other_id, group_id, first)]
+        )
+
+        # Never backwards
+        stored = await repo.upsert_cursors([(user_id, group_id, first)])
+        assert stored == [(user_id, group_id, last)]
+
+
+def test_buffer_advance():
+    buffer = ReadCursorBuffer(flush_interval=1, max_pending=100, max_cursors=100)
+
+    assert buffer.advance(1, 10, 5)
+    assert not buffer.advance(1, 10, 5)
+    assert not buffer.advance(1, 10, 3)
+    assert buffer.advance(1, 10, 7)
+    assert buffer.get_pending(1, 10) == 7
+    assert buffer.get_cursor(1, 10) == 7
+
+
+def test_buffer_settle_takes_stored_cursors():
+    buffer = ReadCursorBuffer(flush_interval=1, max_pending=100, max_cursors=100)
+    buffer.advance(1, 10, 500)
+    buffer.advance(2, 10, 5)
+    buffer.advance(3, 10, 5)
+    buffer.advance(4, 20, 5)
+    flushed = {(1, 10): 500, (2, 10): 5, (3, 10): 5, (4, 20): 5}
+    # Advanced again while the flush ran
+    buffer.advance(3, 10, 8)
+
+    buffer._settle(flushed, [(1, 10, 9), (2, 10, 6), (3, 10, 6)])
+
+    # Clamped to the last message, raised to the stored one
+    assert buffer.get_cursor(1, 10) == 9
+    assert buffer.get_cursor(2, 10) == 6
+    assert buffer.get_cursor(3, 10) == 8
+    # No messages in the conversation, nothing stored
+    assert buffer.get_cursor(4, 20) is None
+    assert buffer.advance(1, 10, 10)
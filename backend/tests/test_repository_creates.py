@@ -0,0 +1,218 @@
+import pytest
+from sqlalchemy import func, select
+
+from app.exceptions.exceptions import NoAccessError, NotFoundError
+from app.message.schemas import ReactionType
+from app.models import (
+    Chat,
+    Conversation,
+    ConversationMember,
+    ConversationType,
+    MemberRole,
+    Message,
+    Reaction,
+)
+from app.repository.chat import ChatRepository
+from app.repository.group import GroupRepository
+from app.repository.message import MessageRepository
+from app.repository.reaction import ReactionRepository
+from tests.factories import create_group, create_users
+
+pytestmark = pytest.mark.anyio
+
+
+async def get_members(session, conversation_id: int) -> dict[int, ConversationMember]:
+    result = await session.execute(
+        select(ConversationMember).where(
+            ConversationMember.conversation_id == conversation_id
+        )
+    )
+    return {member.user_id: member for member in result.scalars()}
+
+
+async def test_insert_chat(session_maker):
+    user_id, user_id2 = await create_users(session_maker, 2)
+
+    async with session_maker() as session:
+        repo = ChatRepository(session)
+        chat = await repo.insert_chat("chat", user_id, user_id2)
+        await repo.commit()
+
+    assert chat is not None
+    assert (chat.title, chat.user_id, chat.user_id2) == ("chat", user_id, user_id2)
+
+    async with session_maker() as session:
+        conversation = await session.get(Conversation, chat.conversation_id)
+        assert conversation.type == ConversationType.CHAT
+        assert conversation.title == "chat"
+        assert conversation.created_at is not None
+
+        stored = await session.get(Chat, chat.conversation_id)
+        assert (stored.user_id, stored.user_id2) == (user_id, user_id2)
+
+        members = await get_members(session, chat.conversation_id)
+        assert set(members) == {user_id, user_id2}
+        for member in members.values():
+            assert member.role == MemberRole.MEMBER
+            assert member.joined_at is not None
+
+
+async def test_insert_chat_twice_returns_none(session_maker):
+    user_id, user_id2 = await create_users(session_maker, 2)
+
+    async with session_maker() as session:
+        repo = ChatRepository(session)
+        assert await repo.insert_chat("chat", user_id, user_id2) is not None
+        # Either order of the pair is the same chat
+        assert await repo.insert_chat("again", user_id2, user_id) is None
+
+
+async def test_insert_group(session_maker):
+    owner_id, *member_ids = await create_users(session_maker, 3)
+
+    async with session_maker() as session:
+        repo = GroupRepository(session)
+        # The owner given as a member too is added once
+        group = await repo.insert_group("group", owner_id, [owner_id, *member_ids])
+        await repo.commit()
+
+    assert (group.title, group.owner_id) == ("group", owner_id)
+
+    async with session_maker() as session:
+        conversation = await session.get(Conversation, group.conversation_id)
+        assert conversation.type == ConversationType.GROUP
+        assert conversation.created_at is not None
+
+        members = await get_members(session, group.conversation_id)
+        assert set(members) == {owner_id, *member_ids}
+        assert members[owner_id].role == MemberRole.OWNER
+        for member_id in member_ids:
+            assert members[member_id].role == MemberRole.MEMBER
+        assert all(member.joined_at is not None for member in members.values())
+
+
+async def test_create_message(session_maker):
+    user_id, other_id = await create_users(session_maker, 2)
+    conversation_id = await create_group(session_maker, user_id, [other_id])
+
+    async with session_maker() as session:
+        repo = MessageRepository(session)
+        message = await repo.create_message(conversation_id, user_id, "hello")
+        await repo.commit()
+
+    assert message.conversation_id == conversation_id
+    assert message.user_id == user_id
+    assert message.text == "hello"
+    assert message.is_edited is False
+    assert message.created_at is not None
+    assert message.reactions == []
+
+    async with session_maker() as session:
+        stored = await session.get(Message, message.message_id)
+        assert (stored.conversation_id, stored.user_id, stored.text) == (
+            conversation_id, user_id, "hello"
+        )
+        assert stored.is_edited is False
+        assert stored.created_at == message.created_at
+
+
+async def test_create_message_checks_membership(session_maker):
+    user_id, other_id, outsider_id = await create_users(session_maker, 3)
+    conversation_id = await create_group(session_maker, user_id, [other_id])
+
+    async with session_maker() as session:
+        repo = MessageRepository(session)
+        with pytest.raises(NoAccessError):
+            await repo.create_message(conversation_id, outsider_id, "hello")
+        with pytest.raises(NotFoundError):
+            await repo.create_message(conversation_id + 1000, user_id, "hello")
+
+    async with session_maker() as session:
+        count = await session.scalar(select(func.count()).select_from(Message))
+        assert count == 0
+
+
+async def test_insert_messages(session_maker):
+    user_id, other_id, outsider_id = await create_users(session_maker, 3)
+    conversation_id = await create_group(session_maker, user_id, [other_id])
+    other_conversation_id = await create_group(session_maker, other_id, [user_id])
+    missing_id = outsider_id + 1000
+
+    rows = [
+        (conversation_id, user_id, "a"),
+        (missing_id, user_id, "no conversation"),
+        (other_conversation_id, other_id, "b"),
+        (conversation_id, missing_id, "no sender"),
+        (conversation_id, outsider_id, "not a member"),
+        (conversation_id, other_id, "c"),
+    ]
+    async with session_maker() as session:
+        repo = MessageRepository(session)
+        messages = await repo.insert_messages(rows)
+        await repo.commit()
+
+    # Aligned with the rows, None where the sender is not a member
+    assert [message is None for message in messages] == [
+        False, True, False, True, True, False
+    ]
+    inserted = [message for message in messages if message is not None]
+    assert [(m.conversation_id, m.user_id, m.text) for m in inserted] == [
+        (conversation_id, user_id, "a"),
+        (other_conversation_id, other_id, "b"),
+        (conversation_id, other_id, "c"),
+    ]
+    # Ids follow the order of the rows
+    ids = [message.message_id for message in inserted]
+    assert ids == sorted(ids)
+
+    async with session_maker() as session:
+        result = await session.execute(
+            select(Message).order_by(Message.message_id)
+        )
+        stored = result.scalars().all()
+        assert [m.message_id for m in stored] == ids
+        assert [(m.conversation_id, m.user_id, m.text) for m in stored] == [
+            (m.conversation_id, m.user_id, m.text) for m in inserted
+        ]
+        assert all(m.created_at is not None and not m.is_edited for m in stored)
+
+
+async def test_add_reaction(session_maker):
+    author_id, reactor_id, outsider_id = await create_users(session_maker, 3)
+    conversation_id = await create_group(session_maker, author_id, [reactor_id])
+
+    async with session_maker() as session:
+        repo = MessageRepository(session)
+        message = await repo.create_message(conversation_id, author_id, "hello")
+        await repo.commit()
+
+    async with session_maker() as session:
+        repo = ReactionRepository(session)
+        reaction, conversation, reaction_author_id = await repo.add_reaction(
+            message.message_id, reactor_id, ReactionType.HEART
+        )
+        await repo.commit()
+
+    assert reaction.message_id == message.message_id
+    assert reaction.user_id == reactor_id
+    assert reaction.reaction_type == ReactionType.HEART
+    assert (conversation.conversation_id, conversation.title) == (
+        conversation_id, "group"
+    )
+    assert reaction_author_id == author_id
+
+    async with session_maker() as session:
+        stored = await session.get(Reaction, reaction.reaction_id)
+        assert (stored.message_id, stored.user_id, stored.reaction_type) == (
+            message.message_id, reactor_id, "heart"
+        )
+        assert stored.created_at is not None
+
+    async with session_maker() as session:
+        repo = ReactionRepository(session)
+        with pytest.raises(NoAccessError):
+            await repo.add_reaction(message.message_id, outsider_id, ReactionType.LIKE)
+        with pytest.raises(NotFoundError):
+            await repo.add_reaction(
+                message.message_id + 1000, reactor_id, ReactionType.LIKE
+            )
@@ -0,0 +1,15 @@
+import pytest
+
+from app.repository.message import decode_search_cursor, encode_search_cursor
+
+
+def test_round_trip():
+    assert decode_search_cursor(encode_search_cursor(0.0607927, 42)) == (0.0607927, 42)
+
+
+@pytest.mark.parametrize(
+    "cursor", ["nan:1", "inf:1", "-inf:1", "1e400:1", "0.5", "0.5:x", "0.5:1:2"]
+)
+def test_rejects(cursor):
+    with pytest.raises(ValueError):
+        decode_search_cursor(cursor)
@@ -0,0 +1,56 @@
+import pytest
+
+from app.websocket import throttle as throttle_module
+from app.websocket.throttle import Throttle
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(throttle_module.time, "monotonic", clock)
+    return clock
+
+
+def test_once_per_interval(clock):
+    throttle = Throttle(interval=3)
+
+    assert throttle.allow((1, 10))
+    assert not throttle.allow((1, 10))
+    # Keys are independent
+    assert throttle.allow((2, 10))
+    assert throttle.allow((1, 20))
+
+    clock.now += 2.9
+    assert not throttle.allow((1, 10))
+    clock.now += 0.1
+    assert throttle.allow((1, 10))
+
+
+def test_forgets_expired_keys(clock):
+    throttle = Throttle(interval=3)
+    throttle.allow((1, 10))
+    clock.now += 1
+    throttle.allow((2, 10))
+    clock.now += 2.5
+
+    throttle.allow((3, 10))
+    assert list(throttle._last) == [(2, 10), (3, 10)]
+
+
+def test_bounded(clock):
+    throttle = Throttle(interval=3, max_keys=2)
+    for user_id in range(5):
+        assert throttle.allow((user_id, 10))
+
+    assert list(throttle._last) == [(3, 10), (4, 10)]
+    # The oldest key was dropped, so it is let through again early
+    assert throttle.allow((0, 10))
+    assert not throttle.allow((4, 10))
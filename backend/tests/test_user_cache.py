@@ -0,0 +1,49 @@
+from app.user.cache import UserCache
+from app.user.schemas import UserRead
+
+
+def make_user(user_id: int, tag: str) -> UserRead:
+    return UserRead(
+        user_id=user_id,
+        first_name="user1",
+        surname="last",
+        tag=tag,
+        bio=None,
+        password_hashed="x",
+        contacts=[],
+    )
+
+
+def test_keyed_by_user_id():
+    cache = UserCache(max_size=2, ttl=60)
+    cache.put(make_user(1, "user1"), cache.version)
+
+    assert cache.get(1).tag == "user1"
+    assert cache.get(2) is None
+
+    cache.invalidate(1)
+    assert cache.get(1) is None
+
+
+def test_stale_put_is_dropped():
+    cache = UserCache(max_size=2, ttl=60)
+    version = cache.version
+    cache.invalidate(1)
+    cache.put(make_user(1, "user1"), version)
+
+    assert cache.get(1) is None
+
+
+def test_lru_and_ttl():
+    cache = UserCache(max_size=2, ttl=60)
+    for user_id in (1, 2):
+        cache.put(make_user(user_id, f"user{user_id}"), cache.version)
+    cache.get(1)
+    cache.put(make_user(3, "user3"), cache.version)
+
+    assert cache.get(2) is None
+    assert cache.get(1) is not None and cache.get(3) is not None
+
+    expired = UserCache(max_size=2, ttl=-1)
+    expired.put(make_user(1, "user1"), expired.version)
+    assert expired.get(1) is None
@@ -17,11 +17,11 @@ export const ChatElement: React.FC<ChatElementProps> = ({ chat, onClick, isSelec
     const navigate = useNavigate();
 
     const displayName = chat.title;
-    const previewText = chat.last_message || 'No messages yet';
+    const previewText = chat.last_message?.text || 'No messages yet';
     const unreadCount = chat.unread_count || 0;
 
-    const formattedTime = chat.last_message_time
-        ? formatTime(chat.last_message_time)
+    const formattedTime = chat.last_message
+        ? formatTime(chat.last_message.created_at)
         : '';
 
     const handleDeleteClick = (e: React.MouseEvent) => {
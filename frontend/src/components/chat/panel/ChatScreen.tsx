@@ -1,4 +1,4 @@
-import { useEffect, useState } from "react";
+import { useEffect, useRef, useState } from "react";
 import { Outlet } from "react-router-dom";
 import { useChats } from "../../../contexts/ChatContext";
 import { getEmojiByReactionType, useMessages } from "../../../contexts/MessageContext";
@@ -12,11 +12,17 @@ import Menu from "../menu/Menu";
 import Header from "./Header";
 
 function ChatScreen() {
-    const { refreshUser } = useUser();
+    const { refreshUser, currentUser } = useUser();
     const { refreshChats, addChat, removeChat } = useChats();
     const { handleWSEvent: handleMessageWSEvent } = useMessages();
     const [wsClient, setWsClient] = useState<WSClient | null>(null);
     const { notifications, hideNotification, showInfo } = useNotification();
+    // handleEvent is bound once when the socket is opened
+    const currentUserIdRef = useRef<number | undefined>(undefined);
+
+    useEffect(() => {
+        currentUserIdRef.current = currentUser?.user_id;
+    }, [currentUser]);
 
     useEffect(() => {
         refreshUser();
@@ -57,11 +63,11 @@ function ChatScreen() {
                 break;
 
             case WSEventType.REACTION_ADDED:
-                handleMessageWSEvent(event);
+                handleMessageWSEvent(event, currentUserIdRef.current);
                 break;
 
             case WSEventType.REACTION_REMOVED:
-                handleMessageWSEvent(event);
+                handleMessageWSEvent(event, currentUserIdRef.current);
                 break;
 
             case WSEventType.NOTIFICATION:
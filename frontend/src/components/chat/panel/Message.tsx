@@ -1,7 +1,6 @@
 import clsx from 'clsx';
 import React, { useRef, useState } from 'react';
-import { getEmojiByReactionType, useMessages, type Reaction } from '../../../contexts/MessageContext';
-import { useUser } from '../../../contexts/UserContext';
+import { getEmojiByReactionType, useMessages, type ReactionSummary } from '../../../contexts/MessageContext';
 import { MessageContextMenu } from './MessageContextMenu';
 
 export const formatMessageTime = (timestamp: string): string => {
@@ -19,7 +18,7 @@ export const formatMessageTime = (timestamp: string): string => {
 interface MessageProps {
     messageId: number;
     is_my: boolean;
-    reactions?: Reaction[];
+    reactions?: ReactionSummary[];
     children?: React.ReactNode;
     onEdit?: () => void;
     onDelete?: () => void;
@@ -36,7 +35,6 @@ const Message: React.FC<MessageProps> = ({
     const [contextMenu, setContextMenu] = useState<{ x: number; y: number } | null>(null);
     const messageRef = useRef<HTMLDivElement>(null);
     const { addReaction, removeReaction } = useMessages();
-    const { currentUser } = useUser();
 
     const handleContextMenu = (e: React.MouseEvent) => {
         e.preventDefault();
@@ -70,21 +68,25 @@ const Message: React.FC<MessageProps> = ({
                                 "flex items-center gap-1 mt-1 flex-wrap",
                                 is_my ? "justify-end" : "justify-start"
                             )}>
-                                {reactions.map((reaction) => {
-                                    const isOwnReaction = reaction.user_id === currentUser?.user_id;
-                                    return (
-                                        <div
-                                            key={reaction.reaction_id}
-                                            className={clsx(
-                                                "flex items-center gap-1 text-xs bg-white border border-gray-200 px-1 rounded",
-                                                isOwnReaction ? "hover:bg-gray-200 cursor-pointer" : "cursor-default"
-                                            )}
-                                            onClick={() => isOwnReaction && removeReaction(messageId, reaction.reaction_id)}
-                                        >
-                                            <span>{getEmojiByReactionType(reaction.reaction_type)}</span>
-                                        </div>
-                                    );
-                                })}
+                                {reactions.map((reaction) => (
+                                    <div
+                                        key={reaction.reaction_type}
+                                        className={clsx(
+                                            "flex items-center gap-1 text-xs border px-1 rounded cursor-pointer",
+                                            reaction.reacted_by_me
+                                                ? "bg-blue-100 border-blue-300 text-gray-800 hover:bg-blue-200"
+                                                : "bg-white border-gray-200 text-gray-800 hover:bg-gray-200"
+                                        )}
+                                        onClick={() =>
+                                            reaction.my_reaction_id !== null
+                                                ? removeReaction(messageId, reaction.my_reaction_id)
+                                                : addReaction(messageId, reaction.reaction_type)
+                                        }
+                                    >
+                                        <span>{getEmojiByReactionType(reaction.reaction_type)}</span>
+                                        <span>{reaction.count}</span>
+                                    </div>
+                                ))}
                             </div>
                         )}
                     </div>
@@ -132,7 +134,7 @@ interface TextMessageProps {
     is_my: boolean;
     created_at?: string;
     is_edited?: boolean;
-    reactions?: Reaction[];
+    reactions?: ReactionSummary[];
     onEdit?: (newText: string) => void;
     onDelete?: () => void;
     onReact?: (emoji: string) => void;
@@ -7,11 +7,19 @@ export interface Chat {
     title: string | null;
     user_id: number;
     user_id2: number;
-    last_message?: string;
-    last_message_time?: string;
+    last_message?: MessagePreview | null;
+    last_activity_at?: string;
+    last_read_message_id?: number | null;
     unread_count?: number;
 }
 
+export interface MessagePreview {
+    message_id: number;
+    text: string;
+    user_id: number;
+    created_at: string;
+}
+
 interface ChatsContextType {
     chats: Chat[];
     isLoading: boolean;
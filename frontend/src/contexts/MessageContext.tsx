@@ -50,11 +50,18 @@ export const emojis = ['👍', '❤️', '😄', '😢', '😮'];
 
 export interface Reaction {
     reaction_id: number;
-    reaction_type: keyof typeof ReactionType;
+    reaction_type: string;
     user_id: number;
     message_id: number;
 }
 
+export interface ReactionSummary {
+    reaction_type: string;
+    count: number;
+    reacted_by_me: boolean;
+    my_reaction_id: number | null;
+}
+
 export interface Message {
     message_id: number;
     text: string;
@@ -62,7 +69,7 @@ export interface Message {
     created_at: string;
     is_edited: boolean;
     conversation_id: number;
-    reactions: Reaction[]
+    reactions: ReactionSummary[]
 }
 
 interface MessagesContextType {
@@ -76,9 +83,57 @@ interface MessagesContextType {
     editMessage: (chatId: number, messageId: number, text: string) => Promise<void>;
     addReaction: (messageId: number, reactionType: string) => Promise<void>;
     removeReaction: (messageId: number, reactionId: number) => Promise<void>;
-    handleWSEvent: (event: any) => void;
+    handleWSEvent: (event: any, currentUserId?: number) => void;
 }
 
+const addToSummaries = (
+    summaries: ReactionSummary[],
+    reaction: Reaction,
+    isMine: boolean,
+): ReactionSummary[] => {
+    const existing = summaries.find(s => s.reaction_type === reaction.reaction_type);
+    if (!existing) {
+        return [
+            ...summaries,
+            {
+                reaction_type: reaction.reaction_type,
+                count: 1,
+                reacted_by_me: isMine,
+                my_reaction_id: isMine ? reaction.reaction_id : null,
+            },
+        ];
+    }
+
+    return summaries.map(s =>
+        s === existing
+            ? {
+                ...s,
+                count: s.count + 1,
+                reacted_by_me: s.reacted_by_me || isMine,
+                my_reaction_id: isMine ? reaction.reaction_id : s.my_reaction_id,
+            }
+            : s
+    );
+};
+
+const removeFromSummaries = (
+    summaries: ReactionSummary[],
+    reaction: Reaction,
+    isMine: boolean,
+): ReactionSummary[] =>
+    summaries
+        .map(s =>
+            s.reaction_type === reaction.reaction_type
+                ? {
+                    ...s,
+                    count: s.count - 1,
+                    reacted_by_me: isMine ? false : s.reacted_by_me,
+                    my_reaction_id: isMine ? null : s.my_reaction_id,
+                }
+                : s
+        )
+        .filter(s => s.count > 0);
+
 const MessagesContext = createContext<MessagesContextType | null>(null);
 
 export const useMessages = () => {
@@ -107,7 +162,7 @@ export const MessagesProvider: React.FC<{ children: React.ReactNode }> = ({ chil
             if (!res.ok) throw new Error("Failed to load messages");
 
             const data = await res.json();
-            setMessages(data);
+            setMessages(data.items);
         } catch (e) {
             setError(e instanceof Error ? e.message : "Failed to load messages");
         } finally {
@@ -181,7 +236,7 @@ export const MessagesProvider: React.FC<{ children: React.ReactNode }> = ({ chil
         if (!res.ok) throw new Error("Failed to remove reaction");
     };
 
-    const handleWSEvent = (event: WSEvent) => {
+    const handleWSEvent = (event: WSEvent, currentUserId?: number) => {
         switch (event.type) {
             case WSEventType.MESSAGE_CREATED:
                 setMessages(prev => [...prev, event.payload]);
@@ -203,33 +258,37 @@ export const MessagesProvider: React.FC<{ children: React.ReactNode }> = ({ chil
                 );
                 break;
 
-            case WSEventType.REACTION_ADDED:
+            case WSEventType.REACTION_ADDED: {
+                const reaction: Reaction = event.payload;
+                const isMine = reaction.user_id === currentUserId;
                 setMessages(prev =>
                     prev.map(m =>
-                        m.message_id === event.payload.message_id
+                        m.message_id === reaction.message_id
                             ? {
                                 ...m,
-                                reactions: [...m.reactions, event.payload],
+                                reactions: addToSummaries(m.reactions, reaction, isMine),
                             }
                             : m
                     )
                 );
                 break;
+            }
 
-            case WSEventType.REACTION_REMOVED:
+            case WSEventType.REACTION_REMOVED: {
+                const reaction: Reaction = event.payload;
+                const isMine = reaction.user_id === currentUserId;
                 setMessages(prev =>
                     prev.map(m =>
-                        m.message_id === event.payload.message_id
+                        m.message_id === reaction.message_id
                             ? {
                                 ...m,
-                                reactions: m.reactions.filter(
-                                    r => r.reaction_id !== event.payload.reaction_id
-                                ),
+                                reactions: removeFromSummaries(m.reactions, reaction, isMine),
                             }
                             : m
                     )
                 );
                 break;
+            }
 
             default:
                 console.warn("Unhandled WS event type:", event.type);
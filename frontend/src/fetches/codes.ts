@@ -13,6 +13,7 @@ export const Codes = {
     INCORRECT_CREDENTIALS: 9,
     NO_ACCESS: 10,
     INVALID_OPERATION: 11,
+    SERVICE_BUSY: 12,
 
     CHAT_ALREADY_EXISTS: 1001,
     CANNOT_CREATE_CHAT_WITH_YOURSELF: 1002
@@ -6,8 +6,11 @@ export const WSEventType = {
     REACTION_REMOVED: "reaction.removed",
     CHAT_CREATED: "chat.created",
     CHAT_DELETED: "chat.deleted",
+    TYPING: "typing",
     NOTIFICATION: "notification",
     ERROR: "error",
+    ACK: "ack",
+    PING: "ping",
 } as const;
 
 export type WSEventType = (typeof WSEventType)[keyof typeof WSEventType];
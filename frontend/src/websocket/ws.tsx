@@ -1,4 +1,4 @@
-import type { WSEvent } from "./types";
+import { WSEventType, type WSEvent } from "./types";
 
 
 type MessageHandler = (event: WSEvent) => void;
@@ -20,6 +20,11 @@ export class WSClient {
 
         this.socket.onmessage = (event) => {
             const data: WSEvent = JSON.parse(event.data);
+            // The server closes sockets that stop answering its heartbeat
+            if (data.type === WSEventType.PING) {
+                this.socket?.send(JSON.stringify({ type: "pong" }));
+                return;
+            }
             this.handler(data);
         };
 